@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Requests per second of the sync (WSGI) and async (ASGI) API views when
+MongoDB is slow
+
+MongoDB traffic goes through a local TCP proxy that delays every chunk by
+``--latency-ms`` in each direction, mimicking a database in another region.
+The sync views run on a fixed pool of worker threads, like a threaded
+gunicorn worker; the async views run on one event loop with
+``--concurrency`` requests in flight.
+
+    python benchmarks/async_views.py --latency-ms 100 --requests 400
+
+Needs a reachable ``mongodb://`` URI (``MONGO_URI``, default localhost);
+``mongodb+srv://`` URIs cannot be proxied.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_latency_proxy(target_host, target_port, latency):
+    """Start a delaying TCP proxy in a background thread; returns its port"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    port = []
+
+    async def pipe(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                await asyncio.sleep(latency)
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(pipe(client_reader, server_writer), pipe(server_reader, client_writer))
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True).start()
+    ready.wait()
+    return port[0]
+
+
+def proxied_uri(uri, latency):
+    from pymongo.uri_parser import parse_uri
+
+    if uri.startswith('mongodb+srv://'):
+        sys.exit("mongodb+srv:// URIs cannot be proxied; point MONGO_URI at a mongodb:// host")
+    host, port = parse_uri(uri)['nodelist'][0]
+    proxy_port = start_latency_proxy(host, port, latency)
+    # directConnection keeps the driver from discovering (and bypassing to)
+    # the real replica set members
+    return f"mongodb://127.0.0.1:{proxy_port}/?directConnection=true"
+
+
+def run_sync(view, make_request, total, threads):
+    def one(_):
+        return view(make_request()).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(one, range(total)))
+    return time.perf_counter() - start, statuses
+
+
+def run_async(view, make_request, total, concurrency):
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                return (await view(make_request())).status_code
+
+        return await asyncio.gather(*(one() for _ in range(total)))
+
+    start = time.perf_counter()
+    statuses = asyncio.run(main())
+    return time.perf_counter() - start, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8, help="sync worker threads")
+    parser.add_argument('--concurrency', type=int, default=64, help="async requests in flight")
+    parser.add_argument('--endpoint', choices=['projects', 'contact'], default='projects')
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = proxied_uri(args.mongo_uri, args.latency_ms / 1000)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.conf import settings
+    from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+    django.setup()
+    from portfolio import async_views, views
+
+    # Measure MongoDB round trips, not cache hits
+    override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}).enable()
+    settings.PROJECTS_SNAPSHOT_ENABLED = False
+
+    sync_factory, async_factory = RequestFactory(), AsyncRequestFactory()
+    if args.endpoint == 'projects':
+        path = '/api/projects/?' + urlencode({'limit': 20})
+        sync_request = lambda: sync_factory.get(path)
+        async_request = lambda: async_factory.get(path)
+    else:
+        body = json.dumps({'name': 'Bench', 'email': 'bench@example.com', 'message': 'hi'})
+        sync_request = lambda: sync_factory.post('/api/contact/', body, content_type='application/json')
+        async_request = lambda: async_factory.post('/api/contact/', body, content_type='application/json')
+    sync_view = getattr(views, f'{"get_projects" if args.endpoint == "projects" else "contact"}_api')
+    async_view = getattr(async_views, sync_view.__name__)
+
+    results = {
+        f'sync ({args.threads} threads)': run_sync(sync_view, sync_request, args.requests, args.threads),
+        f'async ({args.concurrency} in flight)': run_async(async_view, async_request, args.requests, args.concurrency),
+    }
+    print(f"{args.endpoint}: {args.requests} requests, {args.latency_ms:.0f} ms added latency each way")
+    for name, (elapsed, statuses) in results.items():
+        errors = sum(1 for status in statuses if status >= 400)
+        print(f"  {name:<24} {args.requests / elapsed:8.1f} req/s  ({elapsed:.2f} s, {errors} errors)")
+
+
+if __name__ == '__main__':
+    main()
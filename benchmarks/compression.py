@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Bytes on the wire per route, uncompressed and compressed
+
+Requests each GET route of the load test (plus the large admin forms) once
+per ``Accept-Encoding`` through the full middleware stack, with projects
+seeded into an in-process mongomock database, and reports the response
+sizes and the time per request. ``collectstatic`` is then run into a
+temporary ``STATIC_ROOT`` to report the precompressed static files.
+
+    python benchmarks/compression.py --projects 200
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import SCENARIOS, seed  # noqa: E402
+
+EXTRA_ROUTES = {
+    'admin-add-project': '/portfolio-admin/portfolio-projects/add/',
+    'admin-update-profile': '/portfolio-admin/profile/update/',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--contacts', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20, help="requests per route and encoding, for timing")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ['LOGGING_QUEUE'] = 'False'
+    os.environ['LOG_FORMAT'] = 'simple'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.conf import settings
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.RATE_LIMIT_ENABLED = False
+    settings.DEBUG = False
+    work_dir = tempfile.mkdtemp(prefix='portfolio-bench-')
+    settings.DATABASES['default']['NAME'] = os.path.join(work_dir, 'bench.sqlite3')
+    settings.STATIC_ROOT = os.path.join(work_dir, 'static')
+    # The cache would answer repeats before the view; measure rendered responses
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    django.setup()
+    import logging
+
+    import mongomock
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+
+    from portfolio import db as db_module
+    from portfolio.compression import ENCODINGS, SUFFIXES
+
+    logging.getLogger('portfolio').setLevel(logging.WARNING)
+    logging.getLogger('django').setLevel(logging.ERROR)
+    db_module._client, db_module._client_pid = mongomock.MongoClient(), os.getpid()
+    try:
+        call_command('migrate', verbosity=0)
+        client = Client()
+        client.force_login(User.objects.create_superuser('bench', 'bench@example.com', 'bench'))
+        rng = random.Random(args.seed)
+        seed(db_module.get_db(), args.projects, args.contacts, rng)
+
+        routes = {name: make_path(rng) for name, (method, make_path, _) in SCENARIOS.items() if method == 'GET'}
+        routes.update(EXTRA_ROUTES)
+        encodings = ('identity',) + ENCODINGS
+        print(f"{'route':<22}" + ''.join(f'{encoding:>16}' for encoding in encodings) + '   saved')
+        total = dict.fromkeys(encodings, 0)
+        for name, path in routes.items():
+            sizes, times = {}, {}
+            client.get(path)  # warm up
+            for encoding in encodings:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    response = client.get(path, HTTP_ACCEPT_ENCODING=encoding)
+                times[encoding] = (time.perf_counter() - start) / args.repeat * 1000
+                sizes[encoding] = len(response.content)
+                total[encoding] += sizes[encoding]
+            best = min(sizes.values())
+            print(f'{name:<22}' + ''.join(
+                f'{sizes[e]:>8} {times[e]:5.2f}ms' for e in encodings) + f'  {1 - best / sizes["identity"]:6.1%}')
+        best = min(total.values())
+        print(f"{'total':<22}" + ''.join(f'{total[e]:>16}' for e in encodings)
+              + f'  {1 - best / total["identity"]:6.1%}')
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        files = dict.fromkeys(('identity',) + ENCODINGS, 0)
+        for directory, _, names in os.walk(settings.STATIC_ROOT):
+            for filename in names:
+                path = os.path.join(directory, filename)
+                if any(filename.endswith(suffix) for suffix in SUFFIXES.values()) or filename == 'staticfiles.json':
+                    continue
+                size = os.path.getsize(path)
+                files['identity'] += size
+                for encoding in ENCODINGS:
+                    sibling = path + SUFFIXES[encoding]
+                    files[encoding] += os.path.getsize(sibling) if os.path.exists(sibling) else size
+        print(f"\nstatic files ({settings.STATIC_ROOT} after collectstatic; files without a sibling count at full size)")
+        print('  ' + ', '.join(f'{encoding} {size / 1024:.0f} KB' for encoding, size in files.items()))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""
+Load test of the API and admin views against a local MongoDB
+
+Seeds ``--projects`` synthetic projects (and ``--contacts`` contacts) into a
+throwaway database, then drives each scenario through the full Django stack
+(middleware, URL routing, templates) with ``--concurrency`` client threads,
+and reports p50/p95/p99 latency, throughput and peak RSS. Results are
+written as JSON; ``--compare`` prints the change against an earlier run.
+
+MongoDB is one of:
+
+- ``embedded``: a ``mongod`` from ``PATH`` started on a free port with a
+  temporary data directory (the default when ``mongod`` is installed)
+- ``memory``: an in-process mongomock database (``pip install mongomock``);
+  no server, but mongomock's query engine is much slower than mongod's
+- ``uri``: the server at ``--mongo-uri``; the benchmark uses its own
+  ``portfolio_bench`` database and drops it afterwards
+
+    python benchmarks/load.py --projects 10000
+    python benchmarks/load.py --mongo memory --projects 1000 --scenarios projects contact
+    python benchmarks/load.py --projects 1000000 --requests 5000 --concurrency 16
+    python benchmarks/load.py --compare benchmarks/results/load-1a2b3c4-10000.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TECHNOLOGIES = ['Django', 'React', 'MongoDB', 'Python', 'Postgres', 'Redis', 'Vue', 'Go', 'Rust',
+                'Kubernetes', 'GraphQL', 'TypeScript', 'Tailwind', 'FastAPI', 'Celery', 'Svelte']
+CATEGORIES = ['web', 'mobile', 'data', 'devops', 'ml']
+WORDS = ['portfolio', 'dashboard', 'tracker', 'api', 'engine', 'studio', 'shop', 'chat', 'blog',
+         'planner', 'monitor', 'gallery', 'game', 'bot', 'wallet', 'atlas', 'pulse', 'forge']
+YEARS = list(range(2015, 2026))
+
+# name -> (method, path builder, JSON body builder)
+SCENARIOS = {
+    'projects': ('GET', lambda rng: '/api/projects/?limit=20', None),
+    'projects-filtered': ('GET', lambda rng: (
+        f'/api/projects/?technology={rng.choice(TECHNOLOGIES)}&year={rng.choice(YEARS)}&limit=20'), None),
+    'projects-search': ('GET', lambda rng: f'/api/projects/search/?q={rng.choice(WORDS)[:4]}', None),
+    'projects-facets': ('GET', lambda rng: '/api/projects/facets/', None),
+    'contact': ('POST', lambda rng: '/api/contact/', lambda rng: {
+        'name': 'Load Test', 'email': f'load{rng.randrange(10 ** 6)}@example.com', 'message': 'Hello'}),
+    'home': ('GET', lambda rng: '/', None),
+    'admin-projects': ('GET', lambda rng: (
+        f'/portfolio-admin/portfolio-projects/?sort={rng.choice(["-created_at", "title", "-year"])}'), None),
+    'admin-contacts': ('GET', lambda rng: '/portfolio-admin/portfolio-contacts/', None),
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mongod():
+    """Start a throwaway ``mongod``; returns ``(uri, stop)``"""
+    binary = shutil.which('mongod')
+    if binary is None:
+        sys.exit("mongod is not on PATH; use --mongo memory or --mongo uri")
+    dbpath = tempfile.mkdtemp(prefix='portfolio-bench-')
+    port = free_port()
+    process = subprocess.Popen([binary, '--dbpath', dbpath, '--port', str(port), '--bind_ip', '127.0.0.1',
+                                '--quiet', '--nounixsocket'], stdout=subprocess.DEVNULL)
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return f'mongodb://127.0.0.1:{port}', stop
+        except OSError:
+            time.sleep(0.1)
+    stop()
+    sys.exit("mongod did not start within 30 seconds")
+
+
+def synthetic_projects(count, rng, batch_size=10000):
+    """Project documents in batches, with unique titles and spread-out dates"""
+    start = datetime(2015, 1, 1)
+    for offset in range(0, count, batch_size):
+        yield [{
+            'title': f"{' '.join(rng.sample(WORDS, 2)).title()} #{i}",
+            'description': ' '.join(rng.choices(WORDS, k=30)),
+            'technologies': rng.sample(TECHNOLOGIES, rng.randint(1, 4)),
+            'category': rng.choice(CATEGORIES),
+            'year': rng.choice(YEARS),
+            'featured': rng.random() < 0.1,
+            'live_url': f'https://example.com/{i}',
+            'github_url': f'https://github.com/example/{i}',
+            'image': '',
+            'created_at': (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+        } for i in range(offset, min(offset + batch_size, count))]
+
+
+def synthetic_contacts(count, rng):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [{
+        'name': f'Sender {i}',
+        'email': f'sender{i}@example.com',
+        'message': ' '.join(rng.choices(WORDS, k=20)),
+        'timestamp': (start + timedelta(minutes=i)).isoformat(),
+    } for i in range(count)]
+
+
+def seed(db, projects, contacts, rng):
+    from portfolio.indexes import ensure_indexes
+
+    start = time.perf_counter()
+    db.projects.drop()
+    db.contacts.drop()
+    db.meta.drop()
+    ensure_indexes()
+    for batch in synthetic_projects(projects, rng):
+        db.projects.insert_many(batch, ordered=False)
+    db.contacts.insert_one({'type': 'profile', 'name': 'Load Test', 'email': 'me@example.com',
+                            'title': 'Developer', 'skills': ['Python'], 'location': 'Here'})
+    if contacts:
+        db.contacts.insert_many(synthetic_contacts(contacts, rng), ordered=False)
+    return time.perf_counter() - start
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_scenario(name, total, concurrency, seed_value, make_client):
+    method, make_path, make_body = SCENARIOS[name]
+    lock = threading.Lock()
+    issued = [0]
+    latencies, errors = [], [0]
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        client = make_client()
+        samples, failed = [], 0
+        while True:
+            with lock:
+                if issued[0] >= total:
+                    break
+                issued[0] += 1
+            path = make_path(rng)
+            start = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, json.dumps(make_body(rng)), content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(samples)
+            errors[0] += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors[0],
+        'throughput_rps': round(total / elapsed, 1),
+        'mean_ms': ms(sum(latencies) / len(latencies)),
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1]),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline['meta']['commit']}):")
+    for name, current in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p99_ms', 'throughput_rps', 'peak_rss_mb'):
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0
+            changes.append(f"{key} {before[key]:g} -> {current[key]:g} ({change:+.1f}%)")
+        print(f"  {name:<18}" + ', '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mongo', choices=['embedded', 'memory', 'uri'],
+                        default='embedded' if shutil.which('mongod') else 'memory')
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--projects', type=int, default=10000, help="projects to seed (1k to 1M)")
+    parser.add_argument('--contacts', type=int, default=1000)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=1000, help="requests per scenario")
+    parser.add_argument('--warmup', type=int, default=50, help="unmeasured requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="client threads")
+    parser.add_argument('--cache', choices=['locmem', 'dummy'], default='locmem',
+                        help="dummy disables Django's cache to measure the MongoDB path")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="results file (default benchmarks/results/load-<commit>-<projects>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    stop_mongod = None
+    if args.mongo == 'embedded':
+        os.environ['MONGO_URI'], stop_mongod = start_mongod()
+    elif args.mongo == 'uri':
+        os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ['LOGGING_QUEUE'] = 'False'
+    os.environ['LOG_FORMAT'] = 'simple'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.conf import settings
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.RATE_LIMIT_ENABLED = False
+    # Sessions and the admin user live in a throwaway SQLite database
+    sqlite_dir = tempfile.mkdtemp(prefix='portfolio-bench-')
+    settings.DATABASES['default']['NAME'] = os.path.join(sqlite_dir, 'bench.sqlite3')
+    if args.cache == 'dummy':
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    django.setup()
+    import logging
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+
+    from portfolio import db as db_module
+
+    logging.getLogger('portfolio').setLevel(logging.WARNING)
+    logging.getLogger('django').setLevel(logging.ERROR)
+    if args.mongo == 'memory':
+        import mongomock
+
+        db_module._client, db_module._client_pid = mongomock.MongoClient(), os.getpid()
+    elif args.mongo == 'uri':
+        db_module.MONGO_DB_NAME = 'portfolio_bench'
+    db = db_module.get_db()
+
+    call_command('migrate', verbosity=0)
+    admin = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+
+    def make_client():
+        client = Client()
+        client.force_login(admin)
+        return client
+
+    rng = random.Random(args.seed)
+    try:
+        seconds = seed(db, args.projects, args.contacts, rng)
+        print(f"Seeded {args.projects} projects and {args.contacts} contacts into {args.mongo} MongoDB "
+              f"in {seconds:.1f}s (peak RSS {peak_rss_mb()} MB)")
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'mongo': args.mongo,
+                'cache': args.cache,
+                'projects': args.projects,
+                'contacts': args.contacts,
+                'concurrency': args.concurrency,
+                'seed': args.seed,
+                'seed_seconds': round(seconds, 2),
+            },
+            'scenarios': {},
+        }
+        for name in args.scenarios:
+            if args.warmup:
+                run_scenario(name, args.warmup, min(args.concurrency, args.warmup), args.seed, make_client)
+            result = run_scenario(name, args.requests, args.concurrency, args.seed, make_client)
+            results['scenarios'][name] = result
+            print(f"  {name:<18} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+                  f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s  "
+                  f"{result['errors']} errors  RSS {result['peak_rss_mb']} MB")
+    finally:
+        if args.mongo == 'uri':
+            db.client.drop_database(db.name)
+        if stop_mongod is not None:
+            stop_mongod()
+        shutil.rmtree(sqlite_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"load-{results['meta']['commit']}-{args.projects}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Per-request cost of logging: off, synchronous, and queued
+
+Calls a view shaped like the admin list views (one summary line plus one
+line per row) through ``RequestFactory`` and reports the mean and p99
+latency per request with logging disabled, written synchronously to a
+stream, and handed to the background queue. ``--sink-latency-us`` makes
+each write sleep, to stand in for a slow or blocked stdout.
+
+    python benchmarks/log_overhead.py --requests 5000
+    python benchmarks/log_overhead.py --rows 50 --sink-latency-us 200
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SlowStream(io.TextIOBase):
+    """Discards writes after sleeping ``latency`` seconds for each one"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+
+def measure(view, request, total):
+    samples = []
+    for _ in range(total):
+        start = time.perf_counter()
+        view(request)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    mean = sum(samples) / total * 1e6
+    return f"mean {mean:8.1f} us  p99 {samples[int(0.99 * (total - 1))] * 1e6:8.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=25, help="row lines logged per request")
+    parser.add_argument('--sink-latency-us', type=float, default=0)
+    args = parser.parse_args()
+
+    os.environ['LOGGING_QUEUE'] = 'False'  # installed by hand below
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    django.setup()
+    from portfolio import log
+
+    logger = logging.getLogger('benchmark.view')
+    logger.propagate = False
+    rows = [{'title': f'Project {i}', 'year': 2020 + i % 5} for i in range(args.rows)]
+
+    def view(request):
+        logger.info("📋 Projects list viewed - %s projects", len(rows))
+        for row in rows:
+            logger.info("📁 Project row: %s (%s)", row['title'], row['year'])
+        return HttpResponse('ok')
+
+    request = RequestFactory().get('/portfolio-admin/portfolio-projects/')
+    stream = SlowStream(args.sink_latency_us / 1e6)
+
+    def handler(formatter):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(formatter)
+        return handler
+
+    simple = logging.Formatter('{levelname} {message}', style='{')
+    print(f"{args.requests} requests, {args.rows + 1} log lines each, "
+          f"{args.sink_latency_us:g} us per write")
+
+    logger.disabled = True
+    print(f"  {'logging off':<22}{measure(view, request, args.requests)}")
+    logger.disabled = False
+
+    for name, formatter in (('sync, simple', simple), ('sync, JSON', log.JSONFormatter())):
+        logger.handlers = [handler(formatter)]
+        print(f"  {name:<22}{measure(view, request, args.requests)}")
+
+    logger.handlers = [handler(log.JSONFormatter())]
+    log.install_queue_logging()
+    result = measure(view, request, args.requests)
+    start = time.perf_counter()
+    log.stop_queue_logging()
+    print(f"  {'queued, JSON':<22}{result}  (drained in {time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
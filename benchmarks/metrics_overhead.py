@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Per-request overhead of the performance instrumentation
+
+Calls a view that does a few cache lookups, with and without
+``ServerTimingMiddleware`` and the counting cache backend, and reports the
+difference per request. A simulated MongoDB command event is fed to the
+command listener on each request, as PyMongo would.
+
+    python benchmarks/metrics_overhead.py --requests 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_request_us(handler, request, total):
+    start = time.perf_counter()
+    for _ in range(total):
+        handler(request)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=3, help="cache lookups per request")
+    args = parser.parse_args()
+
+    os.environ['LOGGING_QUEUE'] = 'False'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    django.setup()
+    from portfolio.metrics import ServerTimingMiddleware, TimedLocMemCache, mongo_command_listener
+
+    event = types.SimpleNamespace(command_name='find', duration_micros=800)
+    request = RequestFactory().get('/api/projects/')
+
+    def view_using(cache, listener):
+        cache.set('key', 'value')
+
+        def view(request):
+            for _ in range(args.lookups):
+                cache.get('key')
+            if listener is not None:
+                listener.succeeded(event)
+            return HttpResponse('ok')
+        return view
+
+    plain = per_request_us(view_using(LocMemCache('plain', {}), None), request, args.requests)
+    instrumented = per_request_us(
+        ServerTimingMiddleware(view_using(TimedLocMemCache('timed', {}), mongo_command_listener)),
+        request, args.requests)
+    print(f"{args.requests} requests, {args.lookups} cache lookups and one MongoDB command each")
+    print(f"  without instrumentation {plain:8.2f} us/request")
+    print(f"  with instrumentation    {instrumented:8.2f} us/request  (+{instrumented - plain:.2f} us)")
+
+
+if __name__ == '__main__':
+    main()
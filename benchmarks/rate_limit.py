@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Per-request overhead of the token-bucket rate limiter
+
+Calls a trivial view through ``RequestFactory`` with and without the
+``rate_limit`` decorator and reports the difference per request, using the
+configured cache and optionally a Redis server.
+
+    python benchmarks/rate_limit.py --requests 20000
+    python benchmarks/rate_limit.py --redis-url redis://127.0.0.1:6379/0
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_request_us(view, request, total):
+    start = time.perf_counter()
+    for _ in range(total):
+        view(request)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--redis-url', help="also measure against this Redis server")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.http import HttpResponse
+    from django.test import RequestFactory, override_settings
+
+    django.setup()
+    from portfolio.ratelimit import rate_limit
+
+    def view(request):
+        return HttpResponse('ok')
+
+    limited = rate_limit('bench')(view)
+    request = RequestFactory().post('/api/contact/', REMOTE_ADDR='203.0.113.7')
+    # Limits high enough that every request is allowed: we measure the check
+    limits = {'bench': {'per_ip': f'{args.requests * 10}/s', 'global': f'{args.requests * 10}/s'}}
+
+    backends = {'default cache': None}
+    if args.redis_url:
+        backends['redis'] = {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': args.redis_url,
+        }}
+
+    baseline = per_request_us(view, request, args.requests)
+    print(f"{args.requests} requests, plain view: {baseline:.1f} us/request")
+    for name, caches in backends.items():
+        overrides = {'RATE_LIMITS': limits}
+        if caches:
+            overrides['CACHES'] = caches
+        with override_settings(**overrides):
+            limited(request)  # warm up connections / script cache
+            measured = per_request_us(limited, request, args.requests)
+        print(f"  rate limited ({name}): {measured:.1f} us/request, +{measured - baseline:.1f} us per check")
+
+
+if __name__ == '__main__':
+    main()
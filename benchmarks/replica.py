@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Read latency of the SQLite replica against MongoDB, and replication lag
+
+Seeds ``--projects`` synthetic projects, copies them into the replica with
+a full sync, then times the projects API's query shapes (first page, a
+deep cursor page, filters) through both repositories. Finally it runs the
+sync loop in a thread, writes ``--writes`` projects the way the API does and
+reports how long each took to become readable from the replica.
+
+MongoDB is chosen as in ``benchmarks/load.py``. Against ``mongod`` (a
+standalone server, so the sync polls every ``--poll-interval`` seconds) the
+comparison includes the network round trip; with ``--mongo memory`` it
+only compares query engines.
+
+    python benchmarks/replica.py --projects 10000
+    python benchmarks/replica.py --mongo memory --projects 1000 --writes 10
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import percentile, seed, start_mongod  # noqa: E402
+
+QUERIES = {
+    'first page': ({}, 'created_at', -1),
+    'by year': ({}, 'year', -1),
+    'by title': ({}, 'title', 1),
+    'category filter': ({'category': 'web'}, 'created_at', -1),
+    'technology filter': ({'technologies': 'Django'}, 'created_at', -1),
+}
+
+
+def timed(function, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mongo', choices=['embedded', 'memory', 'uri'],
+                        default='embedded' if shutil.which('mongod') else 'memory')
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=20, help="projects per page")
+    parser.add_argument('--repeat', type=int, default=200, help="reads per query shape and source")
+    parser.add_argument('--writes', type=int, default=20, help="writes whose replication lag is measured")
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stop_mongod = None
+    if args.mongo == 'embedded':
+        os.environ['MONGO_URI'], stop_mongod = start_mongod()
+    elif args.mongo == 'uri':
+        os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ['LOGGING_QUEUE'] = 'False'
+    os.environ['LOG_FORMAT'] = 'simple'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from django.conf import settings
+
+    sqlite_dir = tempfile.mkdtemp(prefix='portfolio-bench-')
+    settings.DATABASES['default']['NAME'] = os.path.join(sqlite_dir, 'bench.sqlite3')
+    django.setup()
+    import logging
+
+    from django.core.management import call_command
+
+    from portfolio import db as db_module
+
+    logging.getLogger('portfolio').setLevel(logging.WARNING)
+    if args.mongo == 'memory':
+        import mongomock
+
+        db_module._client, db_module._client_pid = mongomock.MongoClient(), os.getpid()
+    elif args.mongo == 'uri':
+        db_module.MONGO_DB_NAME = 'portfolio_bench'
+    db = db_module.get_db()
+
+    from portfolio.models import Project
+    from portfolio.replica import get_replica, get_replica_state
+    from portfolio.repository import mongo_repository, replica_repository
+    from portfolio.utils import project_from_data, stamp_project
+    from portfolio.versioning import bump_content_version
+
+    call_command('migrate', verbosity=0)
+    rng = random.Random(args.seed)
+    try:
+        seconds = seed(db, args.projects, 0, rng)
+        bump_content_version()
+        print(f"Seeded {args.projects} projects into {args.mongo} MongoDB in {seconds:.1f}s")
+        replica = get_replica(mode='polling', poll_interval=args.poll_interval)
+        start = time.perf_counter()
+        replica.full_sync()
+        print(f"Full sync into SQLite: {time.perf_counter() - start:.2f}s")
+
+        print(f"\n{'query':<26}{'mongo p50':>12}{'p95':>9}{'replica p50':>14}{'p95':>9}  (ms, {args.limit} per page)")
+        for name, (filters, field, direction) in QUERIES.items():
+            # A cursor from the middle of the listing, as for a deep page
+            middle = mongo_repository.find(filters, field, direction, limit=args.projects // 2)[-1:]
+            for label, after in (('', None), (' (deep)', middle and (middle[0].get(field), middle[0]['_id']))):
+                if label and not after:
+                    continue
+                row = f'{name + label:<26}'
+                pages = {}
+                for repository in (mongo_repository, replica_repository):
+                    pages[repository.name] = repository.find(filters, field, direction, after, args.limit)
+                    latencies = timed(lambda: repository.find(filters, field, direction, after, args.limit),
+                                      args.repeat)
+                    width = 12 if repository is mongo_repository else 14
+                    row += f'{percentile(latencies, 0.5):>{width}.2f}{percentile(latencies, 0.95):>9.2f}'
+                same = [p['_id'] for p in pages['mongo']] == [p['_id'] for p in pages['replica']]
+                print(row + ('' if same else '  MISMATCH'))
+
+        thread = threading.Thread(target=replica.run, daemon=True)
+        thread.start()
+        lags = []
+        for i in range(args.writes):
+            project = stamp_project(project_from_data({'title': f'Replica lag {i}', 'created_at': '2099-01-01'}))
+            written = time.perf_counter()
+            db.projects.insert_one(project)
+            bump_content_version()
+            while not Project.objects.filter(mongo_id=str(project['_id'])).exists():
+                time.sleep(0.005)
+            lags.append((time.perf_counter() - written) * 1000)
+        replica.stop()
+        lags.sort()
+        print(f"\nWrite to replica ({get_replica_state().mode}, {args.writes} writes): "
+              f"p50 {percentile(lags, 0.5):.0f} ms, p95 {percentile(lags, 0.95):.0f} ms, max {lags[-1]:.0f} ms")
+    finally:
+        if args.mongo == 'uri':
+            db.client.drop_database(db.name)
+        if stop_mongod is not None:
+            stop_mongod()
+        shutil.rmtree(sqlite_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Query latency of the in-process project search index
+
+Indexes synthetic projects (10k and 100k by default) and reports build time,
+the cost of re-indexing one changed project, and p50/p95/p99 latency for
+whole-word, prefix (type-ahead) and multi-word queries. No MongoDB needed.
+
+    python benchmarks/search.py
+    python benchmarks/search.py --sizes 1000 10000 100000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TECHNOLOGIES = ['Django', 'React', 'MongoDB', 'Python', 'Postgres', 'Redis', 'Vue', 'Go', 'Rust',
+                'Kubernetes', 'GraphQL', 'TypeScript', 'Tailwind', 'FastAPI', 'Celery', 'Svelte']
+CATEGORIES = ['web', 'mobile', 'data', 'devops', 'ml']
+
+
+def synthetic_projects(count, rng):
+    from bson import ObjectId
+
+    # Zipf-ish vocabulary: a few common words and a long tail
+    words = [f"{rng.choice('bcdfghjklmnpqrstvwz')}{rng.choice('aeiou')}{i:x}" for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    projects = []
+    for i in range(count):
+        projects.append({
+            '_id': ObjectId(),
+            'title': ' '.join(rng.choices(words, weights, k=3)),
+            'description': ' '.join(rng.choices(words, weights, k=25)),
+            'technologies': rng.sample(TECHNOLOGIES, 3),
+            'category': rng.choice(CATEGORIES),
+            'year': rng.randint(2015, 2025),
+        })
+    return projects, words
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50 {pick(0.50):7.3f}  p95 {pick(0.95):7.3f}  p99 {pick(0.99):7.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    django.setup()
+    from portfolio.search import SearchIndex
+
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        projects, words = synthetic_projects(size, rng)
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.sync(projects, version=1)
+        build = time.perf_counter() - start
+
+        changed = dict(projects[0], title='renamed project')
+        start = time.perf_counter()
+        index.add(changed)
+        update = time.perf_counter() - start
+
+        common = words[:200]
+        shapes = {
+            'word': lambda: rng.choice(common),
+            'prefix (2 chars)': lambda: rng.choice(common)[:2],
+            'prefix (3 chars)': lambda: rng.choice(common)[:3],
+            'technology': lambda: rng.choice(TECHNOLOGIES).lower(),
+            'two words': lambda: f"{rng.choice(common)} {rng.choice(common)[:3]}",
+        }
+        print(f"\n{size} projects: built in {build:.2f}s, "
+              f"{len(index._postings)} terms, one project re-indexed in {update * 1e6:.0f} us")
+        for name, make_query in shapes.items():
+            samples, hits = [], []
+            for _ in range(args.queries):
+                query = make_query()
+                start = time.perf_counter()
+                results = index.search(query, limit=20)
+                samples.append(time.perf_counter() - start)
+                hits.append(len(results))
+            print(f"  {name:<18}{percentiles(samples)}  ({statistics.mean(hits):.1f} hits)")
+
+
+if __name__ == '__main__':
+    main()
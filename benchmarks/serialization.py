@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+JSON encoding time and payload size of large project lists
+
+Encodes pages of synthetic projects (as PyMongo returns them, with
+``ObjectId`` and ``datetime`` values) with Django's ``JsonResponse``
+encoder and each ``API_JSON_ENCODER``, for every project field and for
+the sparse fieldset the home page's card grid asks for.
+
+    python benchmarks/serialization.py --sizes 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import synthetic_projects  # noqa: E402
+
+CARD_FIELDS = ('title', 'image', 'technologies')
+
+
+def per_call_ms(function, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(data)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help="projects per payload")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+    import django
+    from bson import ObjectId
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    django.setup()
+    from portfolio.encoders import ENCODERS, orjson
+    from portfolio.utils import projects_page
+
+    # JsonResponse's encoder rejects ObjectId; default=str is the usual workaround
+    encoders = {'JsonResponse': lambda data: json.dumps(data, cls=DjangoJSONEncoder, default=str).encode()}
+    encoders.update((name, dumps) for name, dumps in ENCODERS.items() if name != 'orjson' or orjson is not None)
+    if orjson is None:
+        print("orjson is not installed; pip install orjson to include it")
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        projects = [project for batch in synthetic_projects(size, rng) for project in batch]
+        for project in projects:
+            project['_id'] = ObjectId()
+            project['owner'] = ObjectId()
+            project['updated_at'] = datetime.now(timezone.utc)
+        full = projects_page([dict(project) for project in projects], size, 'created_at', -1)
+        sparse = projects_page([dict(project) for project in projects], size, 'created_at', -1, CARD_FIELDS)
+        print(f"\n{size} projects")
+        for label, payload in (('all fields', full), (f"fields={','.join(CARD_FIELDS)}", sparse)):
+            timings = '  '.join(f'{name} {per_call_ms(dumps, payload, args.repeat):8.2f} ms'
+                                for name, dumps in encoders.items())
+            print(f"  {label:<36} {len(encoders['json'](payload)) / 1024:8.1f} KB   {timings}")
+
+
+if __name__ == '__main__':
+    main()
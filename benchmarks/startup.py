@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Startup cost of management commands that never touch MongoDB
+
+Runs each command in a fresh interpreter several times and reports the
+median wall time, as the project ships (lazy client) and with a client
+built during startup the way ``portfolio/db.py`` used to at import time.
+``--ping`` additionally makes the eager client wait for the server.
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --command check --command "diffsettings --all"
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+import django
+django.setup()
+import portfolio.db
+if {eager}:
+    client = portfolio.db.get_client()
+    if os.getenv('STARTUP_PING'):
+        # Wait for the server, as the old import-time client's background
+        # connection did before a command could use it
+        try:
+            client.admin.command('ping')
+        except Exception:
+            pass
+from django.core.management import call_command
+call_command(*{argv}, stdout=open(os.devnull, 'w'))
+sys.stdout.write('client_created=%s' % (portfolio.db._client is not None))
+"""
+
+
+def run(command, eager, ping):
+    code = PROBE.format(eager=eager, argv=command.split())
+    env = dict(os.environ, STARTUP_PING='1' if ping else '')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        sys.exit(f"'{command}' failed:\n{result.stderr}")
+    return elapsed, result.stdout.strip().rpartition('client_created=')[2] == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--command', action='append', help="manage.py command (default: check, diffsettings, showmigrations)")
+    parser.add_argument('--ping', action='store_true',
+                        help="make the eager client reach the server, as a pre-fork client would")
+    args = parser.parse_args()
+    commands = args.command or ['check', 'diffsettings', 'showmigrations']
+
+    print(f"{'command':<20}{'lazy (ms)':>12}{'eager (ms)':>12}{'saved':>10}  lazy client created")
+    for command in commands:
+        lazy, eager, created = [], [], set()
+        for _ in range(args.runs):
+            elapsed, was_created = run(command, eager=False, ping=False)
+            lazy.append(elapsed)
+            created.add(was_created)
+            eager.append(run(command, eager=True, ping=args.ping)[0])
+        lazy_ms, eager_ms = statistics.median(lazy) * 1000, statistics.median(eager) * 1000
+        print(f"{command:<20}{lazy_ms:>12.1f}{eager_ms:>12.1f}{eager_ms - lazy_ms:>9.1f}ms  "
+              f"{'yes' if True in created else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
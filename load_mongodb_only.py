@@ -4,15 +4,11 @@ Load projects only from MongoDB - no external URLs
 """
 
 from portfolio.db import projects_collection
-from datetime import datetime
+from portfolio.importexport import ProjectImporter
 
 def load_mongodb_projects():
     """Load projects with only MongoDB data - no external URLs"""
     
-    # Clear existing projects first
-    projects_collection.delete_many({})
-    print("🗑️ Cleared existing projects from MongoDB")
-    
     mongodb_projects = [
         {
             'title': 'E-Commerce Platform',
@@ -23,8 +19,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/ecommerce-platform.jpg',  # Local image
             'featured': True,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         },
         {
             'title': 'Task Management App',
@@ -35,8 +30,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/task-management.jpg',  # Local image
             'featured': True,
-            'category': 'mobile',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'mobile'
         },
         {
             'title': 'Weather Dashboard',
@@ -47,8 +41,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/weather-dashboard.jpg',  # Local image
             'featured': False,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         },
         {
             'title': 'Blog Platform',
@@ -59,8 +52,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/blog-platform.jpg',  # Local image
             'featured': False,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         },
         {
             'title': 'Portfolio Admin System',
@@ -71,8 +63,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/portfolio-admin.jpg',  # Local image
             'featured': True,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         },
         {
             'title': 'MongoDB Data Analytics',
@@ -83,8 +74,7 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/analytics-dashboard.jpg',  # Local image
             'featured': False,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         },
         {
             'title': 'API Gateway Service',
@@ -95,22 +85,23 @@ def load_mongodb_projects():
             'github_url': '',  # No external URL
             'image_url': '/static/images/api-gateway.jpg',  # Local image
             'featured': True,
-            'category': 'web',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'category': 'web'
         }
     ]
     
     print("🚀 Loading MongoDB-only projects...")
     
-    projects_loaded = 0
+    # One bulk upsert keyed on title; projects not in the list are removed
+    # Also rebuilds the static export when STATIC_EXPORT_DIR is set
+    importer = ProjectImporter()
+    stats = importer.run(mongodb_projects, prune=True)
+    projects_loaded = stats['inserted'] + stats['updated']
     for project in mongodb_projects:
-        projects_collection.insert_one(project)
-        projects_loaded += 1
         print(f"  ✅ Loaded: {project['title']}")
-        print(f"     📝 Description: {project['description'][:50]}...")
-        print(f"     🛠️ Technologies: {', '.join(project['technologies'])}")
-        print(f"     ⭐ Featured: {project['featured']}")
-        print("")
+    print(f"  🗑️ Removed {stats['deleted']} projects not in the list")
+    if importer.export:
+        print(f"  📦 Static export rebuilt at {importer.export['output']}")
+    print("")
     
     # Show summary
     total_projects = projects_collection.count_documents({})
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_portfolio.settings')
+# Serve the MongoDB API through the Motor-backed async views
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
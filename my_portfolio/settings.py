@@ -43,19 +43,24 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Early, so it compresses what every later middleware produced
+    'portfolio.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so it times the view and its templates; see METRICS_ENABLED
+    'portfolio.metrics.ServerTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'my_portfolio.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that records render times for Server-Timing and /metrics
+        'BACKEND': 'portfolio.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -102,6 +107,11 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 # Logging configuration for production (Railway compatible)
+# LOG_FORMAT: 'json' (one object per line, for log aggregation) or 'simple'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Hand records to a background thread instead of writing them on the request thread
+LOGGING_QUEUE = os.getenv('LOGGING_QUEUE', 'True') == 'True'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -114,11 +124,22 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'portfolio.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        # Per-row admin logging: keep 10%, at most 50 lines a second
+        'sample_rows': {
+            '()': 'portfolio.log.SamplingFilter',
+            'rate': 0.1,
+            'max_per_second': 50,
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'simple',
         },
         'file': {
             'class': 'logging.FileHandler',
@@ -141,15 +162,34 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'portfolio.admin.rows': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'filters': ['sample_rows'],
+            'propagate': False,
+        },
     },
 }
 
 
 # Cache configuration
+# LocMemCache is per process, so with several gunicorn workers pick a shared
+# backend: CACHE_BACKEND=redis (CACHE_LOCATION=redis://host:6379/0, needs the
+# `redis` package), file (CACHE_LOCATION=/path/to/dir) or db (SQLite table,
+# run `python manage.py createcachetable` once).
+# The Timed* classes are Django's backends counting hits and misses for /metrics.
+CACHE_BACKENDS = {
+    'locmem': ('portfolio.metrics.TimedLocMemCache', 'unique-snowflake'),
+    'redis': ('portfolio.metrics.TimedRedisCache', 'redis://127.0.0.1:6379/0'),
+    'file': ('portfolio.metrics.TimedFileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'db': ('portfolio.metrics.TimedDatabaseCache', 'portfolio_cache'),
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
     }
 }
 
@@ -159,11 +199,151 @@ CACHES = {
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic writes content-hashed names plus .gz (and, with the `brotli`
+# package, .br) siblings; see portfolio.compression
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'portfolio.compression.CompressedManifestStaticFilesStorage'},
+}
+
 # Media files (User uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploaded CVs (see portfolio.cv_storage): stored by SHA-256 under
+# MEDIA_ROOT/CV_STORAGE_DIR, or in GridFS with CV_STORAGE=gridfs
+CV_STORAGE = os.getenv('CV_STORAGE', 'filesystem')
+CV_STORAGE_DIR = 'cv'
+CV_GRIDFS_BUCKET = 'cv'
+# Let the web server send CV files: '' (Django streams them), 'x-accel' (nginx,
+# internal location at CV_ACCEL_REDIRECT_PREFIX) or 'x-sendfile'
+CV_SENDFILE = os.getenv('CV_SENDFILE', '')
+CV_ACCEL_REDIRECT_PREFIX = '/protected-cv/'
+
+# Uploaded project images (see portfolio.images): resized to these widths as
+# WebP and JPEG, stored under MEDIA_ROOT/PROJECT_IMAGES_DIR
+PROJECT_IMAGE_WIDTHS = (400, 800, 1200)
+PROJECT_IMAGES_DIR = 'projects'
+PROJECT_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
 # Additional locations of static files
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+
+# Encoder of the projects, search and facets API responses (see
+# portfolio.encoders): 'orjson' (falls back to 'json' when the package isn't
+# installed), 'json' or the dotted path of a dumps(data) -> bytes function
+API_JSON_ENCODER = os.getenv('API_JSON_ENCODER', 'orjson')
+
+# Public projects API pagination
+PROJECTS_API_DEFAULT_LIMIT = 50
+PROJECTS_API_MAX_LIMIT = 100
+PROJECTS_SEARCH_DEFAULT_LIMIT = 20
+# Rows per page of the admin projects list and contacts inbox
+ADMIN_PROJECTS_PAGE_SIZE = 25
+ADMIN_CONTACTS_PAGE_SIZE = 50
+# Documents fetched per round trip while streaming a contacts export
+CONTACTS_EXPORT_BATCH_SIZE = 1000
+# Most projects accepted by one POST /api/projects/batch/ request. Bodies are
+# also bounded by DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB by default).
+PROJECTS_BATCH_MAX_SIZE = 500
+
+# MongoDB client (see portfolio.db). The client is created lazily in each
+# process. A short server selection timeout makes requests fail fast when
+# MongoDB is unreachable instead of hanging for PyMongo's default 30s.
+# MONGO_COMPRESSORS takes e.g. "zstd,zlib" (zstd needs the zstandard package).
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '20000'))
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')
+MONGO_APP_NAME = 'portfolio'
+
+# Run `manage.py ensure_indexes` automatically when the app starts
+MONGO_ENSURE_INDEXES_ON_STARTUP = False
+
+# Content version counters (see portfolio.versioning). Workers re-read the
+# version from MongoDB at most this often, bounding cross-worker staleness.
+CONTENT_VERSION_CACHE_TIMEOUT = 10
+PROJECTS_API_CACHE_TIMEOUT = 3600
+# Facet counts are derived incrementally between versions; this bounds how
+# long a derived count may live before it is aggregated afresh.
+PROJECTS_FACETS_CACHE_TIMEOUT = 3600
+
+# Render the project cards of the home page on the server. Pages are cached
+# per projects content version and cards per project contents.
+HOME_SERVER_RENDERED = os.getenv('HOME_SERVER_RENDERED', 'False') == 'True'
+HOME_PAGE_CACHE_TIMEOUT = 3600
+HOME_CARD_CACHE_TIMEOUT = 86400
+
+# In-process projects snapshot (see portfolio.snapshot). Follows a change
+# stream on replica sets and polls the content version otherwise; reads fall
+# back to MongoDB once it is more than MAX_STALENESS seconds behind.
+PROJECTS_SNAPSHOT_ENABLED = False
+PROJECTS_SNAPSHOT_MODE = 'auto'  # or 'polling' to skip change streams
+PROJECTS_SNAPSHOT_POLL_INTERVAL = 5
+PROJECTS_SNAPSHOT_MAX_STALENESS = 30
+
+# Use the async (Motor) API views. my_portfolio/asgi.py turns this on;
+# WSGI deployments keep the synchronous PyMongo views.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Write-behind contact submissions (see portfolio.contact_queue). Submissions
+# are journaled under CONTACTS_QUEUE_DIR and written in batches; when the
+# queue is full for CONTACTS_QUEUE_PUT_TIMEOUT seconds the API answers 503.
+CONTACTS_WRITE_BEHIND = False
+CONTACTS_QUEUE_DIR = os.path.join(BASE_DIR, 'var', 'contact-queue')
+CONTACTS_QUEUE_MAX_SIZE = 1000
+CONTACTS_QUEUE_BATCH_SIZE = 100
+CONTACTS_QUEUE_FLUSH_INTERVAL = 1.0
+CONTACTS_QUEUE_PUT_TIMEOUT = 0.5
+CONTACTS_QUEUE_FSYNC = True
+CONTACTS_QUEUE_RETRY_AFTER = 5
+
+# Token-bucket rate limits for the public write endpoints (see
+# portfolio.ratelimit). "5/m" allows bursts of 5, refilling 5 per minute.
+# Buckets live in the default cache, so use a shared CACHE_BACKEND when
+# running several workers.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_TRUST_X_FORWARDED_FOR = False
+RATE_LIMITS = {
+    'add_project': {'per_ip': '10/m', 'global': '60/m'},
+    'add_projects_batch': {'per_ip': '10/m', 'global': '60/m'},
+    'contact': {'per_ip': '5/m', 'global': '300/m'},
+}
+
+# Performance instrumentation: Server-Timing headers and a Prometheus /metrics endpoint
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>" and is refused
+# to everyone while this is unset; Server-Timing headers work either way
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Directory shared by the gunicorn workers, so /metrics covers all of them
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+# Dynamic responses of at least COMPRESSION_MIN_SIZE bytes are sent with
+# brotli (when installed) or gzip; see portfolio.compression
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Static export (see portfolio.static_export): `manage.py export_site` renders
+# the home page and projects API under STATIC_EXPORT_DIR, a symlink swapped to
+# each new build. When set, project writes rebuild it after STATIC_EXPORT_DELAY
+# seconds.
+STATIC_EXPORT_DIR = os.getenv('STATIC_EXPORT_DIR', '')
+STATIC_EXPORT_DELAY = 2.0
+STATIC_EXPORT_KEEP_BUILDS = 2
+
+# SQLite read replica of the projects collection (see portfolio.replica),
+# kept in the default database by `manage.py sync_replica`. With
+# PROJECTS_READ_SOURCE = 'replica' the projects API reads it while it is at
+# most REPLICA_MAX_STALENESS seconds behind, and MongoDB otherwise.
+PROJECTS_READ_SOURCE = os.getenv('PROJECTS_READ_SOURCE', 'mongo')
+REPLICA_MODE = 'auto'  # or 'polling' to skip change streams
+REPLICA_POLL_INTERVAL = 2
+REPLICA_MAX_STALENESS = 30
+# Seconds re-read before the updated_at watermark when polling
+REPLICA_WATERMARK_OVERLAP = 5
+REPLICA_BATCH_SIZE = 500
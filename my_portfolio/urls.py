@@ -15,13 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from portfolio.admin import portfolio_admin
+from portfolio.metrics import metrics_view
+from portfolio.views import cv_download, project_image, static_asset
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),
+    # Content-hashed image variants, served with immutable cache headers
+    path(f"{settings.MEDIA_URL.lstrip('/')}{settings.PROJECT_IMAGES_DIR}/<str:name>", project_image),
+    path('cv/<str:digest>/<str:filename>', cv_download),
     path('', include('portfolio.urls')),
     path('portfolio-admin/', portfolio_admin.urls),
     path('api/', include('portfolio.urls')),
@@ -31,3 +37,6 @@ urlpatterns = [
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+else:
+    # Hashed, precompressed files written by collectstatic
+    urlpatterns += [re_path(rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$", static_asset)]
@@ -1,17 +1,62 @@
 import logging
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib import admin
 from django.contrib import messages
-from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
 from django.urls import path
 from datetime import datetime
+from .cache import NamespacedCache
+from .contact_queue import get_contact_queue
+from .cv_storage import cv_url, get_cv_store
 from .db import projects_collection, contacts_collection
+from .facets import update_facets
+from .images import attach_project_image
+from .importexport import iter_contacts_csv, iter_contacts_ndjson
+from .static_export import schedule_export
+from .utils import (
+    QueryParamError, build_contact_filter, decode_cursor, keyset_page, keyset_query, parse_project_sort,
+    stamp_project,
+)
+from .versioning import bump_content_version, get_content_version
+from .views import find_projects
 
 # Configure logging
 logger = logging.getLogger('portfolio.admin')
+# Per-row lines; sampled and rate-capped by the ``sample_rows`` filter
+row_logger = logging.getLogger('portfolio.admin.rows')
+
+# Sortable columns of the projects list; each is backed by a (field, _id) index
+ADMIN_SORT_COLUMNS = ('title', 'year', 'created_at')
+
+# Shared cache groups: one invalidate() clears them on every worker
+projects_cache = NamespacedCache('admin_projects')
+profile_cache = NamespacedCache('admin_profile')
+
+def admin_projects_page(version, field, direction, after, before, limit):
+    """One page of projects for the admin list; see :func:`keyset_page`"""
+    def fetch(walk, position, count):
+        return find_projects(version, {}, field, walk, position, count)[0]
+
+    page = keyset_page(fetch, field, direction, after, before, limit)
+    projects = page.pop('items')
+    for project in projects:
+        project.pop('_id', None)
+    page['projects'] = projects
+    return page
+
+
+def sort_links(field, direction):
+    """``{column: (sort parameter, arrow)}`` for the sortable column headers"""
+    links = {}
+    for name in ADMIN_SORT_COLUMNS:
+        if name == field:
+            links[name] = (name if direction < 0 else f'-{name}', '▼' if direction < 0 else '▲')
+        else:
+            # Titles read best A-Z, years and dates newest first
+            links[name] = (name if name == 'title' else f'-{name}', '')
+    return links
+
 
 # Custom Admin Views
 class CustomAdminSite(admin.AdminSite):
@@ -27,20 +72,19 @@ class CustomAdminSite(admin.AdminSite):
             path('portfolio-projects/add/', self.admin_view(self.add_project), name='add_project'),
             path('portfolio-projects/delete/<str:project_title>/', self.admin_view(self.delete_project), name='delete_project'),
             path('portfolio-contacts/', self.admin_view(self.contacts_view), name='contacts'),
+            path('portfolio-contacts/export/', self.admin_view(self.export_contacts), name='export_contacts'),
             path('profile/', self.admin_view(self.profile_view), name='profile'),
             path('profile/update/', self.admin_view(self.update_profile), name='update_profile'),
         ]
         return custom_urls + urls
     
-    @method_decorator(cache_page(300), name='index_view')  # Cache for 5 minutes
-    @method_decorator(vary_on_headers('User-Agent'), name='index_view')
     def index_view(self, request):
         # Try to get from cache first
         cache_key = 'admin_dashboard_stats'
-        cached_data = cache.get(cache_key)
+        cached_data = projects_cache.get(cache_key)
         
         if cached_data:
-            logger.info(f"📊 Dashboard stats loaded from cache")
+            logger.info("📊 Dashboard stats loaded from cache")
             projects_count, contacts_count = cached_data
         else:
             # Get fresh data
@@ -48,56 +92,47 @@ class CustomAdminSite(admin.AdminSite):
             contacts_count = contacts_collection.count_documents({})
             
             # Cache for 5 minutes
-            cache.set(cache_key, (projects_count, contacts_count), 300)
-            logger.info(f"🎯 Admin dashboard accessed - Projects: {projects_count}, Contacts: {contacts_count}")
+            projects_cache.set(cache_key, (projects_count, contacts_count), 300)
+            logger.info("🎯 Admin dashboard accessed - Projects: %s, Contacts: %s", projects_count, contacts_count)
         
+        contact_queue = get_contact_queue()
         return render(request, 'admin/index.html', {
             'projects_count': projects_count,
             'contacts_count': contacts_count,
+            'contact_queue': contact_queue.stats() if contact_queue else None,
             'site_header': self.site_header,
             'site_title': self.site_title,
             'has_permission': True
         })
     
-    @method_decorator(cache_page(600), name='projects_view')  # Cache for 10 minutes
     def projects_view(self, request):
-        # Try to get from cache first
-        cache_key = 'admin_projects_list'
-        cached_projects = cache.get(cache_key)
-        
-        if cached_projects:
-            projects = cached_projects
-            logger.info(f"📋 Projects list loaded from cache")
-        else:
-            # Get fresh data with projection for performance
-            projects = list(projects_collection.find(
-                {"_id": 0}, 
-                {"title": 1, "category": 1, "year": 1, "featured": 1, "created_at": 1, "technologies": 1, "live_url": 1, "github_url": 1, "image_url": 1, "description": 1}
-            ))
-            
-            # Sort by creation date (newest first)
-            projects.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
-            # Cache for 10 minutes
-            cache.set(cache_key, projects, 600)
-            logger.info(f"📋 Projects list viewed - Total projects: {len(projects)}")
-            for i, project in enumerate(projects):
-                logger.info(f"  📁 {i+1}. {project.get('title', 'Unknown')}")
-                logger.info(f"     📱 Category: {project.get('category', 'Unknown')}")
-                logger.info(f"     📅 Year: {project.get('year', 'Unknown')}")
-                logger.info(f"     ⭐ Featured: {project.get('featured', False)}")
-                logger.info(f"     🛠️ Techs: {len(project.get('technologies', []))} technologies")
-                logger.info(f"     🔗 Live URL: {'Yes' if project.get('live_url') else 'No'}")
-                logger.info(f"     💻 GitHub: {'Yes' if project.get('github_url') else 'No'}")
-                logger.info(f"     📝 Description: {'Yes' if project.get('description') else 'No'}")
-        
-        # Debug: Check if projects are being passed to template
-        logger.info(f"🔍 DEBUG: Passing {len(projects)} projects to template")
-        for i, project in enumerate(projects[:3]):  # Log first 3 projects
-            logger.info(f"🔍 DEBUG: Project {i+1}: {project.get('title', 'No title')} - Fields: {list(project.keys())}")
-        
+        params = request.GET
+        try:
+            field, direction = parse_project_sort(params.get('sort'))
+            after = decode_cursor(params['after'], field, direction) if params.get('after') else None
+            before = decode_cursor(params['before'], field, direction) if params.get('before') else None
+        except QueryParamError as e:
+            messages.error(request, f'Invalid page: {e}')
+            return redirect('/portfolio-admin/portfolio-projects/')
+        sort = f"{'-' if direction < 0 else ''}{field}"
+
+        # Pages are cached per content version, so API writes show up too
+        version = get_content_version()
+        cache_key = f"page:{version}:{sort}:{params.get('after', '')}:{params.get('before', '')}"
+        page = projects_cache.get(cache_key)
+        if page is None:
+            page = admin_projects_page(version, field, direction, after, before, settings.ADMIN_PROJECTS_PAGE_SIZE)
+            page['total'] = projects_collection.estimated_document_count()
+            projects_cache.set(cache_key, page, 600)
+        logger.info("📋 Projects list viewed - %s of %s projects, sorted by %s", len(page['projects']), page['total'], sort)
+        if row_logger.isEnabledFor(logging.INFO):
+            for project in page['projects']:
+                row_logger.info("📁 Project row: %s (%s)", project.get('title'), project.get('year'))
+
         return render(request, 'admin/projects.html', {
-            'projects': projects,
+            **page,
+            'sort': sort,
+            'sort_links': sort_links(field, direction),
             'site_header': self.site_header,
             'has_permission': True
         })
@@ -105,8 +140,7 @@ class CustomAdminSite(admin.AdminSite):
     def add_project(self, request):
         if request.method == 'POST':
             # Clear cache when new project is added
-            cache.delete('admin_projects_list')
-            cache.delete('admin_dashboard_stats')
+            projects_cache.invalidate()
             
             technologies = request.POST.get('technologies', '').split(',')
             technologies = [tech.strip() for tech in technologies if tech.strip()]
@@ -125,23 +159,28 @@ class CustomAdminSite(admin.AdminSite):
             }
             
             # Log project creation with colors
-            logger.info(f"\033[92m🚀\033[0m Creating new project: \033[94m{project_data['title']}\033[0m")
-            logger.info(f"\033[94m📁\033[0m Technologies: \033[93m{', '.join(technologies)}\033[0m")
-            logger.info(f"\033[94m🔗\033[0m Live URL: \033[93m{project_data['live_url']}\033[0m")
-            logger.info(f"\033[94m📱\033[0m Category: \033[93m{project_data['category']}\033[0m")
-            logger.info(f"\033[94m⭐\033[0m Featured: \033[93m{project_data['featured']}\033[0m")
-            logger.info(f"\033[94m🕐\033[0m Created at: \033[93m{project_data['created_at']}\033[0m")
+            logger.info("🚀 Creating new project: %s", project_data['title'])
+            logger.info("📁 Technologies: %s", ', '.join(technologies))
+            logger.info("🔗 Live URL: %s", project_data['live_url'])
+            logger.info("📱 Category: %s", project_data['category'])
+            logger.info("⭐ Featured: %s", project_data['featured'])
+            logger.info("🕐 Created at: %s", project_data['created_at'])
             
             try:
-                result = projects_collection.insert_one(project_data)
-                logger.info(f"\033[92m✅\033[0m Project '\033[94m{project_data['title']}\033[0m' added successfully with ID: \033[93m{result.inserted_id}\033[0m")
+                if request.FILES.get('image'):
+                    attach_project_image(project_data, request.FILES['image'])
+                    logger.info("🖼️ Image stored as %s variants", len(project_data['image']['variants']))
+                result = projects_collection.insert_one(stamp_project(project_data))
+                update_facets(bump_content_version(), added=[project_data])
+                schedule_export()
+                logger.info("✅ Project '%s' added successfully with ID: %s", project_data['title'], result.inserted_id)
                 messages.success(request, f'\033[92m🎉\033[0m Project "{project_data["title"]}" added successfully at {project_data["created_at"]}!')
                 return redirect('/portfolio-admin/portfolio-projects/')
             except Exception as e:
-                logger.error(f"\033[91m❌\033[0m Error adding project: \033[31m{str(e)}\033[0m")
+                logger.error("❌ Error adding project: %s", e)
                 messages.error(request, f'\033[91m❌\033[0m Error adding project: {str(e)}')
         
-        logger.info(f"\033[94m📝\033[0m Add project form accessed")
+        logger.info("📝 Add project form accessed")
         return render(request, 'admin/add_project.html', {
             'site_header': self.site_header,
             'has_permission': True
@@ -149,47 +188,93 @@ class CustomAdminSite(admin.AdminSite):
     
     def delete_project(self, request, project_title):
         # Clear cache when project is deleted
-        cache.delete('admin_projects_list')
-        cache.delete('admin_dashboard_stats')
+        projects_cache.invalidate()
         
-        logger.info(f"\033[91m🗑️\033[0m Attempting to delete project: \033[94m{project_title}\033[0m")
+        logger.info("🗑️ Attempting to delete project: %s", project_title)
         
         try:
-            result = projects_collection.delete_one({'title': project_title})
-            if result.deleted_count > 0:
-                logger.info(f"\033[92m✅\033[0m Project '\033[94m{project_title}\033[0m' deleted successfully")
+            deleted = projects_collection.find_one_and_delete({'title': project_title})
+            if deleted is not None:
+                update_facets(bump_content_version(), removed=[deleted])
+                schedule_export()
+                logger.info("✅ Project '%s' deleted successfully", project_title)
                 messages.success(request, f'Project "{project_title}" deleted successfully!')
             else:
-                logger.warning(f"\033[93m⚠️\033[0m Project '\033[94m{project_title}\033[0m' not found for deletion")
+                logger.warning("⚠️ Project '%s' not found for deletion", project_title)
                 messages.warning(request, f'Project "{project_title}" not found!')
         except Exception as e:
-            logger.error(f"\033[91m❌\033[0m Error deleting project: \033[31m{str(e)}\033[0m")
+            logger.error("❌ Error deleting project: %s", e)
             messages.error(request, f'Error deleting project: {str(e)}')
         
         return redirect('/portfolio-admin/portfolio-projects/')
     
     def contacts_view(self, request):
-        contacts = list(contacts_collection.find({}, {"_id": 0}))
-        
-        logger.info(f"\033[94m📧\033[0m Contacts list viewed - Total contacts: \033[93m{len(contacts)}\033[0m")
-        for contact in contacts:
-            logger.info(f"  👤 {contact.get('name', 'Unknown')} (\033[93m{contact.get('email', 'Unknown')}\033[0m)")
-        
+        params = request.GET
+        try:
+            query = build_contact_filter(params)
+            after = decode_cursor(params['after'], 'timestamp', -1) if params.get('after') else None
+            before = decode_cursor(params['before'], 'timestamp', -1) if params.get('before') else None
+        except QueryParamError as e:
+            messages.error(request, f'Invalid search: {e}')
+            return redirect('/portfolio-admin/portfolio-contacts/')
+
+        def fetch(walk, position, count):
+            page_query, sort = keyset_query(query, 'timestamp', walk, position)
+            return list(contacts_collection.find(page_query).sort(sort).limit(count))
+
+        page = keyset_page(fetch, 'timestamp', -1, after, before, settings.ADMIN_CONTACTS_PAGE_SIZE)
+        contacts = page['items']
+        logger.info("📧 Contacts inbox viewed - %s contacts on this page", len(contacts))
+        if row_logger.isEnabledFor(logging.INFO):
+            for contact in contacts:
+                row_logger.info("📧 Contact row: %s <%s>", contact.get('name'), contact.get('email'))
+
+        # Search terms carried over to the paging and export links
+        search = params.copy()
+        for key in ('after', 'before', 'format'):
+            search.pop(key, None)
         return render(request, 'admin/contacts.html', {
             'contacts': contacts,
+            'next_cursor': page['next_cursor'],
+            'previous_cursor': page['previous_cursor'],
+            'search': search,
+            'search_query': search.urlencode(),
             'site_header': self.site_header,
             'has_permission': True
         })
+
+    def export_contacts(self, request):
+        """Stream the contacts matching the inbox search as CSV or NDJSON"""
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            messages.error(request, 'Export format must be csv or ndjson')
+            return redirect('/portfolio-admin/portfolio-contacts/')
+        try:
+            query = build_contact_filter(request.GET)
+        except QueryParamError as e:
+            messages.error(request, f'Invalid search: {e}')
+            return redirect('/portfolio-admin/portfolio-contacts/')
+
+        cursor = (contacts_collection.find(query)
+                  .sort([('timestamp', -1), ('_id', -1)])
+                  .batch_size(settings.CONTACTS_EXPORT_BATCH_SIZE))
+        if export_format == 'csv':
+            response = StreamingHttpResponse(iter_contacts_csv(cursor), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(iter_contacts_ndjson(cursor), content_type='application/x-ndjson')
+        filename = f"contacts-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        logger.info("📤 Contacts export started (%s)", export_format)
+        return response
     
-    @method_decorator(cache_page(900), name='profile_view')  # Cache for 15 minutes
     def profile_view(self, request):
         # Try to get from cache first
         cache_key = 'admin_profile_data'
-        cached_profile = cache.get(cache_key)
+        cached_profile = profile_cache.get(cache_key)
         
         if cached_profile:
             profile = cached_profile
-            logger.info(f"👤 Profile data loaded from cache")
+            logger.info("👤 Profile data loaded from cache")
         else:
             # Get or create profile data
             profile = contacts_collection.find_one({'type': 'profile'})
@@ -213,8 +298,8 @@ class CustomAdminSite(admin.AdminSite):
                 contacts_collection.insert_one(profile)
             
             # Cache for 15 minutes
-            cache.set(cache_key, profile, 900)
-            logger.info(f"\033[94m👤\033[0m Profile viewed - Name: \033[93m{profile.get('name', 'Unknown')}\033[0m")
+            profile_cache.set(cache_key, profile, 900)
+            logger.info("👤 Profile viewed - Name: %s", profile.get('name', 'Unknown'))
         
         return render(request, 'admin/profile.html', {
             'profile': profile,
@@ -225,7 +310,7 @@ class CustomAdminSite(admin.AdminSite):
     def update_profile(self, request):
         if request.method == 'POST':
             # Clear cache when profile is updated
-            cache.delete('admin_profile_data')
+            profile_cache.invalidate()
             
             profile_data = {
                 'name': request.POST.get('name', ''),
@@ -249,35 +334,25 @@ class CustomAdminSite(admin.AdminSite):
             if 'cv_file' in request.FILES:
                 cv_file = request.FILES['cv_file']
                 
-                # Create CV upload directory if it doesn't exist
-                import os
-                cv_upload_dir = os.path.join('media', 'cv')
-                os.makedirs(cv_upload_dir, exist_ok=True)
-                
-                # Save CV file
-                cv_filename = f"cv_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{cv_file.name}"
-                cv_file_path = os.path.join(cv_upload_dir, cv_filename)
-                
-                # Write file to disk
-                with open(cv_file_path, 'wb+') as destination:
-                    for chunk in cv_file.chunks():
-                        destination.write(chunk)
+                # Stored under its SHA-256, so re-uploading the same file is free
+                digest, size = get_cv_store().put(cv_file.chunks())
                 
-                # Store file path in database
-                profile_data['cv_file'] = f"/media/cv/{cv_filename}"
+                # Store the download URL in database
+                profile_data['cv_sha256'] = digest
+                profile_data['cv_file'] = cv_url(digest, cv_file.name)
                 profile_data['cv_filename'] = cv_file.name
                 profile_data['cv_file_size'] = f"{cv_file.size / 1024 / 1024:.2f} MB"
                 profile_data['cv_file_type'] = cv_file.content_type
                 
-                logger.info(f"\033[94m📄\033[0m CV uploaded: \033[93m{cv_file.name}\033[0m ({cv_file.size / 1024 / 1024:.2f} MB)")
-                logger.info(f"\033[94m💾\033[0m CV saved to: \033[93m{cv_file_path}\033[0m")
+                logger.info("📄 CV uploaded: %s (%.2f MB)", cv_file.name, cv_file.size / 1024 / 1024)
+                logger.info("💾 CV stored as: %s", digest)
             
-            logger.info(f"\033[92m🚀\033[0m Updating profile: \033[94m{profile_data['name']}\033[0m")
-            logger.info(f"\033[94m📧\033[0m Email: \033[93m{profile_data['email']}\033[0m")
-            logger.info(f"\033[94m💼\033[0m Title: \033[93m{profile_data['title']}\033[0m")
-            logger.info(f"\033[94m🛠️\033[0m Skills: \033[93m{', '.join(profile_data['skills'])}\033[0m")
-            logger.info(f"\033[94m📍\033[0m Location: \033[93m{profile_data['location']}\033[0m")
-            logger.info(f"\033[94m🕐\033[0m Updated at: \033[93m{profile_data['updated_at']}\033[0m")
+            logger.info("🚀 Updating profile: %s", profile_data['name'])
+            logger.info("📧 Email: %s", profile_data['email'])
+            logger.info("💼 Title: %s", profile_data['title'])
+            logger.info("🛠️ Skills: %s", ', '.join(profile_data['skills']))
+            logger.info("📍 Location: %s", profile_data['location'])
+            logger.info("🕐 Updated at: %s", profile_data['updated_at'])
             
             try:
                 contacts_collection.update_one(
@@ -285,11 +360,11 @@ class CustomAdminSite(admin.AdminSite):
                     {'$set': profile_data},
                     upsert=True
                 )
-                logger.info(f"\033[92m✅\033[0m Profile updated successfully!")
+                logger.info("✅ Profile updated successfully!")
                 messages.success(request, f'\033[92m🎉\033[0m Profile "{profile_data["name"]}" updated successfully!')
                 return redirect('/portfolio-admin/profile/')
             except Exception as e:
-                logger.error(f"\033[91m❌\033[0m Error updating profile: \033[31m{str(e)}\033[0m")
+                logger.error("❌ Error updating profile: %s", e)
                 messages.error(request, f'\033[91m❌\033[0m Error updating profile: {str(e)}')
         
         # Get current profile for form
@@ -1,6 +1,24 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger('portfolio')
 
 
 class PortfolioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portfolio'
+
+    def ready(self):
+        if getattr(settings, 'LOGGING_QUEUE', False):
+            from .log import install_queue_logging
+            install_queue_logging()
+
+        if getattr(settings, 'MONGO_ENSURE_INDEXES_ON_STARTUP', False):
+            from .indexes import ensure_indexes
+            try:
+                ensure_indexes()
+            except Exception as e:
+                # Never block startup on index maintenance
+                logger.error(f"❌ Could not ensure MongoDB indexes: {e}")
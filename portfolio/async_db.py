@@ -0,0 +1,30 @@
+"""
+Async MongoDB access for the ASGI views
+
+Motor clients are bound to the event loop they were created on, so one
+client is kept per running loop and shared by every request on it. WSGI
+deployments keep using the synchronous client in ``portfolio.db``.
+"""
+
+import asyncio
+import weakref
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .db import MONGO_URI, MONGO_DB_NAME, client_options
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """The Motor client bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncIOMotorClient(MONGO_URI, io_loop=loop, **client_options())
+        _clients[loop] = client
+    return client
+
+
+def get_async_db():
+    return get_async_client()[MONGO_DB_NAME]
@@ -0,0 +1,211 @@
+"""
+Async versions of the MongoDB API views for ASGI deployments
+
+Selected by ``ASYNC_VIEWS`` (set automatically by ``my_portfolio/asgi.py``).
+They share request parsing and response shaping with ``portfolio.views`` but
+talk to MongoDB through Motor, so a request waiting on the database does
+not hold a thread.
+
+Django's ``csrf_exempt``, ``require_http_methods`` and ``condition``
+decorators only learned to wrap coroutines in Django 5.0, so the same
+behaviour is spelled out here.
+"""
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.log import log_response
+from pymongo.errors import BulkWriteError
+
+from .async_db import get_async_db
+from .contact_queue import get_contact_queue
+from .encoders import APIJsonResponse
+from .facets import aget_facets, aupdate_facets, facets_payload
+from .images import attach_project_image
+from .db import projects_collection, contacts_collection
+from .ratelimit import rate_limit
+from .repository import aget_project_repository
+from .search import get_search_index
+from .snapshot import get_snapshot, matches
+from .static_export import schedule_export
+from .utils import (
+    QueryParamError, parse_projects_params, parse_fields, project_projection, projects_page,
+    projects_cache_key, project_from_data, project_request_data, contact_from_data, apply_batch_write_errors,
+    parse_search_params, search_payload, stamp_project,
+)
+from .versioning import aget_content_version, abump_content_version
+from .views import batch_response, created_projects, parse_project_batch, queued_contact_response
+
+
+def require_methods(methods):
+    """Async ``require_http_methods``; goes outside ``rate_limit`` so a wrong method spends no token"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = HttpResponseNotAllowed(methods)
+                log_response("Method Not Allowed (%s): %s", request.method, request.path,
+                             response=response, request=request)
+                return response
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def get_projects_api(request):
+    """Async :func:`portfolio.views.get_projects_api`"""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    version = await aget_content_version()
+    etag = quote_etag(f"projects-v{version}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = await _projects_response(request, version)
+    if response.status_code in (200, 304) and not response.has_header("ETag"):
+        response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+async def _projects_response(request, version):
+    params = request.GET
+    cache_key = projects_cache_key(version, params)
+    cached = await cache.aget(cache_key)
+    if cached is not None:
+        return APIJsonResponse(cached)
+
+    try:
+        filters, field, direction, limit, after = parse_projects_params(params)
+        fields = parse_fields(params.get("fields"))
+    except QueryParamError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    snapshot = None
+    if getattr(settings, "PROJECTS_SNAPSHOT_ENABLED", False):
+        # First call in a worker loads the snapshot, so keep it off the loop
+        snapshot = await sync_to_async(get_snapshot)()
+    if snapshot is not None and snapshot.is_fresh(version):
+        projects = snapshot.find(filters, field, direction, after=after, limit=limit + 1)
+    else:
+        repository = await aget_project_repository(version)
+        projects = await repository.afind(
+            filters, field, direction, after, limit + 1, project_projection(fields, field))
+    payload = projects_page(projects, limit, field, direction, fields)
+    await cache.aset(cache_key, payload, settings.PROJECTS_API_CACHE_TIMEOUT)
+    response = APIJsonResponse(payload)
+    if snapshot is not None:
+        response["X-Snapshot-Staleness"] = f"{snapshot.staleness():.3f}"
+    return response
+
+
+async def search_projects_api(request):
+    """Async :func:`portfolio.views.search_projects_api`"""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    version = await aget_content_version()
+    etag = quote_etag(f"projects-v{version}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            query, filters, limit = parse_search_params(request.GET)
+        except QueryParamError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        # Catching up with a new content version reads MongoDB
+        index = await sync_to_async(get_search_index)()
+        where = (lambda project: matches(project, filters)) if filters else None
+        response = APIJsonResponse(search_payload(query, index.search(query, limit=limit, where=where)))
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+async def project_facets_api(request):
+    """Async :func:`portfolio.views.project_facets_api`"""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    version = await aget_content_version()
+    etag = quote_etag(f"projects-v{version}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = APIJsonResponse(facets_payload(await aget_facets(version)))
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@require_methods(["POST"])
+@rate_limit("add_project")
+async def add_project_api(request):
+    """Async :func:`portfolio.views.add_project_api`"""
+    try:
+        data = project_request_data(request)
+        project = stamp_project(project_from_data(data))
+        if 'image' in request.FILES:
+            # Resizing is CPU-bound; keep it off the event loop
+            await sync_to_async(attach_project_image, thread_sensitive=False)(project, request.FILES['image'])
+
+        result = await get_async_db()[projects_collection.name].insert_one(project)
+        await aupdate_facets(await abump_content_version(), added=[project])
+        schedule_export()
+        return JsonResponse({
+            "message": "Project added successfully",
+            "project_id": str(result.inserted_id)
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+add_project_api.csrf_exempt = True
+
+
+@require_methods(["POST"])
+@rate_limit("add_projects_batch")
+async def add_projects_batch_api(request):
+    """Async :func:`portfolio.views.add_projects_batch_api`"""
+    parsed = parse_project_batch(request)
+    if isinstance(parsed, JsonResponse):
+        return parsed
+    projects, results = parsed
+
+    if projects:
+        try:
+            await get_async_db()[projects_collection.name].insert_many(projects, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            apply_batch_write_errors(results, projects, e.details.get("writeErrors", []))
+    created = created_projects(projects, results)
+    if created:
+        await aupdate_facets(await abump_content_version(), added=created)
+        schedule_export()
+    return batch_response(results)
+
+add_projects_batch_api.csrf_exempt = True
+
+
+@require_methods(["POST"])
+@rate_limit("contact")
+async def contact_api(request):
+    """Async :func:`portfolio.views.contact_api`"""
+    try:
+        data = json.loads(request.body)
+        contact_data = contact_from_data(data)
+
+        if settings.CONTACTS_WRITE_BEHIND:
+            # Starting the queue replays journals and submit() may wait for
+            # queue space and fsyncs, so keep both off the loop
+            contact_queue = await sync_to_async(get_contact_queue)()
+            return queued_contact_response(await sync_to_async(contact_queue.submit)(contact_data))
+        await get_async_db()[contacts_collection.name].insert_one(contact_data)
+        return JsonResponse({"status": "success", "message": "Contact form submitted"})
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+contact_api.csrf_exempt = True
@@ -0,0 +1,73 @@
+"""
+Namespaced cache helpers on top of Django's cache framework
+
+Keys are grouped into namespaces whose version number lives in the cache
+itself. Bumping that number makes every key of the namespace unreachable at
+once, on every worker that shares the cache backend (see ``CACHE_BACKEND``
+in settings), instead of deleting keys one by one.
+
+Only the Redis and Memcached backends increment atomically. The others
+implement ``incr`` as a read followed by a write, so two workers
+invalidating at once could both write the same next version, and entries
+cached under it in between would survive the second invalidation. On those
+backends the version is bumped to the clock in milliseconds instead (or
+one past the current version, if that is higher), a value no earlier bump
+can have written.
+"""
+
+import logging
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger('portfolio.cache')
+
+
+class NamespacedCache:
+    """A group of cache keys that can be invalidated with one version bump"""
+
+    def __init__(self, namespace, alias='default'):
+        self.namespace = namespace
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f'cache_ns:{self.namespace}'
+
+    def version(self):
+        """Current namespace version, seeding it if the backend has none"""
+        version = self.cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so a re-seed after eviction can never
+            # resurrect entries written under an earlier version
+            self.cache.add(self.version_key, int(time.time() * 1000), None)
+            version = self.cache.get(self.version_key)
+        return version
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default, version=self.version())
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout, version=self.version())
+
+    def invalidate(self):
+        """Invalidate every key in the namespace and return the new version"""
+        cache = self.cache
+        if isinstance(cache, (RedisCache, BaseMemcachedCache)):
+            try:
+                version = cache.incr(self.version_key)
+            except ValueError:
+                version = None  # Version key missing (evicted or never set)
+        else:
+            version = None
+        if version is None:
+            version = max(int(time.time() * 1000), (cache.get(self.version_key) or 0) + 1)
+            cache.set(self.version_key, version, None)
+        logger.info(f"🧹 Cache namespace '{self.namespace}' invalidated (v{version})")
+        return version
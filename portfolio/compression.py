@@ -0,0 +1,220 @@
+"""
+Response compression and precompressed static files
+
+- :class:`CompressedManifestStaticFilesStorage` is the ``collectstatic``
+  storage: on top of Django's content-hashed names (``app.3f1c9a0b2d4e.css``)
+  it writes ``.gz`` siblings, and ``.br`` siblings when the ``brotli``
+  package is installed, for every text asset worth compressing. Assets are
+  compressed once at deploy time at the highest levels.
+- :func:`static_response` serves ``STATIC_ROOT`` when ``DEBUG`` is off,
+  picking the best precompressed sibling the client accepts. Hashed names
+  never change contents, so they are sent with ``Cache-Control: immutable``.
+- :class:`CompressionMiddleware` compresses dynamic responses of at least
+  ``COMPRESSION_MIN_SIZE`` bytes, with brotli when available and accepted,
+  otherwise gzip, at levels cheap enough to run on every request.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+from django.utils.text import compress_string
+
+from .images import IMMUTABLE_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Preferred first; the static siblings use the same order
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|manifest\+json|.*\+json|.*\+xml)|image/svg\+xml|font/(ttf|otf))')
+# ManifestStaticFilesStorage names: app.css -> app.3f1c9a0b2d4e.css
+HASHED_NAME_RE = re.compile(r'^(?P<base>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)?$')
+# Unhashed static names can change contents on the next deploy
+STATIC_CACHE_CONTROL = 'public, max-age=60'
+
+
+def is_compressible(content_type):
+    return bool(content_type) and COMPRESSIBLE_TYPES.match(content_type.split(';')[0].strip().lower()) is not None
+
+
+def accepted_encodings(header):
+    """Content codings an ``Accept-Encoding`` header allows, e.g. ``{'gzip', 'br'}``"""
+    accepted, refused, wildcard = set(), set(), False
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().lower().partition(';')
+        coding, quality = coding.strip(), 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                continue
+        if not coding:
+            continue
+        if coding == '*':
+            wildcard = quality > 0
+        elif quality > 0:
+            accepted.add(coding)
+        else:
+            refused.add(coding)
+    if wildcard:
+        accepted |= set(SUFFIXES) - refused
+    return accepted
+
+
+def choose_encoding(header, available=ENCODINGS):
+    accepted = accepted_encodings(header)
+    return next((encoding for encoding in available if encoding in accepted), None)
+
+
+def compress(data, encoding, static=False):
+    """``data`` compressed with ``encoding``; ``static`` trades time for size"""
+    if encoding == 'br':
+        quality = 11 if static else getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        return brotli.compress(data, quality=quality)
+    if static:
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    # Same as GZipMiddleware: random bytes in the header as a BREACH mitigation
+    return compress_string(data, max_random_bytes=getattr(settings, 'COMPRESSION_GZIP_RANDOM_BYTES', 100))
+
+
+def write_compressed_siblings(path, min_size=256):
+    """Write the ``.gz``/``.br`` siblings of ``path`` that are missing or older than it"""
+    if not os.path.isfile(path):
+        return []
+    mtime = os.path.getmtime(path)
+    stale = [encoding for encoding in ENCODINGS
+             if not os.path.exists(path + SUFFIXES[encoding])
+             or os.path.getmtime(path + SUFFIXES[encoding]) < mtime]
+    if not stale:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    for encoding in stale:
+        target = path + SUFFIXES[encoding]
+        compressed = compress(data, encoding, static=True) if len(data) >= min_size else None
+        if compressed is None or len(compressed) >= len(data) * 0.95:
+            # Not worth sending; don't leave a sibling of older contents behind
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        temporary = f'{target}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(compressed)
+        os.replace(temporary, target)
+        written.append(target)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` that also writes ``.gz`` and ``.br`` siblings"""
+
+    # Below this, the headers outweigh the savings
+    min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            self.compress_file(name)
+
+    def compress_file(self, name):
+        """Write the siblings of ``name`` that are missing or older than it"""
+        if not is_compressible(mimetypes.guess_type(name)[0]):
+            return []
+        return write_compressed_siblings(self.path(name), self.min_size)
+
+
+def is_hashed_name(name):
+    """Whether ``name`` is a content-hashed name from the ``collectstatic`` manifest"""
+    match = HASHED_NAME_RE.match(name)
+    if match is None:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    return hashed_files.get(match['base'] + (match['ext'] or '')) == name
+
+
+def static_response(request, path, document_root=None):
+    """Serve ``path`` from ``STATIC_ROOT``, precompressed when the client allows
+
+    Returns a 304 for a matching ``If-Modified-Since`` and raises ``Http404``
+    for a missing file (``SuspiciousFileOperation`` for one outside the root).
+    """
+    document_root = document_root or settings.STATIC_ROOT
+    fullpath = safe_join(document_root, path)
+    if not os.path.isfile(fullpath) or any(fullpath.endswith(suffix) for suffix in SUFFIXES.values()):
+        raise Http404("No such file")
+    stat = os.stat(fullpath)
+    response = get_conditional_response(request, last_modified=int(stat.st_mtime))
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    if response is None:
+        served, encoding = fullpath, None
+        if is_compressible(content_type):
+            accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+            for candidate in ENCODINGS:
+                if candidate in accepted and os.path.isfile(fullpath + SUFFIXES[candidate]):
+                    served, encoding = fullpath + SUFFIXES[candidate], candidate
+                    break
+        response = FileResponse(open(served, 'rb'), content_type=content_type)
+        # FileResponse names the file it sends; inline static assets don't need that
+        del response['Content-Disposition']
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    if is_compressible(content_type):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    hashed = is_hashed_name(path.replace('\\', '/'))
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if hashed else STATIC_CACHE_CONTROL
+    return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress dynamic responses with brotli or gzip
+
+    Leaves alone streaming responses (files, which are either precompressed
+    or already compressed formats), partial content, responses that are
+    already encoded or marked ``no-transform``, and anything smaller than
+    ``COMPRESSION_MIN_SIZE``.
+    """
+
+    def process_response(self, request, response):
+        if (response.streaming or response.status_code == 206 or response.has_header('Content-Encoding')
+                or 'no-transform' in response.get('Cache-Control', '')):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        if not is_compressible(response.get('Content-Type')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        # The compressed bytes differ from the uncompressed representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,242 @@
+"""
+Write-behind queue for contact form submissions
+
+With ``CONTACTS_WRITE_BEHIND`` enabled, ``contact_api`` hands submissions to
+a bounded in-process queue instead of waiting for MongoDB. A background
+thread writes them with ``insert_many`` once ``CONTACTS_QUEUE_BATCH_SIZE``
+submissions are waiting or ``CONTACTS_QUEUE_FLUSH_INTERVAL`` seconds have
+passed.
+
+Every submission is appended to a journal segment in ``CONTACTS_QUEUE_DIR``
+before it is acknowledged, and a segment is only deleted once everything in
+it is in MongoDB. Segments left behind by a crash are replayed on the next
+start; contacts carry their ``_id`` from the moment they are queued, so a
+replay never inserts duplicates. Journals are locked with ``fcntl``, so
+write-behind mode needs a POSIX host. A new segment is created and locked
+under a ``.tmp`` name and only then renamed into place, so another worker's
+:meth:`~ContactWriteBehind.recover` never sees it unlocked.
+"""
+
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId, json_util
+from django.conf import settings
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .db import contacts_collection
+
+logger = logging.getLogger('portfolio.contact_queue')
+
+DUPLICATE_KEY = 11000
+
+
+def insert_contacts(contacts):
+    """``insert_many`` that treats already-inserted contacts as success"""
+    try:
+        contacts_collection.insert_many(contacts, ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != DUPLICATE_KEY for error in e.details.get('writeErrors', [])):
+            raise
+        if e.details.get('writeConcernErrors'):
+            raise
+
+
+class ContactWriteBehind:
+    def __init__(self, directory, max_size=1000, batch_size=100, flush_interval=1.0,
+                 put_timeout=0.5, fsync=True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.fsync = fsync
+        self._capacity = threading.Semaphore(max_size)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        # Journal segments: sequence number -> [file, contacts not yet flushed, path]
+        self._journal_lock = threading.Lock()
+        self._segments = {}
+        self._active = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0,
+            'rejected': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'last_flush_seconds': 0.0,
+        }
+
+    # Lifecycle
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.recover()
+        self._rotate()
+        self._thread = threading.Thread(target=self._run, name='contact-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        """Flush what is queued and stop; anything left stays journaled"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        with self._journal_lock:
+            for sequence, (journal, pending, path) in list(self._segments.items()):
+                journal.close()
+                if pending == 0:
+                    os.remove(path)
+                del self._segments[sequence]
+
+    def recover(self):
+        """Replay journal segments left behind by processes that are gone"""
+        for path in sorted(glob.glob(os.path.join(self.directory, 'contacts-*.jsonl'))):
+            with open(path, 'r+') as journal:
+                try:
+                    fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # Still owned by a live worker
+                contacts = [json_util.loads(line) for line in journal if line.strip()]
+                try:
+                    if contacts:
+                        insert_contacts(contacts)
+                except PyMongoError as e:
+                    logger.error(f"❌ Could not replay {path}, keeping it for the next start: {e}")
+                    continue
+                os.remove(path)
+            logger.info(f"♻️ Replayed {len(contacts)} journaled contacts from {os.path.basename(path)}")
+
+    # Producer side
+
+    def submit(self, contact):
+        """Journal and queue a contact; False when the queue is full"""
+        if not self._capacity.acquire(timeout=self.put_timeout):
+            self._count('rejected')
+            return False
+        contact.setdefault('_id', ObjectId())
+        line = json_util.dumps(contact) + '\n'
+        with self._journal_lock:
+            segment = self._segments[self._active]
+            segment[0].write(line)
+            segment[0].flush()
+            if self.fsync:
+                os.fsync(segment[0].fileno())
+            segment[1] += 1
+            sequence = self._active
+        self._queue.put((sequence, contact))
+        self._count('submitted')
+        return True
+
+    # Flusher side
+
+    def _rotate(self):
+        """Start a new journal segment so flushed ones can be deleted"""
+        with self._journal_lock:
+            if self._active is not None and self._segments[self._active][1] == 0:
+                return
+            self._active = time.time_ns()
+            path = os.path.join(self.directory, f'contacts-{os.getpid()}-{self._active}.jsonl')
+            # Lock before recover() in another worker can see the name
+            journal = open(f'{path}.tmp', 'a')
+            fcntl.flock(journal, fcntl.LOCK_EX)
+            os.rename(f'{path}.tmp', path)
+            self._segments[self._active] = [journal, 0, path]
+
+    def _release(self, batch):
+        with self._journal_lock:
+            for sequence, _ in batch:
+                self._segments[sequence][1] -= 1
+            for sequence, (journal, pending, path) in list(self._segments.items()):
+                if pending == 0 and sequence != self._active:
+                    os.remove(path)
+                    journal.close()
+                    del self._segments[sequence]
+        for _ in batch:
+            self._capacity.release()
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        self._rotate()
+        contacts = [contact for _, contact in batch]
+        while True:
+            started = time.perf_counter()
+            try:
+                insert_contacts(contacts)
+                break
+            except PyMongoError as e:
+                self._count('failed_flushes')
+                logger.error(f"❌ Contact flush of {len(contacts)} failed, retrying: {e}")
+                if self._stop.wait(self.flush_interval):
+                    return  # Shutting down; the journal keeps them
+        elapsed = time.perf_counter() - started
+        self._release(batch)
+        with self._metrics_lock:
+            self._metrics['flushed'] += len(batch)
+            self._metrics['flushes'] += 1
+            self._metrics['flush_seconds_total'] += elapsed
+            self._metrics['flush_seconds_max'] = max(self._metrics['flush_seconds_max'], elapsed)
+            self._metrics['last_flush_seconds'] = elapsed
+
+    # Metrics
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def stats(self):
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['flush_seconds_avg'] = stats['flush_seconds_total'] / stats['flushes'] if stats['flushes'] else 0.0
+        return stats
+
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_contact_queue():
+    """The worker's write-behind queue, or None when contacts are written inline"""
+    global _queue, _queue_pid
+    if not getattr(settings, 'CONTACTS_WRITE_BEHIND', False):
+        return None
+    if _queue is not None and _queue_pid == os.getpid():
+        return _queue
+    with _queue_lock:
+        if _queue is None or _queue_pid != os.getpid():
+            contact_queue = ContactWriteBehind(
+                settings.CONTACTS_QUEUE_DIR,
+                max_size=settings.CONTACTS_QUEUE_MAX_SIZE,
+                batch_size=settings.CONTACTS_QUEUE_BATCH_SIZE,
+                flush_interval=settings.CONTACTS_QUEUE_FLUSH_INTERVAL,
+                put_timeout=settings.CONTACTS_QUEUE_PUT_TIMEOUT,
+                fsync=settings.CONTACTS_QUEUE_FSYNC,
+            )
+            contact_queue.start()
+            _queue, _queue_pid = contact_queue, os.getpid()
+    return _queue
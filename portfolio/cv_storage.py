@@ -0,0 +1,278 @@
+"""
+Content-addressed CV storage and downloads
+
+Uploaded CVs are stored under the SHA-256 of their contents, computed while
+the upload's chunks are written, so uploading the same file twice stores it
+once. ``CV_STORAGE`` picks the store:
+
+- ``filesystem``: ``MEDIA_ROOT/CV_STORAGE_DIR/<2 hex digits>/<sha256>``,
+  written to a temporary file and renamed into place
+- ``gridfs``: the ``CV_GRIDFS_BUCKET`` GridFS bucket, one file per digest
+
+:func:`cv_response` serves a stored CV with a strong ETag (the digest),
+single-range ``Range`` requests and, for the filesystem store, optional
+offload to the web server through ``X-Accel-Redirect`` (nginx) or
+``X-Sendfile`` (Apache, lighttpd). Files no profile refers to any more are
+removed by ``manage.py gc_cv_files``.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.text import get_valid_filename
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class FileSystemCVStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, chunks):
+        """Store the concatenated ``chunks``; returns ``(digest, size)``"""
+        os.makedirs(self.root, exist_ok=True)
+        sha256, size = hashlib.sha256(), 0
+        fd, temporary = tempfile.mkstemp(prefix='.upload-', dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return digest, size
+
+    def open(self, digest):
+        """``(file, size)``, or ``None`` if nothing is stored under ``digest``"""
+        try:
+            f = open(self.path(digest), 'rb')
+        except FileNotFoundError:
+            return None
+        return f, os.fstat(f.fileno()).st_size
+
+    def stored(self):
+        """``{digest: stored at (epoch seconds)}`` for every stored file"""
+        found = {}
+        if not os.path.isdir(self.root):
+            return found
+        for shard in os.listdir(self.root):
+            directory = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if DIGEST_RE.match(name) and name.startswith(shard):
+                    found[name] = os.path.getmtime(os.path.join(directory, name))
+        return found
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def remove_stale_uploads(self, older_than):
+        """Delete temporary files left by uploads that died before ``older_than``"""
+        removed = 0
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.startswith('.upload-') and os.path.getmtime(path) < older_than:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+class GridFSCVStore:
+    def __init__(self, db, bucket_name):
+        import gridfs
+
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f'{bucket_name}.files']
+
+    def put(self, chunks):
+        """Store the concatenated ``chunks``; returns ``(digest, size)``
+
+        The digest is only known once everything is uploaded, so the file
+        is uploaded under a temporary name and renamed, or dropped if the
+        same contents are already stored.
+        """
+        sha256, size = hashlib.sha256(), 0
+        with self.bucket.open_upload_stream(f'.upload-{os.getpid()}-{time.time_ns()}') as upload:
+            for chunk in chunks:
+                sha256.update(chunk)
+                upload.write(chunk)
+                size += len(chunk)
+        digest = sha256.hexdigest()
+        if self.files.find_one({'filename': digest}, {'_id': 1}):
+            self.bucket.delete(upload._id)
+        else:
+            self.bucket.rename(upload._id, digest)
+        return digest, size
+
+    def open(self, digest):
+        import gridfs
+
+        try:
+            f = self.bucket.open_download_stream_by_name(digest)
+        except gridfs.errors.NoFile:
+            return None
+        return f, f.length
+
+    def stored(self):
+        return {doc['filename']: doc['uploadDate'].timestamp()
+                for doc in self.files.find({}, {'filename': 1, 'uploadDate': 1})
+                if DIGEST_RE.match(doc['filename'])}
+
+    def delete(self, digest):
+        for doc in self.files.find({'filename': digest}, {'_id': 1}):
+            self.bucket.delete(doc['_id'])
+
+    def remove_stale_uploads(self, older_than):
+        removed = 0
+        for doc in self.files.find({'filename': {'$regex': r'^\.upload-'}}, {'uploadDate': 1}):
+            if doc['uploadDate'].timestamp() < older_than:
+                self.bucket.delete(doc['_id'])
+                removed += 1
+        return removed
+
+
+def get_cv_store():
+    """The store selected by ``CV_STORAGE``"""
+    if getattr(settings, 'CV_STORAGE', 'filesystem') == 'gridfs':
+        from .db import get_db
+
+        return GridFSCVStore(get_db(), getattr(settings, 'CV_GRIDFS_BUCKET', 'cv'))
+    return FileSystemCVStore(os.path.join(settings.MEDIA_ROOT, getattr(settings, 'CV_STORAGE_DIR', 'cv')))
+
+
+def cv_url(digest, filename):
+    """Download URL of a stored CV; the file name is only used for saving it"""
+    return f"/cv/{digest}/{quote(get_valid_filename(filename) or 'cv')}"
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single ``bytes=`` range
+
+    Returns ``None`` to serve the whole file (no header, several ranges, or
+    syntax we don't handle, all of which RFC 9110 allows to be ignored) and
+    raises ``ValueError`` for a range that lies outside the file.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(f, start, end):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def cv_response(request, store, digest, filename):
+    """Response serving a stored CV, honouring conditional and ``Range`` requests"""
+    etag = quote_etag(digest)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    opened = store.open(digest)
+    if opened is None:
+        return None
+    f, size = opened
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    offload = getattr(settings, 'CV_SENDFILE', '')
+    if offload and isinstance(store, FileSystemCVStore):
+        # The web server sends the file, Range requests included
+        f.close()
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel':
+            response['X-Accel-Redirect'] = (
+                f"{settings.CV_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{digest[:2]}/{digest}")
+        else:
+            response['X-Sendfile'] = store.path(digest)
+    else:
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                f.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        if byte_range is None:
+            response = FileResponse(f, content_type=content_type)
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(f, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    # The URL names the contents, so it never needs revalidating
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
+def collect_garbage(store, referenced, grace_seconds=3600, dry_run=False):
+    """Delete stored CVs not in ``referenced``; returns ``(deleted digests, stale uploads)``
+
+    Files younger than ``grace_seconds`` are kept, so a CV whose profile
+    update hasn't been saved yet is not collected.
+    """
+    cutoff = time.time() - grace_seconds
+    orphans = sorted(digest for digest, stored_at in store.stored().items()
+                     if digest not in referenced and stored_at < cutoff)
+    stale = 0
+    if not dry_run:
+        for digest in orphans:
+            store.delete(digest)
+        stale = store.remove_stale_uploads(cutoff)
+    return orphans, stale
@@ -1,4 +1,21 @@
+"""
+MongoDB access
+
+The client is created on first use, once per process: importing this module
+(as every management command and worker does via the admin site) costs
+nothing, and a gunicorn worker forked from a preloaded master builds its own
+client instead of inheriting one whose sockets and monitor threads belong to
+the parent. Pool size, timeouts and compression come from the ``MONGO_*``
+settings.
+
+``projects_collection`` and friends are lazy stand-ins that resolve against
+the current process's client on each use, so they can be imported at module
+level as before.
+"""
+
 import os
+import threading
+
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
@@ -8,10 +25,103 @@ load_dotenv()
 # MongoDB URI
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI)
-db = client["portfolio_db"]  # Database name: portfolio_db
+MONGO_DB_NAME = "portfolio_db"
+
+# MongoClient options and the settings that configure them, with the values
+# used when Django settings are not configured (e.g. standalone scripts)
+CLIENT_OPTION_SETTINGS = {
+    'maxPoolSize': ('MONGO_MAX_POOL_SIZE', 100),
+    'minPoolSize': ('MONGO_MIN_POOL_SIZE', 0),
+    'maxIdleTimeMS': ('MONGO_MAX_IDLE_TIME_MS', None),
+    'serverSelectionTimeoutMS': ('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+    'connectTimeoutMS': ('MONGO_CONNECT_TIMEOUT_MS', 5000),
+    'socketTimeoutMS': ('MONGO_SOCKET_TIMEOUT_MS', 20000),
+    'compressors': ('MONGO_COMPRESSORS', None),
+    'appname': ('MONGO_APP_NAME', 'portfolio'),
+}
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def client_options():
+    """Keyword arguments for ``MongoClient``/``AsyncIOMotorClient``"""
+    from django.conf import settings
+
+    options = {}
+    for option, (name, default) in CLIENT_OPTION_SETTINGS.items():
+        value = getattr(settings, name, default) if settings.configured else default
+        if value not in (None, ''):
+            options[option] = value
+    if settings.configured and getattr(settings, 'METRICS_ENABLED', False):
+        from .metrics import mongo_command_listener
+        options['event_listeners'] = [mongo_command_listener]
+    return options
+
+
+def get_client():
+    """This process's ``MongoClient``, created on first use"""
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            # A client inherited across fork is unusable; never close it
+            # here, the sockets belong to the parent
+            _client = MongoClient(MONGO_URI, **client_options())
+            _client_pid = os.getpid()
+    return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+def _reset_after_fork():
+    global _client, _client_pid, _client_lock
+    _client, _client_pid = None, None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyDatabase:
+    """The ``portfolio_db`` database of the current process's client"""
+
+    name = MONGO_DB_NAME
+
+    def __getattr__(self, attribute):
+        return getattr(get_db(), attribute)
+
+    def __getitem__(self, name):
+        return LazyCollection(name)
+
+    def __repr__(self):
+        return f"LazyDatabase({self.name!r})"
+
+
+class LazyCollection:
+    """A collection of :data:`db` that is looked up on each use"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        return getattr(get_db()[self.name], attribute)
+
+    def __getitem__(self, name):
+        return get_db()[self.name][name]
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
+
+
+db = LazyDatabase()
 
 # Centralized collections
 projects_collection = db["projects"]
 contacts_collection = db["contacts"]
+meta_collection = db["meta"]  # Content version counters
@@ -0,0 +1,124 @@
+"""
+Facet counts over projects: per technology, category, year and featured
+
+Counts are computed with one ``$facet`` aggregation and cached under the
+projects content version. Write paths that know what they added or removed
+call :func:`update_facets` with the version their write produced, which
+derives the new counts from the previous version's instead of aggregating
+again. If the previous version's counts aren't cached, nothing is derived
+and the next read aggregates.
+
+Derived counts can drift if a reader aggregated while a write was still
+between its insert and its version bump, so they expire after
+``PROJECTS_FACETS_CACHE_TIMEOUT`` like any other cached counts.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .db import projects_collection
+from .versioning import get_content_version
+
+FACET_FIELDS = ('technologies', 'category', 'year', 'featured')
+
+FACETS_PIPELINE = [{'$facet': {
+    'technologies': [
+        {'$unwind': '$technologies'},
+        {'$group': {'_id': '$technologies', 'count': {'$sum': 1}}},
+    ],
+    'category': [{'$group': {'_id': '$category', 'count': {'$sum': 1}}}],
+    'year': [{'$group': {'_id': '$year', 'count': {'$sum': 1}}}],
+    'featured': [{'$group': {'_id': '$featured', 'count': {'$sum': 1}}}],
+    'total': [{'$count': 'count'}],
+}}]
+
+
+def facets_cache_key(version):
+    return f'project_facets:{version}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'PROJECTS_FACETS_CACHE_TIMEOUT', 3600)
+
+
+def counts_from_aggregation(result):
+    """``{'total': n, field: {value: count}}`` from the ``$facet`` output"""
+    counts = {'total': result['total'][0]['count'] if result['total'] else 0}
+    for field in FACET_FIELDS:
+        counts[field] = {bucket['_id']: bucket['count'] for bucket in result[field]}
+    return counts
+
+
+def facet_values(project, field):
+    """The values ``field`` contributes to its facet, as ``$unwind`` sees them"""
+    value = project.get(field)
+    if field == 'technologies':
+        if isinstance(value, list):
+            return value
+        return [] if value is None else [value]
+    return [value]
+
+
+def apply_project_changes(counts, added=(), removed=()):
+    """New counts with ``added`` projects counted and ``removed`` ones uncounted"""
+    counts = {field: dict(counts[field]) for field in FACET_FIELDS} | {
+        'total': counts['total'] + len(added) - len(removed),
+    }
+    for projects, step in ((added, 1), (removed, -1)):
+        for project in projects:
+            for field in FACET_FIELDS:
+                buckets = counts[field]
+                for value in facet_values(project, field):
+                    buckets[value] = buckets.get(value, 0) + step
+                    if buckets[value] <= 0:
+                        del buckets[value]
+    return counts
+
+
+def compute_facets():
+    return counts_from_aggregation(next(projects_collection.aggregate(FACETS_PIPELINE)))
+
+
+def get_facets(version=None):
+    """Facet counts at the current content version, from cache when possible"""
+    version = get_content_version() if version is None else version
+    counts = cache.get(facets_cache_key(version))
+    if counts is None:
+        counts = compute_facets()
+        cache.set(facets_cache_key(version), counts, _cache_timeout())
+    return counts
+
+
+async def aget_facets(version):
+    """Async :func:`get_facets` for the ASGI views"""
+    from .async_db import get_async_db
+
+    counts = await cache.aget(facets_cache_key(version))
+    if counts is None:
+        cursor = get_async_db()[projects_collection.name].aggregate(FACETS_PIPELINE)
+        counts = counts_from_aggregation((await cursor.to_list(length=1))[0])
+        await cache.aset(facets_cache_key(version), counts, _cache_timeout())
+    return counts
+
+
+def update_facets(version, added=(), removed=()):
+    """Derive the counts at ``version`` from those at ``version - 1``"""
+    previous = cache.get(facets_cache_key(version - 1))
+    if previous is not None:
+        cache.set(facets_cache_key(version), apply_project_changes(previous, added, removed), _cache_timeout())
+
+
+async def aupdate_facets(version, added=(), removed=()):
+    """Async :func:`update_facets` for the ASGI views"""
+    previous = await cache.aget(facets_cache_key(version - 1))
+    if previous is not None:
+        await cache.aset(facets_cache_key(version), apply_project_changes(previous, added, removed), _cache_timeout())
+
+
+def facets_payload(counts):
+    """API payload: each facet as ``[{"value": ..., "count": ...}]``, most common first"""
+    payload = {'total': counts['total']}
+    for field in FACET_FIELDS:
+        buckets = sorted(counts[field].items(), key=lambda bucket: (-bucket[1], str(bucket[0])))
+        payload[field] = [{'value': value, 'count': count} for value, count in buckets]
+    return payload
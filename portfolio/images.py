@@ -0,0 +1,136 @@
+"""
+Responsive project images
+
+An uploaded image is decoded once, then resized to each of
+``PROJECT_IMAGE_WIDTHS`` (never upscaled) and encoded as WebP and JPEG.
+Variant files are named after a hash of the upload plus their width, e.g.
+``projects/3f1c9a0b2d4e6f81-640.webp`` under ``MEDIA_ROOT``. A name therefore
+always refers to the same bytes, and the files can be served with
+``Cache-Control: immutable`` (see :func:`portfolio.views.project_image`).
+Uploading the same image again reuses the existing files.
+
+The project document gets an ``image`` field with ready-made ``srcset``
+strings for the ``<picture>`` element, the intrinsic size (so the browser can
+reserve space before the image loads) and the variant list. ``image_url``
+keeps pointing at a JPEG for clients that only know about that field.
+"""
+
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Output formats: (name, MIME type, file extension, Pillow save options)
+IMAGE_FORMATS = (
+    ('webp', 'image/webp', 'webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    ('jpeg', 'image/jpeg', 'jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _widths():
+    return tuple(sorted(getattr(settings, 'PROJECT_IMAGE_WIDTHS', (400, 800, 1200))))
+
+
+def _open(upload):
+    """Decode an upload; returns ``(bytes, image, original size)``
+
+    JPEGs are decoded at the smallest scale that still covers the widest
+    variant, which is several times faster for camera-sized photos.
+    """
+    max_bytes = getattr(settings, 'PROJECT_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+    if upload.size > max_bytes:
+        raise ValueError(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+    data = upload.read()
+    try:
+        image = Image.open(io.BytesIO(data))
+        size = image.size
+        # Both sides at least the widest variant, whichever way EXIF rotates it
+        image.draft('RGB', (_widths()[-1],) * 2)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError("Upload is not a supported image") from e
+    transposed = ImageOps.exif_transpose(image)
+    if transposed.size[0] != image.size[0]:
+        size = size[::-1]  # rotated by 90 degrees
+    return data, transposed, size
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _flatten(image):
+    """RGB copy for JPEG, with any transparency composited onto white"""
+    if _has_alpha(image):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def variant_widths(source_width, widths=None):
+    """Target widths for a source image: no upscaling, at least one variant"""
+    widths = _widths() if widths is None else widths
+    fitting = [width for width in widths if width < source_width]
+    return fitting if len(fitting) == len(widths) else fitting + [source_width]
+
+
+def srcset(variants, image_format):
+    return ', '.join(f"{variant['url']} {variant['width']}w"
+                     for variant in variants if variant['format'] == image_format)
+
+
+def save_project_image(upload):
+    """Store resized variants of ``upload``; returns the project's ``image`` field
+
+    Raises ``ValueError`` if the upload is too large or not an image.
+    """
+    data, image, (width, height) = _open(upload)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    directory = getattr(settings, 'PROJECT_IMAGES_DIR', 'projects')
+    sources = {'jpeg': _flatten(image)}
+    # WebP keeps transparency; opaque images skip the alpha plane
+    sources['webp'] = image.convert('RGBA') if _has_alpha(image) else sources['jpeg']
+
+    variants = []
+    for target in variant_widths(width):
+        target_height = max(1, round(height * target / width))
+        for image_format, mime_type, extension, options in IMAGE_FORMATS:
+            name = f'{directory}/{digest}-{target}.{extension}'
+            if not default_storage.exists(name):
+                resized = sources[image_format].resize((target, target_height), Image.LANCZOS, reducing_gap=3.0)
+                buffer = io.BytesIO()
+                resized.save(buffer, **options)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({
+                'format': image_format,
+                'type': mime_type,
+                'width': target,
+                'height': target_height,
+                'url': default_storage.url(name),
+                'bytes': default_storage.size(name),
+            })
+
+    jpegs = [variant for variant in variants if variant['format'] == 'jpeg']
+    # The fallback src: the variant closest to a card's display width on a 2x screen
+    fallback = jpegs[min(1, len(jpegs) - 1)]
+    return {
+        'width': width,
+        'height': height,
+        'src': fallback['url'],
+        'srcset': {image_format: srcset(variants, image_format) for image_format, _, _, _ in IMAGE_FORMATS},
+        'variants': variants,
+    }
+
+
+def attach_project_image(project, upload):
+    """Add an uploaded image to a project document"""
+    project['image'] = save_project_image(upload)
+    project['image_url'] = project['image']['src']
+    return project
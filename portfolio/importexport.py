@@ -0,0 +1,305 @@
+"""
+Bulk, idempotent import and streaming export of projects, and contact exports
+
+Projects are read lazily from JSONL, CSV or JSON-array files and written in
+batches of ``UpdateOne(..., upsert=True)`` operations keyed on ``title``, so
+re-running an import only touches projects that changed. Exports stream a
+MongoDB cursor straight to the output file in the same formats.
+
+Contact exports are generators of CSV or NDJSON lines for the admin's
+``StreamingHttpResponse``; they hold one cursor batch in memory at a time.
+"""
+
+import csv
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from .db import projects_collection
+from .static_export import export_now
+from .utils import parse_bool, project_from_data
+from .versioning import bump_content_version
+
+logger = logging.getLogger('portfolio.importexport')
+
+FORMATS = ('jsonl', 'csv', 'json')
+
+# Column order for CSV exports; technologies are joined with commas
+CSV_FIELDS = ['title', 'description', 'year', 'technologies', 'live_url', 'github_url',
+              'image_url', 'featured', 'category', 'created_at']
+
+
+def guess_format(path):
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"Can't tell the format of '{path}', pass --format")
+
+
+# Readers
+
+def iter_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {line_number}: {e}")
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """Yield the items of a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started:
+                if position >= len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise ValueError("JSON input must be an array of projects")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise ValueError("JSON input ended in the middle of an item")
+                break  # Item spans the next chunk
+            yield item
+        buffer = buffer[position:]
+        if not chunk:
+            if started:
+                raise ValueError("JSON input is missing the closing ']'")
+            return
+
+
+def iter_csv(stream):
+    """Yield each row's non-empty cells as strings; :func:`normalize_project` converts them"""
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if key is not None and value not in (None, '')}
+
+
+READERS = {'jsonl': iter_jsonl, 'json': iter_json_array, 'csv': iter_csv}
+
+
+def normalize_project(data):
+    """Schema fields present in ``data``; raises ValueError if unusable
+
+    Fields missing from the input are left alone on existing projects and
+    get the usual defaults (see :func:`insert_defaults`) on new ones.
+    """
+    if not data.get('title'):
+        raise ValueError("project has no title")
+    data = dict(data)
+    # CSV cells arrive as strings
+    if isinstance(data.get('technologies'), str):
+        data['technologies'] = [t.strip() for t in data['technologies'].split(',') if t.strip()]
+    if isinstance(data.get('year'), str):
+        try:
+            data['year'] = int(data['year'])
+        except ValueError:
+            raise ValueError(f"'year' must be an integer, not {data['year']!r}")
+    if isinstance(data.get('featured'), str):
+        data['featured'] = parse_bool(data['featured'], 'featured')
+    project = project_from_data(data)
+    return {field: value for field, value in project.items() if field in data}
+
+
+def insert_defaults(project, now):
+    """``$setOnInsert`` values for the fields an imported project lacks"""
+    defaults = project_from_data({'created_at': now})
+    return {field: value for field, value in defaults.items() if field not in project}
+
+
+# Import
+
+class ProjectImporter:
+    """Upserts projects in batches and keeps counts for reporting
+
+    The existing documents of each batch are read first (one ``$in`` query
+    on the title index), so only new and changed projects are written, with
+    a fresh ``updated_at``. ``dry_run`` records what would change instead of
+    writing. An import that wrote anything rebuilds ``STATIC_EXPORT_DIR``
+    before returning.
+    """
+
+    def __init__(self, batch_size=500, dry_run=False, progress=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.stats = {'read': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0, 'deleted': 0}
+        self.changes = []  # (title, {field: (old, new)}) for dry runs
+        self.errors = []
+        self.titles = set()
+        self.written = False
+        self.export = None  # static export summary, when one was rebuilt
+        self._started = time.perf_counter()
+
+    def run(self, items, prune=False):
+        batch = []
+        try:
+            for item in items:
+                self.stats['read'] += 1
+                try:
+                    project = normalize_project(item)
+                except (ValueError, TypeError) as e:
+                    self.stats['invalid'] += 1
+                    self.errors.append(f"item {self.stats['read']}: {e}")
+                    continue
+                self.titles.add(project['title'])
+                batch.append(project)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+            if prune:
+                self._prune()
+        finally:
+            # Batches already written stay written if the input turns out to be
+            # unreadable half way, so caches and the static export must still see them
+            if self.written:
+                bump_content_version()
+                self.export = export_now()
+        return self.stats
+
+    def _write(self, batch):
+        # Later duplicates of a title within the batch win, as with sequential upserts
+        batch = list({project['title']: project for project in batch}.values())
+        changed = self._diff(batch)
+        if changed and not self.dry_run:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            updated_at = datetime.now(timezone.utc)
+            operations = []
+            for project in changed:
+                update = {'$set': dict(project, updated_at=updated_at)}
+                defaults = insert_defaults(project, now)
+                if defaults:
+                    update['$setOnInsert'] = defaults
+                operations.append(UpdateOne({'title': project['title']}, update, upsert=True))
+            self.written = True
+            projects_collection.bulk_write(operations, ordered=False)
+        if self.progress:
+            elapsed = time.perf_counter() - self._started
+            self.progress(self.stats['read'], elapsed)
+
+    def _diff(self, batch):
+        """Count what ``batch`` changes and return the projects that are new or differ"""
+        existing = {
+            doc['title']: doc
+            for doc in projects_collection.find({'title': {'$in': [p['title'] for p in batch]}}, {'_id': 0})
+        }
+        changed = []
+        for project in batch:
+            current = existing.get(project['title'])
+            if current is None:
+                self.stats['inserted'] += 1
+                changed.append(project)
+                if self.dry_run:
+                    self.changes.append((project['title'], None))
+                continue
+            diff = {
+                field: (current.get(field), value)
+                for field, value in project.items() if current.get(field) != value
+            }
+            if diff:
+                self.stats['updated'] += 1
+                changed.append(project)
+                if self.dry_run:
+                    self.changes.append((project['title'], diff))
+            else:
+                self.stats['unchanged'] += 1
+        return changed
+
+    def _prune(self):
+        """Delete projects whose titles were not in the import"""
+        query = {'title': {'$nin': list(self.titles)}}
+        if self.dry_run:
+            stale = [doc['title'] for doc in projects_collection.find(query, {'title': 1})]
+            self.stats['deleted'] = len(stale)
+            self.changes.extend((title, 'delete') for title in stale)
+        else:
+            self.stats['deleted'] = projects_collection.delete_many(query).deleted_count
+            self.written = self.written or self.stats['deleted'] > 0
+
+
+# Export
+
+def export_projects(stream, fmt, batch_size=500, query=None):
+    """Stream projects to ``stream`` in ``fmt``; returns the number written"""
+    cursor = projects_collection.find(query or {}, {'_id': 0}).sort('title', 1).batch_size(batch_size)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for project in cursor:
+            project['technologies'] = ', '.join(project.get('technologies') or [])
+            writer.writerow(project)
+            count += 1
+    elif fmt == 'json':
+        stream.write('[')
+        for project in cursor:
+            stream.write((',\n' if count else '\n') + json.dumps(project, default=str))
+            count += 1
+        stream.write('\n]\n')
+    else:
+        for project in cursor:
+            stream.write(json.dumps(project, default=str) + '\n')
+            count += 1
+    return count
+
+
+# Contact exports
+
+CONTACT_EXPORT_FIELDS = ['id', 'name', 'email', 'message', 'timestamp']
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_safe(value):
+    """Stop spreadsheets from evaluating submitted text as a formula"""
+    value = '' if value is None else str(value)
+    return "'" + value if value[:1] in ('=', '+', '-', '@', '\t', '\r') else value
+
+
+def contact_row(contact):
+    return {
+        'id': str(contact['_id']),
+        'name': contact.get('name', ''),
+        'email': contact.get('email', ''),
+        'message': contact.get('message', ''),
+        'timestamp': contact.get('timestamp', ''),
+    }
+
+
+def iter_contacts_csv(cursor):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CONTACT_EXPORT_FIELDS)
+    for contact in cursor:
+        row = contact_row(contact)
+        yield writer.writerow([csv_safe(row[field]) for field in CONTACT_EXPORT_FIELDS])
+
+
+def iter_contacts_ndjson(cursor):
+    for contact in cursor:
+        yield json.dumps(contact_row(contact), default=str) + '\n'
@@ -0,0 +1,171 @@
+"""
+MongoDB index declarations for the portfolio collections
+"""
+
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from .db import projects_collection, contacts_collection
+
+logger = logging.getLogger('portfolio.indexes')
+
+
+# Every index the app's queries rely on, keyed by collection
+INDEXES = {
+    'projects': [
+        # delete_project looks projects up by title; titles are the natural key
+        IndexModel([('title', ASCENDING)], name='title_unique', unique=True),
+        # Keyset pagination walks (sort field, _id) in either direction
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id'),
+        IndexModel([('year', DESCENDING), ('_id', DESCENDING)], name='year_id'),
+        IndexModel([('title', ASCENDING), ('_id', ASCENDING)], name='title_id'),
+        IndexModel([('category', ASCENDING), ('featured', ASCENDING), ('year', ASCENDING)],
+                   name='category_featured_year'),
+        # Multikey index over the technologies array
+        IndexModel([('technologies', ASCENDING)], name='technologies'),
+        # The SQLite replica polls for documents written since its watermark
+        IndexModel([('updated_at', ASCENDING)], name='updated_at'),
+    ],
+    'contacts': [
+        # The profile document shares the contacts collection
+        IndexModel([('type', ASCENDING)], name='type'),
+        # Inbox keyset pagination and exports walk (timestamp, _id) newest first
+        IndexModel([('timestamp', DESCENDING), ('_id', DESCENDING)], name='timestamp_id'),
+    ],
+}
+
+# Query shapes the app issues, checked by ``ensure_indexes --explain``
+QUERY_SHAPES = [
+    ('projects', 'api: default listing', {}, [('created_at', -1), ('_id', -1)]),
+    ('projects', 'api: sort by year', {}, [('year', -1), ('_id', -1)]),
+    ('projects', 'api: sort by title', {}, [('title', 1), ('_id', 1)]),
+    ('projects', 'api: category/featured/year filter',
+     {'category': 'web', 'featured': True, 'year': 2024}, [('created_at', -1), ('_id', -1)]),
+    ('projects', 'api: technology filter', {'technologies': 'Django'}, [('created_at', -1), ('_id', -1)]),
+    ('projects', 'admin: delete by title', {'title': 'Example'}, None),
+    ('projects', 'replica: changes since watermark', {'updated_at': {'$gte': datetime(2024, 1, 1)}}, None),
+    ('contacts', 'admin: profile lookup', {'type': 'profile'}, None),
+    ('contacts', 'admin: contacts inbox', {'type': {'$ne': 'profile'}}, [('timestamp', -1), ('_id', -1)]),
+]
+
+
+def get_collections():
+    return {
+        'projects': projects_collection,
+        'contacts': contacts_collection,
+    }
+
+
+def _index_spec(info):
+    """Normalise index_information() / IndexModel documents for comparison"""
+    return (
+        [tuple(key) for key in info['key']] if not isinstance(info['key'], dict)
+        else list(info['key'].items()),
+        bool(info.get('unique', False)),
+    )
+
+
+def find_duplicates(collection, model, limit=20):
+    """Up to ``limit`` key values that occur more than once, which block the unique index ``model``"""
+    fields = [field for field, _ in model.document['key'].items()]
+    pipeline = [
+        {'$group': {'_id': {field: f'${field}' for field in fields}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$sort': {'count': -1}},
+        {'$limit': limit},
+    ]
+    return [
+        (', '.join(repr(group['_id'].get(field)) for field in fields), group['count'])
+        for group in collection.aggregate(pipeline)
+    ]
+
+
+def ensure_indexes(prune=False, dry_run=False):
+    """Create missing indexes and rebuild ones whose definition changed
+
+    Returns ``(created, dropped, failed)``: lists of ``"collection.index"``
+    names, and ``(name, reason)`` pairs for indexes MongoDB refused to build
+    (a unique index over duplicate values, say). A failure is logged and the
+    remaining indexes are still created. Indexes that are not declared in
+    :data:`INDEXES` are only dropped when ``prune`` is true. Safe to run
+    repeatedly.
+    """
+    created, dropped, failed = [], [], []
+    for name, collection in get_collections().items():
+        existing = collection.index_information()
+        declared = {model.document['name']: model for model in INDEXES.get(name, [])}
+
+        for index_name, model in declared.items():
+            current = existing.get(index_name)
+            if current is not None:
+                if _index_spec(current) == _index_spec(model.document):
+                    continue
+                if not dry_run:
+                    collection.drop_index(index_name)
+                dropped.append(f"{name}.{index_name}")
+            if not dry_run:
+                try:
+                    collection.create_indexes([model])
+                except OperationFailure as e:
+                    reason = _build_failure(collection, model, e)
+                    logger.error(f"❌ Could not create index {name}.{index_name}: {reason}")
+                    failed.append((f"{name}.{index_name}", reason))
+                    continue
+            created.append(f"{name}.{index_name}")
+
+        if prune:
+            for index_name in existing:
+                if index_name == '_id_' or index_name in declared:
+                    continue
+                if not dry_run:
+                    collection.drop_index(index_name)
+                dropped.append(f"{name}.{index_name}")
+
+    if created or dropped:
+        logger.info(f"🗂️ Indexes created: {created or 'none'}, dropped: {dropped or 'none'}")
+    return created, dropped, failed
+
+
+def _build_failure(collection, model, error):
+    """Why creating ``model`` failed, naming the duplicates when it is unique"""
+    if error.code != 11000 or not model.document.get('unique'):
+        return str(error)
+    duplicates = find_duplicates(collection, model)
+    listed = '; '.join(f"{value} ({count}x)" for value, count in duplicates)
+    return f"duplicate values: {listed or 'none found'}"
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_query_shapes():
+    """Explain every entry in :data:`QUERY_SHAPES`
+
+    Returns a list of ``(collection, description, stages)`` tuples where
+    ``stages`` are the stage names of the winning plan.
+    """
+    collections = get_collections()
+    results = []
+    for name, description, query, sort in QUERY_SHAPES:
+        cursor = collections[name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+        except OperationFailure as e:
+            logger.error(f"❌ explain failed for {name} ({description}): {e}")
+            raise
+        results.append((name, description, list(_plan_stages(plan))))
+    return results
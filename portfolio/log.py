@@ -0,0 +1,184 @@
+"""
+Non-blocking, structured logging
+
+With ``LOGGING_QUEUE`` enabled, :func:`install_queue_logging` (run from
+``PortfolioConfig.ready``) moves the handlers of every configured logger
+behind one ``QueueHandler``: request threads only append the record to an
+in-memory queue and a ``QueueListener`` thread formats and writes it. The
+listener is restarted in forked workers and drained at exit.
+
+Records are queued unformatted, so ``logger.info("%s", value)`` costs a
+queue append on the request thread and the ``%`` formatting happens on the
+listener. :class:`JSONFormatter` renders one JSON object per line, with
+ANSI colour codes stripped and ``extra=`` fields included.
+
+:class:`SamplingFilter` keeps a fraction of a noisy logger's records and/or
+caps them per second; warnings and errors always pass.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': ANSI_RE.sub('', record.getMessage()),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+    def formatTime(self, record, datefmt=None):
+        seconds = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+        return f"{seconds}.{int(record.msecs):03d}Z"
+
+
+class SamplingFilter(logging.Filter):
+    """Pass ``rate`` of the records below WARNING, at most ``max_per_second``"""
+
+    def __init__(self, name='', rate=1.0, max_per_second=None):
+        super().__init__(name)
+        self.rate = rate
+        self.max_per_second = max_per_second
+        self.dropped = 0
+        self._tokens = max_per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return self._drop()
+        if self.max_per_second is not None:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.max_per_second,
+                                   self._tokens + (now - self._updated) * self.max_per_second)
+                self._updated = now
+                if self._tokens < 1:
+                    self.dropped += 1
+                    return False
+                self._tokens -= 1
+        return True
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+        return False
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that leaves formatting to the listener thread
+
+    The stock ``prepare`` formats the message on the calling thread so that
+    records can cross process boundaries; this queue never leaves the
+    process, so the record is queued as is, along with the handlers it is
+    bound for.
+    """
+
+    def __init__(self, log_queue, handlers):
+        super().__init__(log_queue)
+        self.target_handlers = handlers
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.target_handlers, record))
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Writes each queued record to the handlers it was bound for"""
+
+    def handle(self, item):
+        handlers, record = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_listener = None
+_install_lock = threading.Lock()
+
+
+def _configured_loggers():
+    root = logging.getLogger()
+    loggers = [root]
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger) and logger.handlers:
+            loggers.append(logger)
+    return [logger for logger in loggers if logger.handlers]
+
+
+def install_queue_logging():
+    """Put every configured logger's handlers behind a shared queue
+
+    Loggers that share a handler (e.g. ``console``) share one listener
+    entry, so each record is written once per handler as before.
+    """
+    global _listener
+    with _install_lock:
+        if _listener is not None:
+            return _listener
+        log_queue = queue.SimpleQueue()
+        stand_ins = {}  # handlers -> the queue handler replacing them
+        for logger in _configured_loggers():
+            handlers = tuple(logger.handlers)
+            if all(isinstance(handler, LazyQueueHandler) for handler in handlers):
+                continue
+            if handlers not in stand_ins:
+                stand_ins[handlers] = LazyQueueHandler(log_queue, handlers)
+            logger.handlers = [stand_ins[handlers]]
+        _listener = RoutingQueueListener(log_queue)
+        _listener.start()
+        atexit.register(stop_queue_logging)
+        return _listener
+
+
+def stop_queue_logging():
+    """Flush queued records and stop the listener thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    # The listener thread did not survive the fork; records queued by the
+    # parent but not yet written are dropped rather than written twice
+    if _listener is not None:
+        _listener._thread = None
+        while True:
+            try:
+                _listener.queue.get_nowait()
+            except queue.Empty:
+                break
+        _listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.indexes import ensure_indexes, explain_query_shapes
+
+
+class Command(BaseCommand):
+    help = "Create the MongoDB indexes the portfolio queries rely on"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Also drop indexes that are not declared in portfolio.indexes",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report what would change without touching MongoDB",
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help="Explain every query shape the app uses and fail on any COLLSCAN",
+        )
+
+    def handle(self, *args, **options):
+        created, dropped, failed = ensure_indexes(prune=options['prune'], dry_run=options['dry_run'])
+        verb = "Would create" if options['dry_run'] else "Created"
+        for name in created:
+            self.stdout.write(self.style.SUCCESS(f"  ✅ {verb}: {name}"))
+        verb = "Would drop" if options['dry_run'] else "Dropped"
+        for name in dropped:
+            self.stdout.write(self.style.WARNING(f"  🗑️ {verb}: {name}"))
+        for name, reason in failed:
+            self.stdout.write(self.style.ERROR(f"  ❌ Could not create {name}: {reason}"))
+        if not created and not dropped and not failed:
+            self.stdout.write("  ✅ All indexes up to date")
+
+        if options['explain']:
+            collscans = []
+            for collection, description, stages in explain_query_shapes():
+                line = f"{collection}: {description} -> {' > '.join(stages)}"
+                if 'COLLSCAN' in stages:
+                    collscans.append(line)
+                    self.stdout.write(self.style.ERROR(f"  ❌ {line}"))
+                else:
+                    self.stdout.write(f"  🔍 {line}")
+            if collscans:
+                raise CommandError(f"{len(collscans)} query shape(s) use a COLLSCAN")
+        if failed:
+            raise CommandError(f"{len(failed)} index(es) could not be created")
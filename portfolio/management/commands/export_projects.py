@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.importexport import FORMATS, export_projects, guess_format
+
+
+class Command(BaseCommand):
+    help = "Stream every project to a JSONL, CSV or JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=500, help="MongoDB cursor batch size")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if not fmt:
+            if path == '-':
+                fmt = 'jsonl'
+            else:
+                try:
+                    fmt = guess_format(path)
+                except ValueError as e:
+                    raise CommandError(str(e))
+
+        if path == '-':
+            count = export_projects(sys.stdout, fmt, batch_size=options['batch_size'])
+        else:
+            with open(path, 'w', newline='' if fmt == 'csv' else None, encoding='utf-8') as stream:
+                count = export_projects(stream, fmt, batch_size=options['batch_size'])
+        self.stderr.write(f"📦 Exported {count} projects")
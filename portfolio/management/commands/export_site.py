@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.static_export import ExportError, export_site
+
+
+class Command(BaseCommand):
+    help = "Pre-render the home page and projects API into a directory for nginx or a CDN"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.STATIC_EXPORT_DIR or None,
+            help="Symlink to (re)point at the new build (default STATIC_EXPORT_DIR)",
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Render every file instead of reusing those whose projects didn't change",
+        )
+        parser.add_argument(
+            '--keep', type=int, default=settings.STATIC_EXPORT_KEEP_BUILDS,
+            help="Builds to keep, the new one included (default STATIC_EXPORT_KEEP_BUILDS)",
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("Pass --output or set STATIC_EXPORT_DIR")
+        try:
+            summary = export_site(options['output'], force=options['force'], keep=options['keep'])
+        except ExportError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"📦 Exported {summary['projects']} projects (content v{summary['version']}) to {summary['output']}"
+        )
+        self.stdout.write(
+            f"  🔁 {summary['changed_projects']} changed project(s): {summary['rendered']} file(s) rendered, "
+            f"{summary['reused']} reused, {summary['removed']} removed in {summary['seconds']:.2f}s"
+        )
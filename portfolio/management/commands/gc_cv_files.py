@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.cv_storage import collect_garbage, get_cv_store
+from portfolio.db import contacts_collection
+
+
+class Command(BaseCommand):
+    help = "Delete stored CV files that no profile refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help="Keep files stored less than this many seconds ago (default 3600)",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report what would be deleted without deleting it",
+        )
+
+    def handle(self, *args, **options):
+        referenced = {
+            doc['cv_sha256']
+            for doc in contacts_collection.find({'cv_sha256': {'$exists': True}}, {'cv_sha256': 1})
+        }
+        orphans, stale = collect_garbage(
+            get_cv_store(), referenced, grace_seconds=options['grace'], dry_run=options['dry_run'],
+        )
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        for digest in orphans:
+            self.stdout.write(self.style.WARNING(f"  🗑️ {verb}: {digest}"))
+        if stale:
+            self.stdout.write(f"  🧹 Removed {stale} unfinished upload(s)")
+        if not orphans and not stale:
+            self.stdout.write(f"  ✅ No orphaned CV files ({len(referenced)} referenced)")
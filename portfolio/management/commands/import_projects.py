@@ -0,0 +1,72 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.importexport import FORMATS, READERS, ProjectImporter, guess_format
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert projects (keyed on title) from a JSONL, CSV or JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Show what would change without writing")
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Delete projects that are not in the input (replaces the collection's contents)",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if not fmt:
+            if path == '-':
+                raise CommandError("--format is required when reading stdin")
+            try:
+                fmt = guess_format(path)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        importer = ProjectImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=self.report_progress,
+        )
+        stream = sys.stdin if path == '-' else open(path, newline='' if fmt == 'csv' else None, encoding='utf-8')
+        try:
+            stats = importer.run(READERS[fmt](stream), prune=options['prune'])
+        except ValueError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if options['dry_run']:
+            self.stdout.write("🔍 Dry run, nothing was written:")
+            for title, change in importer.changes:
+                if change is None:
+                    self.stdout.write(self.style.SUCCESS(f"  + {title}"))
+                elif change == 'delete':
+                    self.stdout.write(self.style.ERROR(f"  - {title}"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"  ~ {title}"))
+                    if options['verbosity'] > 1:
+                        for field, (old, new) in change.items():
+                            self.stdout.write(f"      {field}: {old!r} -> {new!r}")
+        for error in importer.errors:
+            self.stderr.write(self.style.ERROR(f"  ❌ {error}"))
+
+        self.stdout.write(
+            f"📊 {stats['read']} read, {stats['inserted']} new, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['invalid']} invalid"
+        )
+        if importer.export:
+            self.stdout.write(
+                f"📦 Static export v{importer.export['version']}: {importer.export['rendered']} rendered, "
+                f"{importer.export['reused']} reused"
+            )
+
+    def report_progress(self, read, elapsed):
+        self.stderr.write(f"  ⏳ {read} projects processed ({read / elapsed if elapsed else 0:.0f}/s)")
@@ -0,0 +1,40 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from portfolio.replica import enable_wal, get_replica, get_replica_state
+
+
+class Command(BaseCommand):
+    help = "Mirror the MongoDB projects collection into the SQLite Project table and keep it in sync"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Catch up once and exit instead of following changes",
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Compare every document with its row instead of only those changed since the last sync",
+        )
+
+    def handle(self, *args, **options):
+        # A one-off catch-up compares against the watermark rather than opening a change stream
+        replica = get_replica(mode='polling') if options['once'] else get_replica()
+        if options['full'] or options['once']:
+            enable_wal()
+            if options['full']:
+                replica.full_sync()
+            else:
+                replica.poll()
+            state = get_replica_state()
+            self.stdout.write(f"📥 Replica at projects v{state.version} ({state.synced_at:%Y-%m-%d %H:%M:%S} UTC)")
+            if options['once']:
+                return
+
+        signal.signal(signal.SIGTERM, lambda *_: replica.stop())
+        self.stdout.write(f"🔁 Following projects changes ({replica.mode}); Ctrl-C to stop")
+        try:
+            replica.run()
+        except KeyboardInterrupt:
+            replica.stop()
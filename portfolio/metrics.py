@@ -0,0 +1,482 @@
+"""
+Per-request performance instrumentation
+
+:class:`ServerTimingMiddleware` opens a :class:`RequestMetrics` for each
+request in a context variable. The instruments below add to it:
+
+- :class:`MongoCommandListener`, registered on every ``MongoClient`` (and
+  Motor client) through :func:`portfolio.db.client_options`, counts and times
+  MongoDB commands. Motor runs commands in executor threads with a copy of
+  the calling context, so async views are covered too.
+- The ``Timed*Cache`` backends (selected in ``CACHE_BACKENDS``) count cache
+  hits and misses.
+- :class:`TimedDjangoTemplates` times template rendering.
+
+The totals go out in a ``Server-Timing`` header, which browser dev tools show
+next to the request, and into histograms that :func:`metrics_view` serves in
+the Prometheus text format. Each instrument costs a ``perf_counter`` call and
+an uncontended lock.
+
+Metrics live in process memory. With several gunicorn workers, set
+``METRICS_DIR`` to a directory they share: each worker writes its totals
+there at most once a second, and ``/metrics`` adds up every worker's file.
+Files are named after the worker's pid and a random id picked when it
+starts, so a new worker that reuses a pid never overwrites the totals of an
+old one; when a scrape finds a worker gone, it adds its totals to
+``base.json`` and removes its file.
+
+``/metrics`` needs ``Authorization: Bearer <METRICS_TOKEN>`` and refuses
+every scrape while no token is set. Client addresses prove nothing behind
+a reverse proxy, where every request comes from the proxy.
+"""
+
+import bisect
+import contextvars
+import fcntl
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from pymongo import monitoring
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """A metric family: one series per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(labels): list(values) for labels, values in self._series.items()}
+
+    def _labels(self, labels, **extra):
+        pairs = list(zip(self.labelnames, labels)) + list(extra.items())
+        if not pairs:
+            return ''
+        escape = lambda value: str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+    def exposition(self, series):
+        """Prometheus text lines for ``series`` (a :meth:`snapshot`, possibly merged)"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key in sorted(series):
+            lines.extend(self._sample_lines(tuple(json.loads(key)), series[key]))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            values = self._series.setdefault(labels, [0])
+            values[0] += amount
+
+    def _sample_lines(self, labels, values):
+        return [f'{self.name}_total{self._labels(labels)} {values[0]}']
+
+
+class Histogram(Metric):
+    """Series are ``[count per bucket..., count above the last bucket, sum]``"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._series.get(labels)
+            if values is None:
+                values = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += value
+
+    def _sample_lines(self, labels, values):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), values):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{self._labels(labels, le=bound)} {cumulative}')
+        lines.append(f'{self.name}_sum{self._labels(labels)} {values[-1]}')
+        lines.append(f'{self.name}_count{self._labels(labels)} {cumulative}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'portfolio_request_duration_seconds', 'Time from URL resolution to response, by view',
+    ('view', 'method', 'status'))
+REQUEST_MONGO_COMMANDS = Histogram(
+    'portfolio_request_mongo_commands', 'MongoDB commands sent per request, by view',
+    ('view',), buckets=COUNT_BUCKETS)
+MONGO_COMMAND_DURATION = Histogram(
+    'portfolio_mongo_command_duration_seconds', 'MongoDB command round trips, by command',
+    ('command', 'outcome'))
+TEMPLATE_RENDER_DURATION = Histogram(
+    'portfolio_template_render_seconds', 'Template render time, by template',
+    ('template',))
+CACHE_REQUESTS = Counter(
+    'portfolio_cache_requests', 'Cache lookups, by result', ('result',))
+REPLICA_LAG = Histogram(
+    'portfolio_replica_lag_seconds', 'Time from a MongoDB write to the SQLite replica applying it, by sync mode',
+    ('mode',), buckets=LAG_BUCKETS)
+
+METRICS = (REQUEST_DURATION, REQUEST_MONGO_COMMANDS, MONGO_COMMAND_DURATION,
+           TEMPLATE_RENDER_DURATION, CACHE_REQUESTS, REPLICA_LAG)
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+
+    __slots__ = ('mongo_commands', 'mongo_seconds', 'template_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, view_seconds):
+        """``Server-Timing`` header value; durations in milliseconds"""
+        return (f'view;dur={view_seconds * 1000:.1f}, '
+                f'mongo;dur={self.mongo_seconds * 1000:.1f};desc="{self.mongo_commands} commands", '
+                f'tpl;dur={self.template_seconds * 1000:.1f}, '
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"')
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current_request_metrics():
+    """The :class:`RequestMetrics` of the request being served, if any"""
+    return _current.get()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times MongoDB commands from the duration the driver measures"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, 'ok')
+
+    def failed(self, event):
+        self._record(event, 'error')
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_DURATION.observe((event.command_name, outcome), seconds)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.mongo_commands += 1
+            metrics.mongo_seconds += seconds
+
+
+mongo_command_listener = MongoCommandListener()
+
+_MISSING = object()
+# Set while a lookup is being counted: Django's get_many may loop over get
+# (and DatabaseCache.get calls get_many), which must not count again
+_counting = contextvars.ContextVar('counting_cache_lookup', default=False)
+
+
+class TimedCacheMixin:
+    """Counts hits and misses of ``get``/``get_many``; the async API goes through them"""
+
+    def get(self, key, default=None, version=None):
+        if _counting.get():
+            return super().get(key, default, version)
+        token = _counting.set(True)
+        try:
+            value = super().get(key, _MISSING, version)
+        finally:
+            _counting.reset(token)
+        record_cache_lookups(hits=value is not _MISSING, misses=value is _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        if _counting.get():
+            return super().get_many(keys, version)
+        keys = list(keys)
+        token = _counting.set(True)
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            _counting.reset(token)
+        record_cache_lookups(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+def record_cache_lookups(hits=0, misses=0):
+    if hits:
+        CACHE_REQUESTS.inc(('hit',), hits)
+    if misses:
+        CACHE_REQUESTS.inc(('miss',), misses)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class TimedLocMemCache(TimedCacheMixin, LocMemCache):
+    pass
+
+
+class TimedRedisCache(TimedCacheMixin, RedisCache):
+    pass
+
+
+class TimedFileBasedCache(TimedCacheMixin, FileBasedCache):
+    pass
+
+
+class TimedDatabaseCache(TimedCacheMixin, DatabaseCache):
+    pass
+
+
+class TimedTemplate:
+    """Wraps a backend template to time ``render``"""
+
+    def __init__(self, template):
+        self._template = template
+
+    @property
+    def origin(self):
+        return self._template.origin
+
+    @property
+    def template(self):
+        return self._template.template
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            seconds = time.perf_counter() - start
+            TEMPLATE_RENDER_DURATION.observe((self.origin.template_name or '<string>',), seconds)
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.template_seconds += seconds
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """``DjangoTemplates`` whose templates record their render time"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class ServerTimingMiddleware:
+    """Collects :class:`RequestMetrics` per request into ``Server-Timing`` and histograms
+
+    Sits last in ``MIDDLEWARE``, so it times URL resolution, the view and
+    template rendering but not the outer middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, seconds):
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unresolved>'
+        REQUEST_DURATION.observe((view, request.method, response.status_code), seconds)
+        REQUEST_MONGO_COMMANDS.observe((view,), metrics.mongo_commands)
+        response['Server-Timing'] = metrics.server_timing(seconds)
+        if getattr(settings, 'METRICS_DIR', ''):
+            _writer.maybe_write()
+        return response
+
+
+class _SnapshotWriter:
+    """Writes this process's metrics to ``METRICS_DIR`` at most once a second"""
+
+    interval = 1.0
+
+    def __init__(self):
+        self._written = 0.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._name = None
+
+    @property
+    def name(self):
+        """``metrics-<pid>-<id>.json``; the id is new in every process, forked ones included"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._name = f'metrics-{self._pid}-{uuid.uuid4().hex[:12]}.json'
+        return self._name
+
+    def maybe_write(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._written < self.interval:
+            return
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._written = now
+            path = os.path.join(settings.METRICS_DIR, self.name)
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump({metric.name: metric.snapshot() for metric in METRICS}, f)
+            os.replace(f'{path}.tmp', path)
+        finally:
+            self._lock.release()
+
+
+_writer = _SnapshotWriter()
+
+
+def publish():
+    """Write this process's metrics to ``METRICS_DIR``, if set, for processes that serve no requests"""
+    if getattr(settings, 'METRICS_DIR', ''):
+        _writer.maybe_write()
+
+
+def merge_snapshots(snapshots):
+    """Add up per-process snapshots series by series"""
+    merged = {metric.name: {} for metric in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            totals = merged.setdefault(name, {})
+            for key, values in series.items():
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], values)]
+                else:
+                    totals[key] = list(values)
+    return merged
+
+
+def _is_running(name):
+    """Whether the worker that writes the snapshot file ``name`` is still alive"""
+    if name == _writer.name:
+        return True
+    pid = int(name.split('-')[1])
+    if pid == os.getpid():
+        return False  # An earlier process with our pid
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def collect():
+    """Every metric's series: this process's, or all workers' with ``METRICS_DIR``"""
+    directory = getattr(settings, 'METRICS_DIR', '')
+    if not directory:
+        return {metric.name: metric.snapshot() for metric in METRICS}
+    _writer.maybe_write(force=True)
+    base_path = os.path.join(directory, 'base.json')
+    # Scrapes in other workers fold files into base.json too
+    with open(os.path.join(directory, 'base.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            base = _read_snapshot(base_path) or {}
+            running, exited = [], {}
+            for path in glob.glob(os.path.join(directory, 'metrics-*-*.json')):
+                snapshot = _read_snapshot(path)
+                if snapshot is None:
+                    continue
+                if _is_running(os.path.basename(path)):
+                    running.append(snapshot)
+                else:
+                    exited[path] = snapshot
+            if exited:
+                # Totals of exited workers move into base.json, so counters never go backwards
+                base = merge_snapshots([base, *exited.values()])
+                with open(f'{base_path}.tmp', 'w') as f:
+                    json.dump(base, f)
+                os.replace(f'{base_path}.tmp', base_path)
+                for path in exited:
+                    os.remove(path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return merge_snapshots([base, *running])
+
+
+def render_metrics():
+    series = collect()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.exposition(series.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs ``Authorization: Bearer <METRICS_TOKEN>`` (403 while unset)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mongo_id', models.CharField(max_length=24, null=True, unique=True)),
+                ('title', models.CharField(max_length=200, null=True)),
+                ('description', models.TextField(blank=True, default='')),
+                ('year', models.IntegerField(default=2024, null=True)),
+                ('technologies', models.JSONField(default=list)),
+                ('live_url', models.URLField(blank=True, null=True)),
+                ('github_url', models.URLField(blank=True, null=True)),
+                ('image_url', models.URLField(blank=True, null=True)),
+                ('featured', models.BooleanField(default=False, null=True)),
+                ('category', models.CharField(default='web', max_length=50, null=True)),
+                ('created_at', models.CharField(max_length=32, null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('document', models.TextField(default='{}')),
+                ('digest', models.CharField(default='', max_length=32)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReplicaState',
+            fields=[
+                ('collection', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.IntegerField(default=-1)),
+                ('mode', models.CharField(default='', max_length=20)),
+                ('resume_token', models.TextField(null=True)),
+                ('watermark', models.DateTimeField(null=True)),
+                ('synced_at', models.DateTimeField(null=True)),
+                ('lag_seconds', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectTechnology',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='technology_rows', to='portfolio.project')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at', 'mongo_id'], name='portfolio_p_created_e58e16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['year', 'mongo_id'], name='portfolio_p_year_cac2e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['title', 'mongo_id'], name='portfolio_p_title_f054f6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['category', 'created_at', 'mongo_id'], name='portfolio_p_categor_9223b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['featured'], name='portfolio_p_feature_243c66_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projecttechnology',
+            index=models.Index(fields=['name', 'project'], name='portfolio_p_name_b468ed_idx'),
+        ),
+    ]
@@ -1,20 +1,63 @@
 from django.db import models
 
+
 class Project(models.Model):
-    title = models.CharField(max_length=200)
-    description = models.TextField()
-    year = models.IntegerField(default=2024)
+    """Local replica of a document in the MongoDB ``projects`` collection
+
+    Kept in sync by ``portfolio.replica``. ``document`` is the whole
+    document as MongoDB Extended JSON, so reads return exactly what MongoDB
+    would; the other columns copy the fields the projects API filters and
+    sorts on, so those queries run on indexes. A field missing from the
+    document is NULL here, which SQLite sorts where MongoDB sorts missing
+    values.
+    """
+    mongo_id = models.CharField(max_length=24, unique=True, null=True)
+    title = models.CharField(max_length=200, null=True)
+    description = models.TextField(blank=True, default='')
+    year = models.IntegerField(default=2024, null=True)
     technologies = models.JSONField(default=list)
     live_url = models.URLField(blank=True, null=True)
     github_url = models.URLField(blank=True, null=True)
     image_url = models.URLField(blank=True, null=True)
-    featured = models.BooleanField(default=False)
-    category = models.CharField(max_length=50, default='web')
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    featured = models.BooleanField(default=False, null=True)
+    category = models.CharField(max_length=50, default='web', null=True)
+    # Copied as stored in MongoDB ("2024-01-31 12:00:00"), so it sorts the same
+    created_at = models.CharField(max_length=32, null=True)
+    updated_at = models.DateTimeField(null=True)
+    document = models.TextField(default='{}')
+    digest = models.CharField(max_length=32, default='')
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'mongo_id']),
+            models.Index(fields=['year', 'mongo_id']),
+            models.Index(fields=['title', 'mongo_id']),
+            # Category listings in the default order
+            models.Index(fields=['category', 'created_at', 'mongo_id']),
+            models.Index(fields=['featured']),
+        ]
 
     def __str__(self):
-        return self.title
+        return self.title or ''
+
+
+class ProjectTechnology(models.Model):
+    """One row per entry of ``Project.technologies``, for indexed technology filters"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='technology_rows')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=['name', 'project'])]
+
+
+class ReplicaState(models.Model):
+    """Progress of the replica sync, one row per replicated collection"""
+    collection = models.CharField(max_length=50, primary_key=True)
+    # Projects content version (portfolio.versioning) the replica has caught up with
+    version = models.IntegerField(default=-1)
+    mode = models.CharField(max_length=20, default='')
+    resume_token = models.TextField(null=True)
+    watermark = models.DateTimeField(null=True)
+    synced_at = models.DateTimeField(null=True)
+    lag_seconds = models.FloatField(null=True)
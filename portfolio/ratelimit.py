@@ -0,0 +1,163 @@
+"""
+Token-bucket rate limiting for the public write endpoints
+
+Each endpoint named in ``RATE_LIMITS`` gets a per-client-IP bucket and a
+global bucket, written as ``"<tokens>/<period>"`` (``"5/m"`` allows bursts
+of 5 and refills at 5 per minute). A request needs a token from every bucket;
+otherwise it gets a 429 with ``Retry-After``.
+
+Buckets live in the default Django cache so limits hold across workers.
+With Django's Redis backend both buckets are checked and updated atomically
+by one Lua script, i.e. a single round trip per request. Other backends
+read both buckets with ``get_many`` and write them back with ``set_many``;
+for the in-process LocMemCache that costs no network at all, but file and
+database caches are not atomic across workers.
+"""
+
+import asyncio
+import functools
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import JsonResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[i * 2])
+        local capacity = tonumber(ARGV[i * 2 + 1])
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+end
+return tostring(wait)
+"""
+
+
+def parse_rate(rate):
+    """``"5/m"`` -> ``(refill per second, capacity)``"""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    return count / PERIODS[period[:1] or 's'], count
+
+
+def client_ip(request):
+    """Client address, taken from X-Forwarded-For behind a trusted proxy"""
+    if getattr(settings, 'RATE_LIMIT_TRUST_X_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            # The right-most entry was added by our proxy and can't be spoofed
+            return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class TokenBucketLimiter:
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._scripts = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _buckets(self, endpoint, ip):
+        config = settings.RATE_LIMITS.get(endpoint, {})
+        buckets = []
+        if config.get('per_ip'):
+            buckets.append((f'ratelimit:{endpoint}:ip:{ip}', *parse_rate(config['per_ip'])))
+        if config.get('global'):
+            buckets.append((f'ratelimit:{endpoint}:global', *parse_rate(config['global'])))
+        return buckets
+
+    def check(self, endpoint, ip, now=None):
+        """Take a token from each bucket; returns seconds to wait, 0 if allowed"""
+        buckets = self._buckets(endpoint, ip)
+        if not buckets:
+            return 0
+        now = time.time() if now is None else now
+        if isinstance(self.cache, RedisCache):
+            return self._check_redis(buckets, now)
+        return self._check_cache(buckets, now)
+
+    def _check_redis(self, buckets, now):
+        keys = [self.cache.make_and_validate_key(key) for key, _, _ in buckets]
+        client = self.cache._cache.get_client(keys[0], write=True)
+        script = self._scripts.get(client.connection_pool)
+        if script is None:
+            # EVALSHA with an EVAL fallback: one round trip per check
+            script = self._scripts[client.connection_pool] = client.register_script(TOKEN_BUCKET_LUA)
+        args = [now]
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        return float(script(keys=keys, args=args))
+
+    def _check_cache(self, buckets, now):
+        with self._lock:
+            states = self.cache.get_many([key for key, _, _ in buckets])
+            wait, updated = 0, {}
+            for key, rate, capacity in buckets:
+                tokens, last = states.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0, now - last) * rate)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+                updated[key] = (tokens - 1, now)
+            if not wait:
+                timeout = max(math.ceil(capacity / rate) + 1 for _, rate, capacity in buckets)
+                self.cache.set_many(updated, timeout)
+            return wait
+
+
+limiter = TokenBucketLimiter()
+
+
+def rate_limited_response(wait):
+    response = JsonResponse({"error": "Rate limit exceeded, please retry later"}, status=429)
+    response["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def rate_limit(endpoint):
+    """Apply the ``RATE_LIMITS[endpoint]`` buckets to a sync or async view"""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                    wait = await sync_to_async(limiter.check)(endpoint, client_ip(request))
+                    if wait:
+                        return rate_limited_response(wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                wait = limiter.check(endpoint, client_ip(request))
+                if wait:
+                    return rate_limited_response(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,328 @@
+"""
+SQLite read replica of the projects collection
+
+:class:`ProjectsReplica` mirrors the MongoDB ``projects`` collection into
+the ``Project`` table (``portfolio.models``), so listings can be answered
+by indexed queries on a local file instead of a network round trip (see
+``portfolio.repository``). ``manage.py sync_replica`` runs it as a single
+long-lived process next to the web workers, which only read.
+
+The first run copies the whole collection in batches. After that it
+follows changes:
+
+- from a change stream on replica sets, resuming after restarts from the
+  token saved in ``ReplicaState``
+- elsewhere by polling the projects content version (``portfolio.versioning``)
+  every ``REPLICA_POLL_INTERVAL`` seconds. When it moves, documents whose
+  ``updated_at`` is past the saved watermark are copied and rows whose
+  ``_id`` is gone are deleted. A version change that shows up as neither
+  compares every document against the digest of its row instead.
+
+Rows are only rewritten when the digest of their document changes, so a
+full copy of an unchanged collection writes nothing. Each applied change
+records its lag, the time from the write in MongoDB to the row in SQLite, in
+``ReplicaState.lag_seconds`` and the ``portfolio_replica_lag_seconds``
+histogram.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import json_util
+from django.conf import settings
+from django.db import connection, transaction
+from pymongo.errors import OperationFailure
+
+from .db import db, projects_collection, meta_collection
+from .metrics import REPLICA_LAG, publish
+from .models import Project, ProjectTechnology, ReplicaState
+from .snapshot import CHANGE_STREAMS_UNSUPPORTED, version_from_change
+from .utils import project_digest
+from .versioning import PROJECTS
+
+logger = logging.getLogger('portfolio.replica')
+
+# ReplicaState row of the projects collection
+STATE_KEY = 'projects'
+
+ROW_FIELDS = (
+    'title', 'description', 'year', 'technologies', 'live_url', 'github_url', 'image_url', 'featured',
+    'category', 'created_at', 'updated_at', 'document', 'digest',
+)
+
+
+def utcnow():
+    """Naive UTC, as PyMongo returns datetimes and the ``Project`` columns store them"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _utc(value):
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _of_type(value, kind, max_length=None):
+    """``value`` if it is a ``kind`` (that fits), else None"""
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        return None
+    if max_length is not None and len(value) > max_length:
+        return None
+    return value
+
+
+def row_values(document, digest=None):
+    """Column values of the ``Project`` row mirroring ``document``
+
+    Values of an unexpected type become NULL: the full document is still
+    returned, but the replica can't filter or sort on them.
+    """
+    technologies = document.get('technologies')
+    if isinstance(technologies, str):
+        technologies = [technologies]
+    created_at = document.get('created_at')
+    if isinstance(created_at, datetime):
+        created_at = str(created_at)
+    return {
+        'title': _of_type(document.get('title'), str, 200),
+        'description': document.get('description') if isinstance(document.get('description'), str) else '',
+        'year': _of_type(document.get('year'), int),
+        'technologies': [t for t in technologies if isinstance(t, str)] if isinstance(technologies, list) else [],
+        'live_url': _of_type(document.get('live_url'), str, 200),
+        'github_url': _of_type(document.get('github_url'), str, 200),
+        'image_url': _of_type(document.get('image_url'), str, 200),
+        'featured': _of_type(document.get('featured'), bool),
+        'category': _of_type(document.get('category'), str, 50),
+        'created_at': _of_type(created_at, str, 32),
+        'updated_at': _utc(document.get('updated_at')),
+        'document': json_util.dumps(document),
+        'digest': digest or project_digest(document),
+    }
+
+
+def enable_wal():
+    """Let the web workers read while the sync process writes"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+def get_replica_state():
+    state, _ = ReplicaState.objects.get_or_create(collection=STATE_KEY)
+    return state
+
+
+def is_fresh(state, version, max_staleness=None):
+    """Whether reads reflecting content ``version`` may use the replica"""
+    if max_staleness is None:
+        max_staleness = settings.REPLICA_MAX_STALENESS
+    return (state is not None and state.synced_at is not None and state.version >= version
+            and (utcnow() - state.synced_at).total_seconds() <= max_staleness)
+
+
+class ProjectsReplica:
+    def __init__(self, mode='auto', poll_interval=2, batch_size=500, overlap=5):
+        # 'auto' tries a change stream first and falls back to 'polling'
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        # Writes stamped just before the watermark may become visible after it
+        self.overlap = timedelta(seconds=overlap)
+        self._stop = threading.Event()
+
+    # Lifecycle
+
+    def run(self):
+        """Copy the collection if needed, then follow changes until :meth:`stop`"""
+        enable_wal()
+        while not self._stop.is_set():
+            try:
+                if self.mode == 'polling':
+                    self._poll_forever()
+                else:
+                    self._watch_forever()
+            except Exception as e:
+                logger.error("❌ Replica sync lost MongoDB (%s): %s", self.mode, e)
+                if isinstance(e, OperationFailure):
+                    # E.g. the resume token fell off the oplog: start over
+                    # from a fresh stream and a full comparison
+                    ReplicaState.objects.filter(collection=STATE_KEY).update(resume_token=None)
+                self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch_forever(self):
+        state = get_replica_state()
+        pipeline = [{'$match': {'ns.coll': {'$in': [projects_collection.name, meta_collection.name]}}}]
+        resume_after = json_util.loads(state.resume_token) if state.resume_token else None
+        try:
+            stream = db.watch(pipeline, full_document='updateLookup', max_await_time_ms=1000,
+                              resume_after=resume_after)
+        except (OperationFailure, NotImplementedError) as e:
+            if isinstance(e, OperationFailure) and e.code != CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            logger.info("🔁 Change streams unavailable, replica sync falls back to polling")
+            self.mode = 'polling'
+            return
+        self.mode = 'change_stream'
+        with stream:
+            if resume_after is None:
+                # Changes made during the copy are replayed from the stream afterwards
+                self.full_sync()
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self._apply(change)
+                self._save(resume_token=json_util.dumps(stream.resume_token))
+
+    def _poll_forever(self):
+        self.poll()
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    # Syncing
+
+    def _read_version(self):
+        doc = meta_collection.find_one({'_id': PROJECTS}, {'version': 1})
+        return doc['version'] if doc else 0
+
+    def _save(self, lag=None, **fields):
+        fields.update(mode=self.mode, synced_at=utcnow())
+        if lag is not None:
+            fields['lag_seconds'] = lag
+            REPLICA_LAG.observe((self.mode,), lag)
+        ReplicaState.objects.update_or_create(collection=STATE_KEY, defaults=fields)
+        publish()
+
+    def full_sync(self):
+        """Bring every row in line with the collection; returns ``(upserted, deleted)``
+
+        The content version is read first, so the replica never claims a
+        version newer than the documents it copied.
+        """
+        started = time.perf_counter()
+        version = self._read_version()
+        seen, upserted, batch, watermark = set(), 0, [], None
+        for document in projects_collection.find({}).batch_size(self.batch_size):
+            batch.append(document)
+            seen.add(str(document['_id']))
+            watermark = max(filter(None, (watermark, _utc(document.get('updated_at')))), default=None)
+            if len(batch) >= self.batch_size:
+                upserted += self.upsert(batch)
+                batch = []
+        upserted += self.upsert(batch)
+        deleted = self.delete(set(Project.objects.values_list('mongo_id', flat=True)) - seen)
+        self._save(version=version, watermark=watermark)
+        logger.info("📥 Replica synced %s projects at v%s: %s upserted, %s deleted in %.2fs",
+                    len(seen), version, upserted, deleted, time.perf_counter() - started)
+        return upserted, deleted
+
+    def poll(self):
+        """Apply what changed since the last poll; returns whether anything did"""
+        state = get_replica_state()
+        version = self._read_version()
+        if state.version >= 0 and version == state.version:
+            self._save()
+            return False
+        if state.version < 0:
+            self.full_sync()
+            return True
+
+        query = {'updated_at': {'$gte': state.watermark - self.overlap}} if state.watermark else {}
+        documents = list(projects_collection.find(query))
+        upserted = self.upsert(documents)
+        ids = {str(document['_id']) for document in projects_collection.find({}, {'_id': 1})}
+        deleted = self.delete(set(Project.objects.values_list('mongo_id', flat=True)) - ids)
+        if not upserted and not deleted:
+            # Written without an updated_at stamp (or by hand): compare everything
+            logger.info("🔍 Projects v%s changed nothing past the watermark; comparing every document", version)
+            upserted, deleted = self.full_sync()
+            return bool(upserted or deleted)
+
+        stamps = [stamp for stamp in (_utc(d.get('updated_at')) for d in documents) if stamp is not None]
+        watermark = max(stamps + ([state.watermark] if state.watermark else []), default=None)
+        lag = (utcnow() - max(stamps)).total_seconds() if upserted and stamps else None
+        self._save(version=version, watermark=watermark, lag=lag)
+        logger.info("🔁 Replica caught up with projects v%s: %s upserted, %s deleted", version, upserted, deleted)
+        return True
+
+    def _apply(self, change):
+        operation = change['operationType']
+        key = change.get('documentKey', {}).get('_id')
+        written_at = change.get('wallTime') or change['clusterTime'].as_datetime()
+        lag = max(0.0, (utcnow() - _utc(written_at)).total_seconds())
+        if change['ns']['coll'] == meta_collection.name:
+            version = version_from_change(change) if key == PROJECTS else None
+            if version is not None:
+                self._save(version=version)
+            return
+        if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+            self.upsert([change['fullDocument']])
+        elif operation in ('delete', 'update'):
+            # An update whose document is already gone is a delete
+            self.delete([str(key)])
+        elif operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+            self.delete(Project.objects.values_list('mongo_id', flat=True))
+        self._save(lag=lag)
+
+    # Writing rows
+
+    def upsert(self, documents):
+        """Create or update the rows of ``documents``; returns how many changed"""
+        if len(documents) > self.batch_size:
+            return sum(self.upsert(documents[start:start + self.batch_size])
+                       for start in range(0, len(documents), self.batch_size))
+        if not documents:
+            return 0
+        documents = {str(document['_id']): document for document in documents}
+        existing = {
+            mongo_id: (pk, digest)
+            for mongo_id, pk, digest in Project.objects.filter(mongo_id__in=list(documents))
+            .values_list('mongo_id', 'pk', 'digest')
+        }
+        created, updated = [], []
+        for mongo_id, document in documents.items():
+            digest = project_digest(document)
+            pk, current = existing.get(mongo_id, (None, None))
+            if digest == current:
+                continue
+            row = Project(pk=pk, mongo_id=mongo_id, **row_values(document, digest))
+            (updated if pk else created).append(row)
+        if not created and not updated:
+            return 0
+        with transaction.atomic():
+            Project.objects.bulk_update(updated, ROW_FIELDS, batch_size=self.batch_size)
+            Project.objects.bulk_create(created, batch_size=self.batch_size)
+            changed = [row.mongo_id for row in created + updated]
+            pks = dict(Project.objects.filter(mongo_id__in=changed).values_list('mongo_id', 'pk'))
+            ProjectTechnology.objects.filter(project_id__in=pks.values()).delete()
+            ProjectTechnology.objects.bulk_create([
+                ProjectTechnology(project_id=pks[row.mongo_id], name=name[:100])
+                for row in created + updated for name in dict.fromkeys(row.technologies)
+            ], batch_size=self.batch_size)
+        return len(created) + len(updated)
+
+    def delete(self, mongo_ids):
+        """Delete the rows of ``mongo_ids``; returns how many there were"""
+        mongo_ids = list(mongo_ids)
+        deleted = 0
+        for start in range(0, len(mongo_ids), self.batch_size):
+            chunk = mongo_ids[start:start + self.batch_size]
+            deleted += Project.objects.filter(mongo_id__in=chunk).delete()[1].get(Project._meta.label, 0)
+        return deleted
+
+
+def get_replica(**options):
+    """A :class:`ProjectsReplica` configured from settings; ``options`` override them"""
+    options = {
+        'mode': getattr(settings, 'REPLICA_MODE', 'auto'),
+        'poll_interval': settings.REPLICA_POLL_INTERVAL,
+        'batch_size': settings.REPLICA_BATCH_SIZE,
+        'overlap': settings.REPLICA_WATERMARK_OVERLAP,
+    } | options
+    return ProjectsReplica(**options)
@@ -0,0 +1,110 @@
+"""
+Where project listings are read from
+
+Both repositories answer the projects API's keyset queries (filters, a sort
+field walked together with ``_id``, an optional cursor position and limit)
+and return MongoDB documents:
+
+- :class:`MongoProjectRepository` queries MongoDB
+- :class:`ReplicaProjectRepository` queries the SQLite replica kept by
+  ``portfolio.replica``, on the ``Project`` table's indexes
+
+:func:`get_project_repository` picks the replica when
+``PROJECTS_READ_SOURCE`` is ``'replica'`` and it has caught up with the
+current content version within ``REPLICA_MAX_STALENESS`` seconds, and
+MongoDB otherwise, so a stopped sync process costs speed, not correctness.
+"""
+
+from asgiref.sync import sync_to_async
+from bson import json_util
+from django.conf import settings
+from django.db.models import Q
+
+from .async_db import get_async_db
+from .db import projects_collection
+from .models import Project, ProjectTechnology, ReplicaState
+from .replica import STATE_KEY, is_fresh
+from .utils import keyset_query
+
+
+class MongoProjectRepository:
+    name = 'mongo'
+
+    def find(self, filters, field, direction, after=None, limit=None, projection=None):
+        """Projects matching ``filters``, ordered by ``(field, _id)``, strictly after ``after``"""
+        query, sort = keyset_query(filters, field, direction, after)
+        cursor = projects_collection.find(query, projection).sort(sort)
+        return list(cursor.limit(limit) if limit else cursor)
+
+    async def afind(self, filters, field, direction, after=None, limit=None, projection=None):
+        query, sort = keyset_query(filters, field, direction, after)
+        cursor = get_async_db()[projects_collection.name].find(query, projection).sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit)
+
+
+def replica_filter(filters):
+    """``Q`` for a ``build_project_filter`` query"""
+    q = Q()
+    for name, value in filters.items():
+        if name == 'technologies':
+            q &= Q(pk__in=ProjectTechnology.objects.filter(name=value).values('project_id'))
+        else:
+            q &= Q(**{name: value})
+    return q
+
+
+def replica_keyset_filter(field, direction, value, object_id):
+    """``Q`` version of :func:`portfolio.utils.keyset_filter`
+
+    SQLite sorts NULLs lowest, as MongoDB does missing values, and 24-digit
+    hex ``_id`` strings sort like the ObjectIds they spell.
+    """
+    op = 'lt' if direction < 0 else 'gt'
+    tie = Q(**{f'mongo_id__{op}': str(object_id)})
+    if value is None:
+        tie &= Q(**{f'{field}__isnull': True})
+        return tie if direction < 0 else tie | Q(**{f'{field}__isnull': False})
+    q = Q(**{f'{field}__{op}': value}) | (tie & Q(**{field: value}))
+    return q | Q(**{f'{field}__isnull': True}) if direction < 0 else q
+
+
+class ReplicaProjectRepository:
+    name = 'replica'
+
+    def find(self, filters, field, direction, after=None, limit=None, projection=None):
+        """:meth:`MongoProjectRepository.find` on the replica"""
+        rows = Project.objects.filter(replica_filter(filters))
+        if after is not None:
+            rows = rows.filter(replica_keyset_filter(field, direction, *after))
+        order = (field, 'mongo_id') if direction > 0 else (f'-{field}', '-mongo_id')
+        rows = rows.order_by(*order).values_list('document', flat=True)
+        documents = [json_util.loads(document) for document in (rows[:limit] if limit else rows)]
+        if projection is not None:
+            documents = [{name: value for name, value in document.items() if name == '_id' or name in projection}
+                         for document in documents]
+        return documents
+
+    async def afind(self, *args, **kwargs):
+        return await sync_to_async(self.find)(*args, **kwargs)
+
+
+mongo_repository = MongoProjectRepository()
+replica_repository = ReplicaProjectRepository()
+
+
+def get_project_repository(version):
+    """The repository to read projects at content ``version`` from"""
+    if getattr(settings, 'PROJECTS_READ_SOURCE', 'mongo') == 'replica':
+        state = ReplicaState.objects.filter(collection=STATE_KEY).first()
+        if is_fresh(state, version):
+            return replica_repository
+    return mongo_repository
+
+
+async def aget_project_repository(version):
+    """Async :func:`get_project_repository`"""
+    if getattr(settings, 'PROJECTS_READ_SOURCE', 'mongo') != 'replica':
+        return mongo_repository
+    return await sync_to_async(get_project_repository)(version)
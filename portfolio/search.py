@@ -0,0 +1,225 @@
+"""
+In-process full-text search over projects
+
+A MongoDB ``$text`` index can't match prefixes, which type-ahead needs, so
+each worker keeps a compact inverted index instead: term -> {project _id:
+weight}, with weights summed over ``title``, ``technologies``, ``category``
+and ``description`` (in that order of importance). Every query term must
+match; the last one also matches as a prefix. Scores are weight x idf, with
+prefix-only matches counting half.
+
+With ``PROJECTS_SNAPSHOT_ENABLED`` the snapshot owns the index and applies
+each change to it as it arrives. Otherwise :func:`get_search_index` keeps a
+standalone index that catches up whenever the projects content version
+moves: it reads only the projects whose ``updated_at`` is past the last one
+it saw, and the ``_id`` of every project to drop deleted ones. A version
+bump that changed nothing it can see (a write without ``updated_at``)
+falls back to comparing every project.
+"""
+
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+from .db import projects_collection
+from .versioning import get_content_version
+
+FIELD_WEIGHTS = {'title': 8.0, 'technologies': 4.0, 'category': 2.0, 'description': 1.0}
+
+# A one-letter prefix can expand to much of the vocabulary; cap the work
+MAX_PREFIX_TERMS = 500
+PREFIX_PENALTY = 0.5
+
+# Re-read projects stamped this long before the newest stamp seen, in case
+# another server's clock is behind (as REPLICA_WATERMARK_OVERLAP)
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def project_terms(project):
+    """``{term: weight}`` for one project"""
+    terms = defaultdict(float)
+    for field, weight in FIELD_WEIGHTS.items():
+        value = project.get(field)
+        for text in value if isinstance(value, list) else [value]:
+            if isinstance(text, str):
+                for term in tokenize(text):
+                    terms[term] += weight
+    return terms
+
+
+class SearchIndex:
+    def __init__(self):
+        self.version = -1
+        self.watermark = None  # newest updated_at seen by refresh()
+        self._postings = {}   # term -> {_id: weight}
+        self._documents = {}  # _id -> (project, terms)
+        self._vocabulary = []  # sorted terms, rebuilt lazily for prefix lookups
+        self._vocabulary_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    # Updates
+
+    def add(self, project):
+        """Index ``project``, replacing any previous version of it; returns whether it changed"""
+        with self._lock:
+            key = project['_id']
+            current = self._documents.get(key)
+            if current is not None:
+                if current[0] == project:
+                    return False
+                self._unindex(key, current[1])
+            terms = project_terms(project)
+            for term, weight in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._vocabulary_dirty = True
+                postings[key] = weight
+            self._documents[key] = (project, terms)
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            current = self._documents.pop(key, None)
+            if current is not None:
+                self._unindex(key, current[1])
+            return current is not None
+
+    def _unindex(self, key, terms):
+        for term in terms:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._postings, self._documents, self._vocabulary = {}, {}, []
+            self._vocabulary_dirty = False
+
+    def sync(self, projects, version):
+        """Make the index hold exactly ``projects``, touching only what changed"""
+        with self._lock:
+            seen = set()
+            for project in projects:
+                seen.add(project['_id'])
+                self.add(project)
+            for key in [key for key in self._documents if key not in seen]:
+                self.remove(key)
+            self.version = version
+
+    def refresh(self, collection, version):
+        """Catch up with ``version`` of ``collection``, reading only what was written since"""
+        with self._lock:
+            if self.version < 0:
+                projects = list(collection.find({}))
+                self.sync(projects, version)
+            else:
+                since = self.watermark - WATERMARK_OVERLAP if self.watermark else None
+                projects = list(collection.find({'updated_at': {'$gte': since} if since else {'$exists': True}}))
+                changed = sum(self.add(project) for project in projects)
+                ids = {document['_id'] for document in collection.find({}, {'_id': 1})}
+                changed += sum(self.remove(key) for key in [key for key in self._documents if key not in ids])
+                if not changed:
+                    projects = list(collection.find({}))
+                    self.sync(projects, version)
+                self.version = version
+            stamps = [p['updated_at'] for p in projects if isinstance(p.get('updated_at'), datetime)]
+            self.watermark = max(stamps + ([self.watermark] if self.watermark else []), default=self.watermark)
+
+    # Queries
+
+    def _expand(self, prefix):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _term_scores(self, term, prefix):
+        """``{_id: score}`` for one query term, or for every term it prefixes"""
+        total = len(self._documents)
+        scores = None
+        for candidate in (self._expand(term) if prefix else [term]):
+            postings = self._postings.get(candidate)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            factor = idf if candidate == term else idf * PREFIX_PENALTY
+            if scores is None:
+                scores = {key: weight * factor for key, weight in postings.items()}
+                continue
+            for key, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        return scores or {}
+
+    def search(self, query, limit=20, prefix=True, where=None):
+        """Best ``limit`` ``(score, project)`` pairs for ``query``
+
+        ``where`` optionally filters the matching projects.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            per_term = [
+                self._term_scores(term, prefix and i == len(terms) - 1)
+                for i, term in enumerate(terms)
+            ]
+            # Intersect starting from the rarest term
+            per_term.sort(key=len)
+            totals = per_term[0]
+            for scores in per_term[1:]:
+                totals = {key: total + scores[key] for key, total in totals.items() if key in scores}
+            if where is not None:
+                totals = {key: total for key, total in totals.items() if where(self._documents[key][0])}
+            best = heapq.nlargest(limit, totals.items(), key=itemgetter(1))
+            results = [(score, self._documents[key][0]) for key, score in best]
+        # Ties break on title so results are stable
+        results.sort(key=lambda result: (-result[0], result[1].get('title') or ''))
+        return results
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """A search index reflecting the current projects content version"""
+    global _index, _index_pid
+    from .snapshot import get_snapshot
+
+    version = get_content_version()
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.is_fresh(version):
+        return snapshot.search_index
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            _index, _index_pid = SearchIndex(), os.getpid()
+        if _index.version < version:
+            _index.refresh(projects_collection, version)
+    return _index
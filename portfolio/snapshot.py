@@ -0,0 +1,257 @@
+"""
+In-process, read-only snapshot of the projects collection
+
+Each worker loads the projects once and then keeps them current in a
+background thread, either from a MongoDB change stream or, where change
+streams are unavailable (standalone mongod, test stand-ins), by polling the
+projects content version from ``portfolio.versioning``.
+
+Readers only use the snapshot while it is known to be fresh: it must have
+caught up with the current content version and have heard from MongoDB
+within ``PROJECTS_SNAPSHOT_MAX_STALENESS`` seconds. Otherwise callers fall
+back to querying MongoDB directly.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .db import db, projects_collection, meta_collection
+from .search import SearchIndex
+from .versioning import PROJECTS
+
+logger = logging.getLogger('portfolio.snapshot')
+
+# Raised by servers that cannot open change streams (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def matches(project, query):
+    """Evaluate a ``build_project_filter`` query against a project document"""
+    for field, value in query.items():
+        current = project.get(field)
+        if isinstance(current, list):
+            if value not in current:
+                return False
+        elif current != value:
+            return False
+    return True
+
+
+def version_from_change(change):
+    """The content version a change event on the meta collection wrote, or None
+
+    Read from the event itself: with ``full_document='updateLookup'`` the
+    ``fullDocument`` of an update is the document as it is when the event is
+    processed, which may already show later bumps whose project writes have
+    not been applied yet.
+    """
+    operation = change['operationType']
+    if operation == 'update':
+        return change.get('updateDescription', {}).get('updatedFields', {}).get('version')
+    if operation in ('insert', 'replace'):
+        return (change.get('fullDocument') or {}).get('version')
+    return None
+
+
+def sort_key(project, field):
+    """Sort key ordering documents the way Mongo does for ``(field, _id)``"""
+    value = project.get(field)
+    return (value is not None, value, project['_id'])
+
+
+class ProjectsSnapshot:
+    def __init__(self, mode='auto', poll_interval=5, max_staleness=30):
+        # 'auto' tries a change stream first and falls back to 'polling'
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.version = -1
+        self.fresh_at = None
+        self._projects = {}
+        self._sorted = {}
+        self.search_index = SearchIndex()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Lifecycle
+
+    def start(self):
+        """Load the collection and start following changes in the background"""
+        self._reload(self._read_version())
+        self._thread = threading.Thread(target=self._run, name='projects-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.mode == 'polling':
+                    self._poll_forever()
+                else:
+                    self._watch_forever()
+            except Exception as e:
+                logger.error(f"❌ Projects snapshot lost MongoDB ({self.mode}): {e}")
+                self._stop.wait(self.poll_interval)
+                try:
+                    # Changes may have been missed while disconnected
+                    self._reload(self._read_version())
+                except PyMongoError:
+                    pass
+
+    def _watch_forever(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': [projects_collection.name, meta_collection.name]}}}]
+        try:
+            stream = db.watch(pipeline, full_document='updateLookup', max_await_time_ms=1000)
+        except (OperationFailure, NotImplementedError) as e:
+            if isinstance(e, OperationFailure) and e.code != CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            logger.info("🔁 Change streams unavailable, projects snapshot falls back to polling")
+            self.mode = 'polling'
+            return
+        self.mode = 'change_stream'
+        with stream:
+            # Anything written between the initial load and opening the stream
+            self._reload(self._read_version())
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self._apply(change)
+                self.fresh_at = time.monotonic()
+
+    def _poll_forever(self):
+        while not self._stop.wait(self.poll_interval):
+            version = self._read_version()
+            if version != self.version:
+                self._reload(version)
+            self.fresh_at = time.monotonic()
+
+    # Loading and applying changes
+
+    def _read_version(self):
+        doc = meta_collection.find_one({'_id': PROJECTS}, {'version': 1})
+        return doc['version'] if doc else 0
+
+    def _reload(self, version):
+        """Replace the snapshot with the collection as of ``version`` or later"""
+        projects = {doc['_id']: doc for doc in projects_collection.find({})}
+        self.search_index.sync(projects.values(), version)
+        with self._lock:
+            self._projects = projects
+            self._sorted = {}
+            self.version = version
+            self.fresh_at = time.monotonic()
+        logger.info(f"📸 Projects snapshot loaded: {len(projects)} projects at v{version}")
+
+    def _apply(self, change):
+        operation = change['operationType']
+        collection = change['ns']['coll']
+        key = change.get('documentKey', {}).get('_id')
+        with self._lock:
+            if collection == meta_collection.name:
+                version = version_from_change(change) if key == PROJECTS else None
+                if version is not None:
+                    self.version = version
+                return
+            if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+                self._projects[key] = change['fullDocument']
+                self.search_index.add(change['fullDocument'])
+            elif operation == 'delete' or operation == 'update':
+                # An update whose document is already gone is a delete
+                self._projects.pop(key, None)
+                self.search_index.remove(key)
+            elif operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+                self._projects = {}
+                self.search_index.clear()
+            self._sorted = {}
+
+    # Reads
+
+    def staleness(self):
+        """Seconds since the snapshot last confirmed it was current"""
+        if self.fresh_at is None:
+            return float('inf')
+        return time.monotonic() - self.fresh_at
+
+    def is_fresh(self, version):
+        """Whether reads reflecting content ``version`` may use the snapshot"""
+        return self.version >= version and self.staleness() <= self.max_staleness
+
+    def find(self, query=None, field='created_at', direction=-1, after=None, limit=None):
+        """Filtered, sorted copies of the snapshot's projects
+
+        ``after`` is a ``(value, _id)`` keyset position as decoded from an API
+        cursor; only documents strictly after it are returned.
+        """
+        with self._lock:
+            ordered = self._sorted.get(field)
+            if ordered is None:
+                ordered = sorted(self._projects.values(), key=lambda p: sort_key(p, field))
+                self._sorted[field] = ordered
+        start, end = 0, len(ordered)
+        if after is not None:
+            position = (after[0] is not None, after[0], after[1])
+            if direction > 0:
+                start = bisect.bisect_right(ordered, position, key=lambda p: sort_key(p, field))
+            else:
+                end = bisect.bisect_left(ordered, position, key=lambda p: sort_key(p, field))
+        indexes = range(start, end) if direction > 0 else range(end - 1, start - 1, -1)
+        results = []
+        for i in indexes:
+            project = ordered[i]
+            if query and not matches(project, query):
+                continue
+            results.append(dict(project))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'version': self.version,
+            'projects': len(self._projects),
+            'staleness': round(self.staleness(), 3),
+        }
+
+
+_snapshot = None
+_snapshot_pid = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """The worker's projects snapshot, or None when disabled
+
+    Started on first use in each process, so pre-fork servers load it in
+    every worker rather than sharing a thread-less copy from the master.
+    """
+    global _snapshot, _snapshot_pid
+    if not getattr(settings, 'PROJECTS_SNAPSHOT_ENABLED', False):
+        return None
+    if _snapshot is not None and _snapshot_pid == os.getpid():
+        return _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_pid != os.getpid():
+            snapshot = ProjectsSnapshot(
+                mode=getattr(settings, 'PROJECTS_SNAPSHOT_MODE', 'auto'),
+                poll_interval=settings.PROJECTS_SNAPSHOT_POLL_INTERVAL,
+                max_staleness=settings.PROJECTS_SNAPSHOT_MAX_STALENESS,
+            )
+            try:
+                snapshot.start()
+            except PyMongoError as e:
+                logger.error(f"❌ Could not load projects snapshot: {e}")
+                return None
+            _snapshot, _snapshot_pid = snapshot, os.getpid()
+    return _snapshot
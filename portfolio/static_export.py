@@ -0,0 +1,279 @@
+"""
+Static export of the public site
+
+:func:`export_site` pre-renders what anonymous visitors read into a
+directory that nginx or a CDN can serve without reaching Django:
+
+- ``index.html``: the home page with its first page of project cards
+- ``api/projects/index.json`` and ``api/projects/page/<n>.json``: the
+  projects API, page by page, in its default sort order
+- ``api/projects/category/<category>/...``: the same per category
+- ``api/projects/facets/index.json``: the facet counts
+
+Every page carries the API's ``next_cursor`` plus a ``next_page`` link to
+the next exported page. ``.gz``/``.br`` siblings are written next to each
+file for ``gzip_static``/``brotli_static``.
+
+Each build goes into a new directory under ``<output>.builds/``, and
+``<output>`` is a symlink that is swapped atomically once the build is
+complete, so readers never see a half-written site. The previous build is
+kept for requests still reading it.
+
+Rebuilds are incremental: ``.export-manifest.json`` records a hash of the
+contents of every project and, per file, a key derived from the hashes of
+the projects it shows. Files whose key didn't change are hard-linked from
+the previous build instead of being rendered again, so after editing one
+project only the pages showing it are rendered. A new or deleted project
+shifts every later page of its listings, which are rendered again too.
+
+With ``STATIC_EXPORT_DIR`` set, :func:`schedule_export` (called by the
+project write paths) rebuilds shortly after each write. Bulk imports, which
+run in processes that exit right after, call :func:`export_now` instead.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.text import slugify
+
+from .compression import SUFFIXES, write_compressed_siblings
+from .db import projects_collection
+from .encoders import get_encoder
+from .facets import FACET_FIELDS, apply_project_changes, facets_payload
+from .utils import parse_project_sort, project_digest, projects_page
+from .versioning import get_content_version
+
+logger = logging.getLogger('portfolio.static_export')
+
+MANIFEST = '.export-manifest.json'
+# Bump when the layout or contents of exported files change
+FORMAT_VERSION = 1
+TEMPLATES = ('index.html', 'includes/project_card.html')
+
+
+class ExportError(Exception):
+    """Raised when the output path can't be used for an export"""
+
+
+def _key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+
+def _fingerprint():
+    """Everything besides the projects that the exported bytes depend on"""
+    sources = []
+    for name in TEMPLATES:
+        with open(get_template(name).origin.name, 'rb') as f:
+            sources.append(hashlib.sha256(f.read()).hexdigest())
+    return [FORMAT_VERSION, sources, settings.PROJECTS_API_DEFAULT_LIMIT,
+            getattr(settings, 'API_JSON_ENCODER', 'orjson')]
+
+
+def _listing_artifacts(base, projects, digests, field, direction, fingerprint):
+    """``(path, key, render)`` for each page of one listing"""
+    limit = settings.PROJECTS_API_DEFAULT_LIMIT
+    pages = max(1, -(-len(projects) // limit))
+    encode = get_encoder()
+    for number in range(1, pages + 1):
+        chunk = projects[(number - 1) * limit:number * limit + 1]
+        next_page = f'/{base}/page/{number + 1}.json' if number < pages else None
+        path = f'{base}/index.json' if number == 1 else f'{base}/page/{number}.json'
+
+        def render(chunk=chunk, next_page=next_page):
+            payload = projects_page([dict(project) for project in chunk], limit, field, direction)
+            payload['next_page'] = next_page
+            return encode(payload)
+        ids = [(str(project['_id']), digests[project['_id']]) for project in chunk[:limit]]
+        yield path, _key('page', fingerprint, ids, next_page), render
+
+
+def artifacts(projects, fingerprint):
+    """``(path, key, render)`` for every exported file
+
+    ``projects`` are all projects in the API's default sort order.
+    """
+    from .views import home_page_context
+
+    field, direction = parse_project_sort(None)
+    digests = {project['_id']: project_digest(project) for project in projects}
+    limit = settings.PROJECTS_API_DEFAULT_LIMIT
+
+    home = projects[:limit + 1]
+
+    def render_home():
+        return get_template('index.html').render(home_page_context(home, limit, field, direction)).encode()
+    yield 'index.html', _key('home', fingerprint, [digests[p['_id']] for p in home]), render_home
+
+    yield from _listing_artifacts('api/projects', projects, digests, field, direction, fingerprint)
+
+    categories = {}
+    for project in projects:
+        slug = slugify(str(project.get('category') or ''))
+        if slug:
+            categories.setdefault(slug, []).append(project)
+    for slug, members in sorted(categories.items()):
+        yield from _listing_artifacts(f'api/projects/category/{slug}', members, digests, field, direction,
+                                      fingerprint)
+
+    def render_facets():
+        empty = {'total': 0} | {facet: {} for facet in FACET_FIELDS}
+        return get_encoder()(facets_payload(apply_project_changes(empty, added=projects)))
+    yield 'api/projects/facets/index.json', _key('facets', fingerprint, sorted(digests.values())), render_facets
+
+
+@contextmanager
+def _build_lock(output):
+    """Serialise builds of ``output`` across threads and worker processes"""
+    with open(f'{output}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'projects': {}, 'artifacts': {}}
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _prune(builds, current, keep):
+    """Delete all but the ``keep`` most recent builds, ``current`` included"""
+    others = sorted((os.path.join(builds, name) for name in os.listdir(builds)), key=os.path.getmtime, reverse=True)
+    for path in [path for path in others if path != current][max(1, keep) - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def export_site(output, projects=None, force=False, keep=2):
+    """Build the static site and swap ``output`` over to it
+
+    ``projects`` defaults to every project in MongoDB. ``force`` renders
+    every file instead of reusing unchanged ones. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    output = os.path.abspath(output)
+    if os.path.exists(output) and not os.path.islink(output):
+        raise ExportError(f"{output} exists and is not a symlink from a previous export; move it away first")
+    builds = f'{output}.builds'
+    os.makedirs(builds, exist_ok=True)
+
+    with _build_lock(output):
+        version = get_content_version()
+        if projects is None:
+            field, direction = parse_project_sort(None)
+            projects = list(projects_collection.find().sort([(field, direction), ('_id', direction)]))
+        previous = os.path.realpath(output) if os.path.islink(output) else None
+        manifest = _load_manifest(previous) if previous else {'projects': {}, 'artifacts': {}}
+
+        build = tempfile.mkdtemp(prefix=f'v{version}-', dir=builds)
+        os.chmod(build, 0o755)
+        keys, rendered, reused = {}, 0, 0
+        try:
+            for path, key, render in artifacts(projects, _fingerprint()):
+                keys[path] = key
+                target = os.path.join(build, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                source = os.path.join(previous, path) if previous else None
+                if not force and manifest['artifacts'].get(path) == key and os.path.isfile(source):
+                    for suffix in ('',) + tuple(SUFFIXES.values()):
+                        if os.path.isfile(source + suffix):
+                            _link(source + suffix, target + suffix)
+                    reused += 1
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(render())
+                write_compressed_siblings(target)
+                rendered += 1
+
+            digests = {str(project['_id']): project_digest(project) for project in projects}
+            with open(os.path.join(build, MANIFEST), 'w') as f:
+                json.dump({
+                    'format': FORMAT_VERSION,
+                    'version': version,
+                    'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'projects': digests,
+                    'artifacts': keys,
+                }, f, indent=1)
+
+            # Atomic swap: a new symlink renamed over the old one
+            link = f'{output}.tmp-{os.getpid()}'
+            os.symlink(os.path.relpath(build, os.path.dirname(output)), link)
+            os.replace(link, output)
+        except BaseException:
+            shutil.rmtree(build, ignore_errors=True)
+            raise
+        _prune(builds, build, keep)
+
+    changed = sum(1 for project_id, digest in digests.items() if manifest['projects'].get(project_id) != digest)
+    summary = {
+        'output': output,
+        'build': build,
+        'version': version,
+        'projects': len(projects),
+        'changed_projects': changed + len(set(manifest['projects']) - set(digests)),
+        'rendered': rendered,
+        'reused': reused,
+        'removed': len(set(manifest['artifacts']) - set(keys)),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info("📦 Static export v%s: %s rendered, %s reused, %s removed in %.2fs",
+                version, rendered, reused, summary['removed'], summary['seconds'])
+    return summary
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def export_now():
+    """Rebuild ``STATIC_EXPORT_DIR`` in this thread; returns the summary, or None
+
+    Does nothing when ``STATIC_EXPORT_DIR`` is unset, or outside Django
+    (``load_mongodb_only.py`` run on its own). Failures are logged, not
+    raised, since the write that triggered the export has succeeded.
+    """
+    if not settings.configured or not getattr(settings, 'STATIC_EXPORT_DIR', ''):
+        return None
+    try:
+        return export_site(settings.STATIC_EXPORT_DIR, keep=getattr(settings, 'STATIC_EXPORT_KEEP_BUILDS', 2))
+    except Exception:
+        logger.exception("❌ Static export failed")
+        return None
+
+
+def schedule_export():
+    """Rebuild ``STATIC_EXPORT_DIR`` in the background after a project write
+
+    Waits ``STATIC_EXPORT_DELAY`` seconds first, so a burst of edits is
+    exported once. Does nothing when ``STATIC_EXPORT_DIR`` is unset.
+    """
+    global _timer
+    if not getattr(settings, 'STATIC_EXPORT_DIR', ''):
+        return
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(getattr(settings, 'STATIC_EXPORT_DELAY', 2.0), export_now)
+        _timer.daemon = True
+        _timer.start()
@@ -1,3 +1,1089 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from bson import Decimal128, ObjectId, Timestamp
+from PIL import Image
+from django.conf import LazySettings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from . import async_views, db as db_module, views
+from .admin import admin_projects_page
+from .cache import NamespacedCache
+from .compression import (
+    CompressedManifestStaticFilesStorage, CompressionMiddleware, choose_encoding, static_response,
+)
+from .contact_queue import ContactWriteBehind
+from .encoders import APIJsonResponse, json_dumps, orjson, orjson_dumps
+from .cv_storage import FileSystemCVStore, collect_garbage, parse_range
+from .facets import apply_project_changes, counts_from_aggregation
+from .importexport import ProjectImporter, csv_safe, iter_csv, iter_json_array, iter_jsonl, normalize_project
+from .images import save_project_image, variant_widths
+from .indexes import _plan_stages, ensure_indexes
+from .models import Project, ProjectTechnology, ReplicaState
+from .metrics import (
+    CACHE_REQUESTS, Histogram, ServerTimingMiddleware, TimedLocMemCache, collect, merge_snapshots, metrics_view,
+)
+from .log import JSONFormatter, LazyQueueHandler, RoutingQueueListener, SamplingFilter
+from .ratelimit import TokenBucketLimiter, parse_rate
+from .replica import ProjectsReplica, utcnow
+from .repository import get_project_repository, mongo_repository, replica_repository
+from .search import SearchIndex
+from .snapshot import ProjectsSnapshot
+from .static_export import ExportError, export_site
+from .utils import (
+    QueryParamError, build_contact_filter, build_project_filter, parse_project_sort,
+    encode_cursor, decode_cursor, keyset_filter, parse_fields, project_projection, projects_page,
+    project_card_cache_key, projects_cache_key, parse_batch_body, validate_project_batch, apply_batch_write_errors,
+    batch_summary,
+)
+
+
+class ProjectQueryTests(SimpleTestCase):
+    def test_build_project_filter(self):
+        query = build_project_filter({
+            'category': 'web', 'featured': 'true', 'year': '2024', 'technology': 'Django',
+        })
+        self.assertEqual(query, {
+            'category': 'web', 'featured': True, 'year': 2024, 'technologies': 'Django',
+        })
+
+    def test_invalid_params_are_rejected(self):
+        with self.assertRaises(QueryParamError):
+            build_project_filter({'year': 'soon'})
+        with self.assertRaises(QueryParamError):
+            parse_project_sort('-description')
+
+    def test_cursor_round_trip(self):
+        object_id = ObjectId()
+        field, direction = parse_project_sort('-created_at')
+        cursor = encode_cursor(field, direction, {'_id': object_id, 'created_at': '2024-01-10 10:00:00'})
+        self.assertEqual(decode_cursor(cursor, field, direction), ('2024-01-10 10:00:00', object_id))
+        with self.assertRaises(QueryParamError):
+            decode_cursor(cursor, 'year', direction)
+
+    def test_cursor_round_trips_typed_sort_values(self):
+        object_id = ObjectId()
+        for value in (datetime(2024, 1, 10, 10, 0, 0, 123000), ObjectId(), Decimal128('2024.5'), 2024, None):
+            cursor = encode_cursor('created_at', -1, {'_id': object_id, 'created_at': value})
+            self.assertEqual(decode_cursor(cursor, 'created_at', -1), (value, object_id))
+        # Other Extended JSON types (or documents) are not sort positions
+        raw = json.dumps({'s': '-created_at', 'v': {'$regularExpression': {'pattern': '.', 'options': ''}},
+                          'id': str(object_id)}).encode()
+        with self.assertRaises(QueryParamError):
+            decode_cursor(base64.urlsafe_b64encode(raw).decode(), 'created_at', -1)
+
+    def test_card_cache_key_follows_project_contents(self):
+        project = {'_id': ObjectId(), 'title': 'Site', 'technologies': ['Django']}
+        key = project_card_cache_key(project)
+        self.assertEqual(project_card_cache_key(dict(project)), key)
+        self.assertNotEqual(project_card_cache_key({**project, 'title': 'Site v2'}), key)
+
+    def test_keyset_filter_descending(self):
+        object_id = ObjectId()
+        self.assertEqual(keyset_filter('year', -1, 2024, object_id), {'$or': [
+            {'year': {'$lt': 2024}},
+            {'year': 2024, '_id': {'$lt': object_id}},
+            {'year': None},
+        ]})
+
+
+    def test_sparse_fieldsets(self):
+        self.assertIsNone(parse_fields(''))
+        self.assertEqual(parse_fields('title, image,title'), ('title', 'image'))
+        with self.assertRaises(QueryParamError):
+            parse_fields('title,$where')
+        self.assertEqual(project_projection(('title',), 'created_at'), {'title': 1, 'created_at': 1})
+        projects = [{'_id': ObjectId(), 'title': f'P{i}', 'created_at': f'2024-01-0{9 - i}'} for i in range(3)]
+        page = projects_page(projects, 2, 'created_at', -1, ('title',))
+        self.assertEqual(page['projects'], [{'title': 'P0'}, {'title': 'P1'}])
+        self.assertEqual(decode_cursor(page['next_cursor'], 'created_at', -1)[0], '2024-01-08')
+
+
+class ProjectsAPIViewTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.projects = [{'_id': ObjectId(), 'title': f'p{i}', 'created_at': f'2024-01-{10 - i:02d}'}
+                         for i in range(3)]
+        self.find = mock.Mock(side_effect=lambda version, filters, field, direction, after, limit, projection=None:
+                              (self.projects[:limit], None))
+        self.versions = mock.Mock(return_value=3)
+        for target, value in (('portfolio.views.find_projects', self.find),
+                              ('portfolio.views.get_content_version', self.versions)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, **headers):
+        return views.get_projects_api(RequestFactory().get('/api/projects/', **headers))
+
+    def test_etag_and_not_modified(self):
+        response = self.get()
+        self.assertEqual((response.status_code, response['ETag']), (200, '"projects-v3"'))
+        self.assertEqual([p['title'] for p in json.loads(response.content)['projects']], ['p0', 'p1', 'p2'])
+        response = self.get(HTTP_IF_NONE_MATCH='"projects-v3"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.find.call_count, 1)
+
+    def test_a_write_changes_the_etag(self):
+        self.get()
+        self.projects[0] = dict(self.projects[0], title='p0 edited')
+        self.versions.return_value = 4
+        response = self.get(HTTP_IF_NONE_MATCH='"projects-v3"')
+        self.assertEqual((response.status_code, response['ETag']), (200, '"projects-v4"'))
+        self.assertEqual(json.loads(response.content)['projects'][0]['title'], 'p0 edited')
+
+    def test_the_version_is_read_once_per_request(self):
+        # A write lands between the ETag and the body: both still describe v3
+        self.versions.side_effect = [3, 4]
+        response = self.get()
+        self.assertEqual(response['ETag'], '"projects-v3"')
+        self.assertEqual(self.versions.call_count, 1)
+        self.assertEqual(self.find.call_args[0][0], 3)
+        self.assertIsNotNone(caches['default'].get(projects_cache_key(3, QueryDict())))
+
+
+class ProjectBatchTests(SimpleTestCase):
+    def test_ndjson_body(self):
+        body = b'{"title": "A"}\n\n{"title": "B"}\n'
+        self.assertEqual(parse_batch_body(body, 'application/x-ndjson'), [{'title': 'A'}, {'title': 'B'}])
+        with self.assertRaises(ValueError):
+            parse_batch_body(b'{"title": "A"}', 'application/json')
+
+    def test_results_follow_request_order(self):
+        projects, results = validate_project_batch([{'title': 'A'}, {'year': 2024}, {'title': 'A'}])
+        self.assertEqual(len(projects), 2)
+        apply_batch_write_errors(results, projects, [{'index': 1, 'code': 11000, 'errmsg': 'E11000'}])
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'error'])
+        self.assertEqual(results[0]['project_id'], str(projects[0]['_id']))
+        payload, status = batch_summary(results)
+        self.assertEqual((payload['created'], payload['failed'], status), (1, 2, 200))
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, PROJECTS_BATCH_MAX_SIZE=3)
+class ProjectBatchViewTests(SimpleTestCase):
+    def setUp(self):
+        self.collection = mock.Mock()
+        self.bump = mock.Mock(return_value=8)
+        self.facets = mock.Mock()
+        self.export = mock.Mock()
+        for target, value in (('portfolio.views.projects_collection', self.collection),
+                              ('portfolio.views.bump_content_version', self.bump),
+                              ('portfolio.views.update_facets', self.facets),
+                              ('portfolio.views.schedule_export', self.export)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, items):
+        request = RequestFactory().post('/api/projects/batch/', json.dumps(items), content_type='application/json')
+        return views.add_projects_batch_api(request)
+
+    def test_mixed_batch_inserts_the_valid_items_once(self):
+        response = self.post([{'title': 'A'}, {'year': 2024}, {'title': 'B', 'technologies': ['Django']}])
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.content)
+        self.assertEqual((payload['created'], payload['failed']), (2, 1))
+        self.assertEqual([(r['index'], r['status']) for r in payload['results']],
+                         [(0, 'created'), (1, 'error'), (2, 'created')])
+        self.assertEqual(payload['results'][1]['error'], "'title' is required")
+        self.collection.insert_many.assert_called_once()
+        inserted = self.collection.insert_many.call_args[0][0]
+        self.assertEqual([project['title'] for project in inserted], ['A', 'B'])
+        self.assertEqual([r['project_id'] for r in payload['results'] if r['status'] == 'created'],
+                         [str(project['_id']) for project in inserted])
+        self.bump.assert_called_once_with()
+        self.facets.assert_called_once_with(8, added=inserted)
+        self.export.assert_called_once_with()
+
+    def test_rejected_inserts_are_reported_per_item(self):
+        def insert_many(projects, ordered):
+            raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'E11000'}]})
+        self.collection.insert_many.side_effect = insert_many
+        payload = json.loads(self.post([{'title': 'A'}, {'title': 'B'}]).content)
+        self.assertEqual([r['status'] for r in payload['results']], ['error', 'created'])
+        self.bump.assert_called_once_with()
+
+    def test_batch_without_valid_items_writes_nothing(self):
+        response = self.post([{'year': 2024}, 'not a project'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['created'], 0)
+        self.collection.insert_many.assert_not_called()
+        self.bump.assert_not_called()
+        self.export.assert_not_called()
+
+    def test_size_limit(self):
+        response = self.post([{'title': str(i)} for i in range(4)])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(json.loads(response.content), {'error': 'At most 3 projects per request'})
+        self.assertEqual(self.post([]).status_code, 400)
+        self.collection.insert_many.assert_not_called()
+        self.bump.assert_not_called()
+
+
+class MongoClientTests(SimpleTestCase):
+    @override_settings(MONGO_MAX_POOL_SIZE=7, MONGO_COMPRESSORS='zlib', MONGO_MAX_IDLE_TIME_MS=None)
+    def test_client_options_come_from_settings(self):
+        options = db_module.client_options()
+        self.assertEqual((options['maxPoolSize'], options['compressors']), (7, 'zlib'))
+        self.assertNotIn('maxIdleTimeMS', options)
+
+    @mock.patch.multiple(db_module, _client=None, _client_pid=None)
+    @mock.patch('portfolio.db.MongoClient')
+    def test_client_is_created_lazily_per_process(self, mongo_client):
+        self.assertEqual(db_module.projects_collection.name, 'projects')
+        mongo_client.assert_not_called()
+        first = db_module.get_client()
+        self.assertIs(db_module.get_client(), first)
+        with mock.patch('portfolio.db.os.getpid', return_value=os.getpid() + 1):
+            db_module.get_client()
+        self.assertEqual(mongo_client.call_count, 2)
+
+
+class FacetTests(SimpleTestCase):
+    def test_changes_are_applied_to_cached_counts(self):
+        counts = counts_from_aggregation({
+            'technologies': [{'_id': 'Django', 'count': 2}, {'_id': 'React', 'count': 1}],
+            'category': [{'_id': 'web', 'count': 2}],
+            'year': [{'_id': 2024, 'count': 2}],
+            'featured': [{'_id': False, 'count': 2}],
+            'total': [{'count': 2}],
+        })
+        updated = apply_project_changes(
+            counts,
+            added=[{'technologies': ['Go'], 'category': 'web', 'year': 2025, 'featured': True}],
+            removed=[{'technologies': ['React', 'Django'], 'category': 'web', 'year': 2024, 'featured': False}],
+        )
+        self.assertEqual(updated, {
+            'total': 2,
+            'technologies': {'Django': 1, 'Go': 1},
+            'category': {'web': 2},
+            'year': {2024: 1, 2025: 1},
+            'featured': {False: 1, True: 1},
+        })
+        self.assertEqual(counts['total'], 2)
+
+
+class AdminProjectsPageTests(SimpleTestCase):
+    def setUp(self):
+        self.projects = [{'_id': ObjectId(), 'title': f'P{i}'} for i in range(5)]
+
+    def fake_find(self, version, filters, field, direction, after, limit):
+        ordered = self.projects if direction > 0 else self.projects[::-1]
+        if after is not None:
+            ids = [project['_id'] for project in ordered]
+            ordered = ordered[ids.index(after[1]) + 1:]
+        return [dict(project) for project in ordered[:limit]], None
+
+    def test_pages_walk_both_ways(self):
+        with mock.patch('portfolio.admin.find_projects', self.fake_find):
+            first = admin_projects_page(1, 'title', 1, None, None, 2)
+            self.assertEqual([p['title'] for p in first['projects']], ['P0', 'P1'])
+            self.assertIsNone(first['previous_cursor'])
+
+            second = admin_projects_page(1, 'title', 1, decode_cursor(first['next_cursor'], 'title', 1), None, 2)
+            self.assertEqual([p['title'] for p in second['projects']], ['P2', 'P3'])
+
+            back = admin_projects_page(1, 'title', 1, None, decode_cursor(second['previous_cursor'], 'title', 1), 2)
+            self.assertEqual([p['title'] for p in back['projects']], ['P0', 'P1'])
+            self.assertIsNone(back['previous_cursor'])
+            self.assertIsNotNone(back['next_cursor'])
+
+
+class ContactInboxTests(SimpleTestCase):
+    def test_contact_filter(self):
+        query = build_contact_filter({'q': 'a.b', 'from': '2024-03-01', 'to': '2024-03-31'})
+        self.assertEqual(query['type'], {'$ne': 'profile'})
+        self.assertEqual(query['$or'][0], {'name': {'$regex': r'a\.b', '$options': 'i'}})
+        self.assertEqual(query['timestamp'], {'$gte': '2024-03-01', '$lt': '2024-04-01'})
+        with self.assertRaises(QueryParamError):
+            build_contact_filter({'to': 'yesterday'})
+
+    def test_export_neutralises_formulas(self):
+        self.assertEqual(csv_safe('=HYPERLINK("x")'), '\'=HYPERLINK("x")')
+        self.assertEqual(csv_safe('Ada'), 'Ada')
+
+
+class ProjectImageTests(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+
+    def upload(self, size, mode='RGB', image_format='JPEG'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'teal').save(buffer, image_format)
+        return SimpleUploadedFile(f'cover.{image_format.lower()}', buffer.getvalue())
+
+    def test_widths_never_upscale(self):
+        self.assertEqual(variant_widths(3000, (400, 800, 1200)), [400, 800, 1200])
+        self.assertEqual(variant_widths(900, (400, 800, 1200)), [400, 800, 900])
+        self.assertEqual(variant_widths(300, (400, 800, 1200)), [300])
+
+    def test_variants_are_stored_under_content_hashed_names(self):
+        with override_settings(MEDIA_ROOT=self.media, PROJECT_IMAGE_WIDTHS=(200, 400)):
+            image = save_project_image(self.upload((1000, 500)))
+            again = save_project_image(self.upload((1000, 500)))
+        self.assertEqual((image['width'], image['height']), (1000, 500))
+        self.assertEqual([(v['format'], v['width'], v['height']) for v in image['variants']],
+                         [('webp', 200, 100), ('jpeg', 200, 100), ('webp', 400, 200), ('jpeg', 400, 200)])
+        self.assertTrue(image['srcset']['webp'].endswith('-400.webp 400w'))
+        self.assertEqual(again, image)
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'projects'))), 4)
+
+    def test_rejects_files_that_are_not_images(self):
+        with override_settings(MEDIA_ROOT=self.media):
+            with self.assertRaises(ValueError):
+                save_project_image(SimpleUploadedFile('cover.jpg', b'not an image'))
+
+
+class CVStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = FileSystemCVStore(self.root)
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.store.put([b'%PDF-1.7 ', b'resume'])
+        second = self.store.put([b'%PDF-1.7 resume'])
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], 15)
+        self.assertEqual(list(self.store.stored()), [first[0]])
+        self.assertEqual(os.listdir(self.root), [first[0][:2]])
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range(None, 1000))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=1000-', 1000)
+
+    def test_garbage_collection_keeps_referenced_and_recent_files(self):
+        kept, _ = self.store.put([b'current cv'])
+        orphan, _ = self.store.put([b'old cv'])
+        recent, _ = self.store.put([b'just uploaded'])
+        for digest in (kept, orphan):
+            os.utime(self.store.path(digest), (0, 0))
+        self.assertEqual(collect_garbage(self.store, {kept}, dry_run=True), ([orphan], 0))
+        collect_garbage(self.store, {kept})
+        self.assertEqual(sorted(self.store.stored()), sorted([kept, recent]))
+
+
+class CompressionTests(SimpleTestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate, br', ('br', 'gzip')), 'br')
+        self.assertEqual(choose_encoding('br;q=0, gzip;q=0.5', ('br', 'gzip')), 'gzip')
+        self.assertEqual(choose_encoding('*;q=1, gzip;q=0', ('br', 'gzip')), 'br')
+        self.assertIsNone(choose_encoding('identity', ('br', 'gzip')))
+        self.assertIsNone(choose_encoding(None, ('br', 'gzip')))
+
+    @override_settings(COMPRESSION_MIN_SIZE=1024)
+    def test_middleware_compresses_large_text_responses(self):
+        body = json.dumps([{'title': f'Project {i}'} for i in range(100)]).encode()
+
+        def view(request):
+            response = HttpResponse(body, content_type='application/json')
+            response['ETag'] = '"v1"'
+            return response
+        middleware = CompressionMiddleware(view)
+        response = middleware(RequestFactory().get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        small = CompressionMiddleware(lambda request: HttpResponse('ok'))
+        self.assertFalse(small(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')).has_header('Content-Encoding'))
+        image = CompressionMiddleware(lambda request: HttpResponse(body, content_type='image/png'))
+        self.assertFalse(image(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')).has_header('Content-Encoding'))
+
+    def test_collected_files_are_served_precompressed(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        css = b'body { color: teal; }\n' * 100
+        storage = CompressedManifestStaticFilesStorage(location=root)
+        storage.save('site.css', ContentFile(css))
+        list(storage.post_process({'site.css': (storage, 'site.css')}))
+        hashed = storage.hashed_files['site.css']
+        self.assertTrue(os.path.exists(os.path.join(root, hashed + '.gz')))
+
+        with mock.patch('portfolio.compression.staticfiles_storage', storage):
+            response = static_response(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'), hashed, root)
+            body = b''.join(response.streaming_content)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(body), css)
+            self.assertIn('immutable', response['Cache-Control'])
+            plain = static_response(RequestFactory().get('/'), 'site.css', root)
+            plain.close()
+            self.assertFalse(plain.has_header('Content-Encoding'))
+            self.assertNotIn('immutable', plain['Cache-Control'])
+
+
+class APIEncodingTests(SimpleTestCase):
+    def test_encoders_handle_bson_values(self):
+        document = {'_id': ObjectId('65a000000000000000000000'), 'price': Decimal128('1.50'),
+                    'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}
+        expected = {'_id': '65a000000000000000000000', 'price': '1.50', 'at': '2024-01-02T03:04:05Z'}
+        self.assertEqual(json.loads(json_dumps(document)), expected)
+        if orjson is not None:
+            self.assertEqual(json.loads(orjson_dumps(document)), expected)
+
+    def test_encoder_is_chosen_by_setting(self):
+        with override_settings(API_JSON_ENCODER='json'):
+            response = APIJsonResponse({'id': ObjectId('65a000000000000000000000')}, status=201)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, b'{"id":"65a000000000000000000000"}')
+
+
+@override_settings(PROJECTS_API_DEFAULT_LIMIT=2)
+class StaticExportTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.output = os.path.join(self.root, 'site')
+        self.projects = [
+            {'_id': ObjectId(), 'title': f'P{i}', 'category': 'web' if i % 2 else 'data',
+             'created_at': f'2024-01-0{9 - i}'}
+            for i in range(5)
+        ]
+        patcher = mock.patch('portfolio.static_export.get_content_version', return_value=7)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, path):
+        with open(os.path.join(self.output, path)) as f:
+            return json.load(f)
+
+    def test_pages_and_atomic_swap(self):
+        summary = export_site(self.output, projects=self.projects)
+        first_build = os.path.realpath(self.output)
+        self.assertTrue(os.path.islink(self.output))
+        self.assertEqual(summary['reused'], 0)
+        page = self.read('api/projects/index.json')
+        self.assertEqual([p['title'] for p in page['projects']], ['P0', 'P1'])
+        self.assertEqual(page['next_page'], '/api/projects/page/2.json')
+        self.assertIsNone(self.read('api/projects/page/3.json')['next_page'])
+        self.assertEqual([p['title'] for p in self.read('api/projects/category/web/index.json')['projects']],
+                         ['P1', 'P3'])
+        self.assertEqual(self.read('api/projects/facets/index.json')['total'], 5)
+
+        export_site(self.output, projects=self.projects)
+        self.assertNotEqual(os.path.realpath(self.output), first_build)
+        self.assertTrue(os.path.isdir(first_build))  # kept for readers still using it
+
+    def test_rebuild_renders_only_what_an_edit_touches(self):
+        export_site(self.output, projects=self.projects)
+        self.projects[4] = {**self.projects[4], 'title': 'P4 edited'}
+        summary = export_site(self.output, projects=self.projects)
+        # Page 3 of all projects, page 2 of its category and the facets
+        self.assertEqual((summary['changed_projects'], summary['rendered']), (1, 3))
+        self.assertEqual(self.read('api/projects/page/3.json')['projects'][0]['title'], 'P4 edited')
+
+    def test_home_page_escapes_projects_and_links_the_next_page(self):
+        self.projects[0] = {**self.projects[0], 'title': '<img src=x onerror=alert(1)>'}
+        export_site(self.output, projects=self.projects)
+        with open(os.path.join(self.output, 'index.html')) as f:
+            html = f.read()
+        self.assertNotIn('<img src=x', html)
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', html)
+        cursor = encode_cursor('created_at', -1, self.projects[1])
+        self.assertIn(f'data-next-cursor="{cursor}"', html)
+
+    def test_refuses_to_replace_a_real_directory(self):
+        os.makedirs(self.output)
+        with self.assertRaises(ExportError):
+            export_site(self.output, projects=self.projects)
+
+
+class ReplicaTests(TestCase):
+    def setUp(self):
+        self.replica = ProjectsReplica(batch_size=3)
+        self.snapshot = ProjectsSnapshot()
+        self.documents = []
+        for i in range(10):
+            document = {
+                '_id': ObjectId(), 'title': f'p{i}', 'technologies': ['Django'] if i % 2 else ['React'],
+                'created_at': f'2024-01-{i % 4 + 1:02d}', 'category': 'web',
+            }
+            if i % 3:
+                document['year'] = 2020 + i % 2  # missing years sort lowest, as in MongoDB
+            self.documents.append(document)
+            self.snapshot._projects[document['_id']] = document
+        self.assertEqual(self.replica.upsert(self.documents), 10)
+
+    def walk(self, find, filters, field, direction):
+        titles, after = [], None
+        while True:
+            page = find(filters, field, direction, after=after, limit=3)
+            if not page:
+                return titles
+            titles += [project['title'] for project in page]
+            after = (page[-1].get(field), page[-1]['_id'])
+
+    def test_pages_like_mongo(self):
+        for field in ('year', 'created_at', 'title'):
+            for direction in (1, -1):
+                for filters in ({}, {'technologies': 'Django'}):
+                    self.assertEqual(
+                        self.walk(replica_repository.find, filters, field, direction),
+                        self.walk(lambda *args, **kwargs: self.snapshot.find(*args, **kwargs), filters, field,
+                                  direction),
+                        (field, direction, filters),
+                    )
+        self.assertEqual(replica_repository.find({}, 'title', 1, limit=1, projection={'title': 1}),
+                         [{'_id': self.documents[0]['_id'], 'title': 'p0'}])
+
+    def test_upsert_and_delete(self):
+        self.assertEqual(self.replica.upsert(self.documents), 0)  # unchanged digests write nothing
+        changed = dict(self.documents[1], technologies=['Go', 'Go'], updated_at=datetime(2024, 5, 1, 12))
+        self.assertEqual(self.replica.upsert([changed]), 1)
+        row = Project.objects.get(mongo_id=str(changed['_id']))
+        self.assertEqual(list(row.technology_rows.values_list('name', flat=True)), ['Go'])
+        self.assertEqual(row.updated_at, datetime(2024, 5, 1, 12))
+        self.assertEqual(self.replica.delete([str(changed['_id'])]), 1)
+        self.assertEqual(Project.objects.count(), 9)
+        self.assertEqual(ProjectTechnology.objects.count(), 9)
+
+    def test_change_events(self):
+        self.replica._apply({
+            'operationType': 'delete', 'ns': {'coll': 'projects'}, 'documentKey': {'_id': self.documents[0]['_id']},
+            'clusterTime': Timestamp(int(time.time()), 1),
+        })
+        self.replica._apply({
+            'operationType': 'update', 'ns': {'coll': 'meta'}, 'documentKey': {'_id': 'projects'},
+            'clusterTime': Timestamp(int(time.time()), 2),
+            'updateDescription': {'updatedFields': {'version': 5}, 'removedFields': []},
+            # Looked up later, after another bump whose project write isn't applied yet
+            'fullDocument': {'_id': 'projects', 'version': 6},
+        })
+        self.assertEqual(Project.objects.count(), 9)
+        self.assertEqual(ReplicaState.objects.get(collection='projects').version, 5)
+
+    @override_settings(PROJECTS_READ_SOURCE='replica', REPLICA_MAX_STALENESS=30)
+    def test_reads_use_the_replica_only_while_fresh(self):
+        state = ReplicaState.objects.create(collection='projects', version=3, synced_at=utcnow())
+        self.assertIs(get_project_repository(3), replica_repository)
+        self.assertIs(get_project_repository(4), mongo_repository)  # behind the content version
+        state.synced_at = utcnow() - timedelta(minutes=1)
+        state.save()
+        self.assertIs(get_project_repository(3), mongo_repository)
+        with self.settings(PROJECTS_READ_SOURCE='mongo'):
+            state.synced_at = utcnow()
+            state.save()
+            self.assertIs(get_project_repository(3), mongo_repository)
+
+
+class IndexTests(SimpleTestCase):
+    def test_plan_stages_walks_nested_plans(self):
+        plan = {'stage': 'LIMIT', 'inputStage': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}
+        self.assertEqual(list(_plan_stages(plan)), ['LIMIT', 'FETCH', 'IXSCAN'])
+
+    def test_duplicate_titles_are_reported_and_other_indexes_still_built(self):
+        def create_indexes(models):
+            if models[0].document['name'] == 'title_unique':
+                raise OperationFailure('E11000 duplicate key error', code=11000)
+
+        projects = mock.Mock(create_indexes=mock.Mock(side_effect=create_indexes))
+        projects.index_information.return_value = {}
+        projects.aggregate.return_value = [{'_id': {'title': 'Blog'}, 'count': 2}]
+        contacts = mock.Mock()
+        contacts.index_information.return_value = {}
+        with mock.patch('portfolio.indexes.get_collections',
+                        return_value={'projects': projects, 'contacts': contacts}):
+            created, dropped, failed = ensure_indexes()
+        self.assertEqual(failed, [('projects.title_unique', "duplicate values: 'Blog' (2x)")])
+        self.assertIn('projects.created_at_id', created)
+        self.assertIn('contacts.timestamp_id', created)
+
+
+class SharedCacheTestMixin:
+    """Two cache aliases on one shared backend stand in for two workers"""
+
+    def test_invalidate_reaches_other_workers(self):
+        worker_a = NamespacedCache('admin_projects', alias='default')
+        worker_b = NamespacedCache('admin_projects', alias='worker_b')
+        worker_a.set('admin_projects_list', ['old'], 600)
+        self.assertEqual(worker_b.get('admin_projects_list'), ['old'])
+
+        worker_a.invalidate()
+        self.assertIsNone(worker_b.get('admin_projects_list'))
+
+    def test_namespaces_are_independent(self):
+        projects = NamespacedCache('admin_projects')
+        profile = NamespacedCache('admin_profile')
+        profile.set('admin_profile_data', {'name': 'x'}, 600)
+        projects.invalidate()
+        self.assertEqual(profile.get('admin_profile_data'), {'name': 'x'})
+
+
+class FileSharedCacheTests(SharedCacheTestMixin, SimpleTestCase):
+    """Local stand-in for a shared cache server: a file cache both workers see"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+        self.override = override_settings(CACHES={'default': backend, 'worker_b': dict(backend)})
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_invalidate_bumps_to_the_clock_without_an_atomic_incr(self):
+        namespace = NamespacedCache('admin_projects')
+        with mock.patch('portfolio.cache.time.time', return_value=1000.0):
+            self.assertEqual(namespace.version(), 1000000)
+            # Within the same millisecond the version still moves on
+            self.assertEqual(namespace.invalidate(), 1000001)
+        # A worker that read the version before another bumped it can't write the same value
+        with mock.patch('portfolio.cache.time.time', return_value=1000.5), \
+                mock.patch.object(namespace.cache, 'get', return_value=1000000):
+            self.assertEqual(namespace.invalidate(), 1000500)
+
+
+@unittest.skipUnless(os.getenv('TEST_REDIS_URL'), "set TEST_REDIS_URL to run against a real Redis server")
+class RedisSharedCacheTests(SharedCacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        backend = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('TEST_REDIS_URL')}
+        self.override = override_settings(CACHES={'default': backend, 'worker_b': dict(backend)})
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+
+class ProjectsSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.snapshot = ProjectsSnapshot()
+        self.ids = [ObjectId() for _ in range(4)]
+        for i, object_id in enumerate(self.ids):
+            self.snapshot._projects[object_id] = {
+                '_id': object_id, 'title': f'p{i}', 'year': 2022 + i % 2,
+                'technologies': ['Django'] if i % 2 else ['React'],
+            }
+
+    def test_find_pages_like_mongo(self):
+        first = self.snapshot.find(field='year', direction=-1, limit=2)
+        self.assertEqual([p['title'] for p in first], ['p3', 'p1'])
+        after = (first[-1]['year'], first[-1]['_id'])
+        rest = self.snapshot.find(field='year', direction=-1, after=after)
+        self.assertEqual([p['title'] for p in rest], ['p2', 'p0'])
+        self.assertEqual(
+            [p['title'] for p in self.snapshot.find({'technologies': 'React'}, field='title', direction=1)],
+            ['p0', 'p2'],
+        )
+
+    def test_apply_change_events(self):
+        self.snapshot._apply({
+            'operationType': 'delete', 'ns': {'coll': 'projects'}, 'documentKey': {'_id': self.ids[0]},
+        })
+        self.snapshot._apply({
+            'operationType': 'update', 'ns': {'coll': 'meta'}, 'documentKey': {'_id': 'projects'},
+            'updateDescription': {'updatedFields': {'version': 7}, 'removedFields': []},
+            # updateLookup reads the document when the event is processed, after later bumps
+            'fullDocument': {'_id': 'projects', 'version': 9},
+        })
+        self.assertEqual(len(self.snapshot.find()), 3)
+        self.assertEqual(self.snapshot.version, 7)
+        self.assertFalse(self.snapshot.is_fresh(7))  # never confirmed fresh
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.blog = {'_id': ObjectId(), 'title': 'Django Blog', 'technologies': ['Django'], 'category': 'web'}
+        self.api = {'_id': ObjectId(), 'title': 'Recipe API', 'description': 'Uses django rest framework'}
+        self.index = SearchIndex()
+        self.index.sync([self.blog, self.api], version=1)
+
+    def titles(self, query, **kwargs):
+        return [project['title'] for _, project in self.index.search(query, **kwargs)]
+
+    def test_title_matches_rank_first_and_last_word_is_a_prefix(self):
+        self.assertEqual(self.titles('django'), ['Django Blog', 'Recipe API'])
+        self.assertEqual(self.titles('rest fram'), ['Recipe API'])
+        self.assertEqual(self.titles('dja', prefix=False), [])
+
+    def test_updates_are_incremental(self):
+        self.index.add({**self.api, 'title': 'Recipe Service'})
+        self.index.remove(self.blog['_id'])
+        self.assertEqual(self.titles('recipe'), ['Recipe Service'])
+        self.assertEqual(self.titles('blog'), [])
+        self.index.sync([self.blog], version=2)
+        self.assertEqual((len(self.index), self.index.version), (1, 2))
+
+    def test_refresh_reads_only_projects_written_since_the_watermark(self):
+        stamp = datetime(2024, 5, 1, 12)
+        projects = [dict(self.blog, updated_at=stamp), dict(self.api, updated_at=stamp)]
+        queries = []
+
+        def find(query, projection=None):
+            queries.append(query)
+            since = query.get('updated_at', {}).get('$gte')
+            return [p for p in projects if since is None or p['updated_at'] >= since]
+
+        collection = mock.Mock(find=find)
+        index = SearchIndex()
+        index.refresh(collection, version=1)
+        self.assertEqual((len(index), index.watermark), (2, stamp))
+
+        edited = dict(self.api, title='Recipe Service', updated_at=stamp + timedelta(minutes=1))
+        projects = [dict(self.blog, updated_at=stamp - timedelta(hours=1)), edited]
+        queries.clear()
+        index.refresh(collection, version=2)
+        # The edit since the watermark, then the ids for deletions; no full read
+        self.assertEqual(queries, [{'updated_at': {'$gte': stamp - timedelta(seconds=5)}}, {}])
+        self.assertEqual([project['title'] for _, project in index.search('recipe')], ['Recipe Service'])
+
+        projects = [edited]
+        index.refresh(collection, version=3)
+        self.assertEqual((len(index), index.version, index.watermark), (1, 3, edited['updated_at']))
+
+
+class ContactWriteBehindTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        patcher = mock.patch('portfolio.contact_queue.contacts_collection')
+        self.collection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_queue_rejects_and_journal_survives_restart(self):
+        contact_queue = ContactWriteBehind(self.directory, max_size=2, flush_interval=60, put_timeout=0)
+        contact_queue.start()
+        self.assertTrue(contact_queue.submit({'name': 'a'}))
+        self.assertTrue(contact_queue.submit({'name': 'b'}))
+        self.assertFalse(contact_queue.submit({'name': 'c'}))
+        self.assertEqual(contact_queue.stats()['rejected'], 1)
+
+        # A crashed worker never flushed: its journal is replayed on restart
+        contact_queue._stop.set()
+        for journal, _, _ in contact_queue._segments.values():
+            journal.close()
+        ContactWriteBehind(self.directory).recover()
+        replayed = self.collection.insert_many.call_args[0][0]
+        self.assertEqual([contact['name'] for contact in replayed], ['a', 'b'])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_new_segments_are_locked_before_recover_can_see_them(self):
+        contact_queue = ContactWriteBehind(self.directory)
+        visible = []
+        with mock.patch('portfolio.contact_queue.fcntl.flock',
+                        side_effect=lambda journal, operation: visible.append(sorted(os.listdir(self.directory)))):
+            contact_queue._rotate()
+        self.assertEqual(len(visible), 1)
+        self.assertTrue(all(name.endswith('.tmp') for name in visible[0]))
+        path = contact_queue._segments[contact_queue._active][2]
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(path)])
+        contact_queue.stop()
+
+
+class LoggingTests(SimpleTestCase):
+    def record(self, level=logging.INFO, msg="%s", args=('x',), **extra):
+        return logging.makeLogRecord({'name': 'portfolio.admin', 'levelno': level,
+                                      'levelname': logging.getLevelName(level),
+                                      'msg': msg, 'args': args, **extra})
+
+    def test_json_lines_are_lazy_formatted_without_colour_codes(self):
+        line = JSONFormatter().format(self.record(msg="✅ \033[94m%s\033[0m saved", args=('CV',), request_id='r1'))
+        payload = json.loads(line)
+        self.assertEqual(payload['message'], '✅ CV saved')
+        self.assertEqual((payload['level'], payload['request_id']), ('INFO', 'r1'))
+
+    def test_sampling_keeps_warnings_and_caps_the_rest(self):
+        sampled = SamplingFilter(rate=0.0)
+        self.assertFalse(sampled.filter(self.record()))
+        self.assertTrue(sampled.filter(self.record(logging.WARNING)))
+        capped = SamplingFilter(max_per_second=3)
+        self.assertEqual(sum(capped.filter(self.record()) for _ in range(10)), 3)
+        self.assertEqual((sampled.dropped, capped.dropped), (1, 7))
+
+    def test_admin_rows_are_sampled_by_the_configured_logger(self):
+        from .admin import row_logger
+
+        sampler = next(f for f in row_logger.filters if isinstance(f, SamplingFilter))
+        handler = logging.Handler()
+        handler.emit = mock.Mock()
+        # One row in ten passes the 10% sample, then the 50-a-second cap applies
+        with mock.patch.object(row_logger, 'handlers', [handler]), \
+                mock.patch('portfolio.log.random.random', side_effect=itertools.cycle([0.0] + [0.5] * 9)), \
+                mock.patch('portfolio.log.time.monotonic', return_value=sampler._updated), \
+                mock.patch.object(sampler, '_tokens', sampler.max_per_second):
+            for i in range(1000):
+                row_logger.info("📁 Project row: %s (%s)", f'p{i}', 2024)
+        self.assertEqual(handler.emit.call_count, 50)
+
+    def test_queued_records_reach_their_own_handlers(self):
+        log_queue = queue.SimpleQueue()
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JSONFormatter())
+        listener = RoutingQueueListener(log_queue)
+        listener.start()
+        LazyQueueHandler(log_queue, (target,)).handle(self.record(msg="📋 %s rows", args=(25,)))
+        listener.stop()
+        self.assertEqual(json.loads(stream.getvalue())['message'], '📋 25 rows')
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_exposition_is_cumulative(self):
+        histogram = Histogram('latency_seconds', 'Latency', ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('home',), value)
+        lines = histogram.exposition(histogram.snapshot())
+        self.assertIn('latency_seconds_bucket{view="home",le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{view="home",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_count{view="home"} 4', lines)
+
+    def test_worker_snapshots_are_added_up(self):
+        merged = merge_snapshots([{'hits': {'["a"]': [1, 2.5]}}, {'hits': {'["a"]': [3, 0.5], '["b"]': [1, 1.0]}}])
+        self.assertEqual(merged['hits'], {'["a"]': [4, 3.0], '["b"]': [1, 1.0]})
+
+    def test_exited_workers_are_folded_into_the_base_totals(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        exited = os.path.join(directory, 'metrics-99999-0a1b2c.json')
+        with open(exited, 'w') as f:
+            json.dump({CACHE_REQUESTS.name: {'["hit"]': [5]}}, f)
+        own = CACHE_REQUESTS.snapshot().get('["hit"]', [0])[0]
+        with override_settings(METRICS_DIR=directory), \
+                mock.patch('portfolio.metrics.os.kill', side_effect=ProcessLookupError):
+            self.assertEqual(collect()[CACHE_REQUESTS.name]['["hit"]'], [own + 5])
+            self.assertFalse(os.path.exists(exited))
+            # A new worker with the same pid starts from zero without lowering the total
+            with open(os.path.join(directory, 'metrics-99999-3d4e5f.json'), 'w') as f:
+                json.dump({CACHE_REQUESTS.name: {'["hit"]': [1]}}, f)
+            self.assertEqual(collect()[CACHE_REQUESTS.name]['["hit"]'], [own + 6])
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_are_refused_without_a_token(self):
+        factory = RequestFactory()
+        self.assertEqual(metrics_view(factory.get('/metrics')).status_code, 403)
+        request = factory.get('/metrics', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret', RATE_LIMIT_TRUST_X_FORWARDED_FOR=True)
+    def test_proxied_scrapes_need_the_token(self):
+        # Behind a reverse proxy every request comes from the proxy's private address
+        factory = RequestFactory()
+        proxied = {'REMOTE_ADDR': '10.0.0.2', 'HTTP_X_FORWARDED_FOR': '10.0.0.7'}
+        self.assertEqual(metrics_view(factory.get('/metrics', **proxied)).status_code, 403)
+        request = factory.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong', **proxied)
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_authorised_scrapes_get_the_metrics(self):
+        request = RequestFactory().get('/metrics', REMOTE_ADDR='93.184.216.34', HTTP_AUTHORIZATION='Bearer secret')
+        response = metrics_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE portfolio_request_duration_seconds histogram', response.content)
+
+    def test_server_timing_reports_the_request_cache_lookups(self):
+        cache = TimedLocMemCache('metrics-tests', {})
+        cache.set('present', 1)
+
+        def view(request):
+            cache.get('present')
+            cache.get_many(['present', 'absent'])
+            return HttpResponse()
+
+        response = ServerTimingMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('cache;desc="2 hits, 1 misses"', response['Server-Timing'])
+        self.assertIn('mongo;dur=0.0;desc="0 commands"', response['Server-Timing'])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'}},
+    RATE_LIMITS={'contact': {'per_ip': '2/m', 'global': '3/m'}},
+)
+class TokenBucketLimiterTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/m'), (5 / 60, 5))
+
+    def test_per_ip_and_global_buckets(self):
+        limiter = TokenBucketLimiter()
+        self.assertEqual(limiter.check('contact', '10.0.0.1', now=0), 0)
+        self.assertEqual(limiter.check('contact', '10.0.0.1', now=0), 0)
+        # Per-IP bucket empty: one token refills every 30 seconds
+        self.assertAlmostEqual(limiter.check('contact', '10.0.0.1', now=0), 30)
+        self.assertEqual(limiter.check('contact', '10.0.0.2', now=0), 0)
+        # Global bucket empty now, even for a fresh IP
+        self.assertAlmostEqual(limiter.check('contact', '10.0.0.3', now=0), 20)
+        self.assertEqual(limiter.check('contact', '10.0.0.1', now=30), 0)
+
+    def test_async_views_check_the_method_before_spending_a_token(self):
+        limiter = TokenBucketLimiter()
+        for _ in range(3):
+            request = RequestFactory().get('/api/contact/', REMOTE_ADDR='10.0.0.9')
+            response = asyncio.run(async_views.contact_api(request))
+            self.assertEqual(response.status_code, 405)
+        self.assertEqual(limiter.check('contact', '10.0.0.9'), 0)
+
+
+class FakeAsyncCollection:
+    """The Motor collection methods the async write views use, recording the documents"""
+
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+        return mock.Mock(inserted_id=document.setdefault('_id', ObjectId()))
+
+    async def insert_many(self, documents, ordered=True):
+        for document in documents:
+            await self.insert_one(document)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'async-views-tests'}},
+    RATE_LIMITS={'add_project': {'per_ip': '5/m', 'global': '5/m'}, 'contact': {'per_ip': '2/m', 'global': '10/m'}},
+    CONTACTS_WRITE_BEHIND=False,
+)
+class AsyncViewTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.collections = defaultdict(FakeAsyncCollection)
+        self.projects = [{'_id': ObjectId(), 'title': f'p{i}', 'created_at': f'2024-01-{10 - i:02d}'}
+                         for i in range(3)]
+        self.repository = mock.Mock(afind=mock.AsyncMock(side_effect=self.find))
+        self.bump = mock.AsyncMock(return_value=8)
+        self.update_facets = mock.AsyncMock()
+        for target, value in (
+            ('portfolio.async_views.get_async_db', lambda: self.collections),
+            ('portfolio.async_views.aget_content_version', mock.AsyncMock(return_value=7)),
+            ('portfolio.async_views.abump_content_version', self.bump),
+            ('portfolio.async_views.aget_project_repository', mock.AsyncMock(return_value=self.repository)),
+            ('portfolio.async_views.aupdate_facets', self.update_facets),
+            ('portfolio.async_views.schedule_export', mock.Mock()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def find(self, filters, field, direction, after, limit, projection=None):
+        return [dict(project) for project in self.projects[:limit]]
+
+    def post(self, view, data, ip='10.0.0.5'):
+        request = RequestFactory().post('/', json.dumps(data), content_type='application/json', REMOTE_ADDR=ip)
+        return async_to_sync(view)(request)
+
+    def test_projects_page_etag_and_not_modified(self):
+        response = async_to_sync(async_views.get_projects_api)(RequestFactory().get('/api/projects/?limit=2'))
+        self.assertEqual((response.status_code, response['ETag']), (200, '"projects-v7"'))
+        payload = json.loads(response.content)
+        self.assertEqual([p['title'] for p in payload['projects']], ['p0', 'p1'])
+        self.assertEqual(decode_cursor(payload['next_cursor'], 'created_at', -1)[1], self.projects[1]['_id'])
+
+        request = RequestFactory().get('/api/projects/?limit=2', HTTP_IF_NONE_MATCH='"projects-v7"')
+        self.assertEqual(async_to_sync(async_views.get_projects_api)(request).status_code, 304)
+        self.assertEqual(self.repository.afind.await_count, 1)
+
+    def test_add_project_inserts_and_bumps_the_version(self):
+        response = self.post(async_views.add_project_api, {'title': 'Async', 'technologies': ['Django']})
+        self.assertEqual(response.status_code, 200)
+        [project] = self.collections[db_module.projects_collection.name].documents
+        self.assertEqual(json.loads(response.content)['project_id'], str(project['_id']))
+        self.assertEqual((project['title'], project['technologies']), ('Async', ['Django']))
+        self.assertIn('updated_at', project)
+        self.bump.assert_awaited_once()
+        self.update_facets.assert_awaited_once_with(8, added=[project])
+
+    def test_contact_is_stored(self):
+        response = self.post(async_views.contact_api, {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hi'})
+        self.assertEqual((response.status_code, json.loads(response.content)['status']), (200, 'success'))
+        [contact] = self.collections[db_module.contacts_collection.name].documents
+        self.assertEqual((contact['name'], contact['email']), ('Ada', 'ada@example.com'))
+        self.assertEqual(self.post(async_views.contact_api, 'not an object').status_code, 400)
+
+    def test_contact_submissions_are_rate_limited_per_client(self):
+        statuses = [self.post(async_views.contact_api, {'name': 'Ada'}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.post(async_views.contact_api, {'name': 'Ada'})
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Another client still has its own bucket
+        self.assertEqual(self.post(async_views.contact_api, {'name': 'Bob'}, ip='10.0.0.6').status_code, 200)
+        self.assertEqual(len(self.collections[db_module.contacts_collection.name].documents), 3)
+
+
+class ImportExportTests(SimpleTestCase):
+    def test_json_array_is_streamed_across_chunks(self):
+        text = '[{"title": "a", "tags": ["x, y"]},\n {"title": "b ]"}]'
+        items = list(iter_json_array(io.StringIO(text), chunk_size=7))
+        self.assertEqual([item['title'] for item in items], ['a', 'b ]'])
+
+    def test_csv_rows_become_projects(self):
+        rows = io.StringIO('title,technologies,year,featured\nSite,"Django, React",2024,yes\n')
+        self.assertEqual([normalize_project(row) for row in iter_csv(rows)], [
+            {'title': 'Site', 'technologies': ['Django', 'React'], 'year': 2024, 'featured': True},
+        ])
+
+    @mock.patch('portfolio.importexport.export_now', return_value={'version': 3})
+    @mock.patch('portfolio.importexport.bump_content_version')
+    @mock.patch('portfolio.importexport.projects_collection')
+    def test_bad_csv_rows_are_invalid_and_written_batches_bump_the_version(self, collection, bump, export):
+        collection.find.return_value = []
+        rows = io.StringIO('title,year,featured\na,2020,\nb,twenty,\nc,,maybe\nd,2021,\n')
+        importer = ProjectImporter(batch_size=1)
+        stats = importer.run(iter_csv(rows))
+        self.assertEqual((stats['read'], stats['inserted'], stats['invalid']), (4, 2, 2))
+        self.assertEqual(len(importer.errors), 2)
+        self.assertEqual(collection.bulk_write.call_count, 2)
+        bump.assert_called_once()
+        # The static export is rebuilt before the import returns
+        export.assert_called_once()
+        self.assertEqual(importer.export, {'version': 3})
+
+        # A dry run writes nothing, so neither bumps nor exports
+        bump.reset_mock()
+        export.reset_mock()
+        ProjectImporter(dry_run=True).run([{'title': 'e'}])
+        bump.assert_not_called()
+        export.assert_not_called()
+
+    @mock.patch('portfolio.importexport.bump_content_version')
+    @mock.patch('portfolio.importexport.projects_collection')
+    def test_import_outside_django_skips_the_static_export(self, collection, bump):
+        collection.find.return_value = []
+        environ = {key: value for key, value in os.environ.items() if key != 'DJANGO_SETTINGS_MODULE'}
+        # As in ``python load_mongodb_only.py``: settings never configured
+        with mock.patch('portfolio.static_export.settings', LazySettings()), \
+                mock.patch.dict(os.environ, environ, clear=True):
+            importer = ProjectImporter()
+            importer.run([{'title': 'Site'}])
+        collection.bulk_write.assert_called_once()
+        bump.assert_called_once()
+        self.assertIsNone(importer.export)
+
+        # Input that breaks off after a written batch still bumps the version
+        bump.reset_mock()
+        importer = ProjectImporter(batch_size=1)
+        with self.assertRaises(ValueError):
+            importer.run(iter_jsonl(io.StringIO('{"title": "a"}\n{"title": \n')))
+        bump.assert_called_once()
+
+    def test_normalize_keeps_only_given_fields(self):
+        self.assertEqual(normalize_project({'title': 'Site', 'year': 2021, 'extra': 1}),
+                         {'title': 'Site', 'year': 2021})
+        with self.assertRaises(ValueError):
+            normalize_project({'description': 'untitled'})
@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from .views import home, get_projects_api, add_project_api, contact_api
+from .views import home
 from .admin import portfolio_admin
 
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        get_projects_api, search_projects_api, project_facets_api, add_project_api, add_projects_batch_api, contact_api,
+    )
+else:
+    from .views import (
+        get_projects_api, search_projects_api, project_facets_api, add_project_api, add_projects_batch_api, contact_api,
+    )
+
 urlpatterns = [
     path("", home),
     path("projects/", get_projects_api),
+    path("projects/search/", search_projects_api),
+    path("projects/facets/", project_facets_api),
     path("projects/add/", add_project_api),
+    path("projects/batch/", add_projects_batch_api),
     path("contact/", contact_api),
 ]
 
@@ -16,6 +29,7 @@ admin_urls = [
     path('portfolio-projects/add/', portfolio_admin.add_project, name='add_project'),
     path('portfolio-projects/delete/<str:project_title>/', portfolio_admin.delete_project, name='delete_project'),
     path('portfolio-contacts/', portfolio_admin.contacts_view, name='contacts'),
+    path('portfolio-contacts/export/', portfolio_admin.export_contacts, name='export_contacts'),
     path('profile/', portfolio_admin.profile_view, name='profile'),
     path('profile/update/', portfolio_admin.update_profile, name='update_profile'),
 ]
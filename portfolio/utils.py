@@ -1 +1,420 @@
 # Helper functions for the portfolio app
+import base64
+import hashlib
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from bson import Decimal128, ObjectId, json_util
+from bson.errors import InvalidId
+from django.conf import settings
+
+
+# Sortable fields for the public projects API, mapped from the ``sort``
+# query parameter (``created_at``, ``-created_at``, ``year``, ...).
+PROJECT_SORT_FIELDS = ('created_at', 'year', 'title')
+DEFAULT_PROJECT_SORT = '-created_at'
+
+# Fields the projects API can be limited to with ``fields=title,image``
+PROJECT_FIELDS = (
+    'title', 'description', 'year', 'technologies', 'category', 'featured',
+    'live_url', 'github_url', 'image', 'image_url', 'created_at', 'updated_at',
+)
+
+# Request bodies of the batch endpoint read as one project per line
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+DUPLICATE_KEY = 11000
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class QueryParamError(ValueError):
+    """Raised when a query string parameter cannot be turned into a Mongo query"""
+
+
+def parse_bool(value, name):
+    """Parse a query string boolean such as ``featured=true``"""
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise QueryParamError(f"'{name}' must be a boolean")
+
+
+def parse_int(value, name, minimum=None, maximum=None):
+    """Parse a query string integer, optionally clamped to a range"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise QueryParamError(f"'{name}' must be an integer")
+    if minimum is not None and number < minimum:
+        raise QueryParamError(f"'{name}' must be >= {minimum}")
+    if maximum is not None and number > maximum:
+        number = maximum
+    return number
+
+
+def build_project_filter(params):
+    """Build a Mongo filter from the projects API query parameters"""
+    query = {}
+    if params.get('category'):
+        query['category'] = params['category']
+    if params.get('featured'):
+        query['featured'] = parse_bool(params['featured'], 'featured')
+    if params.get('year'):
+        query['year'] = parse_int(params['year'], 'year')
+    if params.get('technology'):
+        # technologies is an array, so equality matches any element
+        query['technologies'] = params['technology']
+    return query
+
+
+def parse_project_sort(value):
+    """Turn ``-created_at`` into ``('created_at', -1)``"""
+    value = (value or DEFAULT_PROJECT_SORT).strip()
+    direction = -1 if value.startswith('-') else 1
+    field = value.lstrip('-+')
+    if field not in PROJECT_SORT_FIELDS:
+        raise QueryParamError(
+            f"'sort' must be one of: {', '.join(PROJECT_SORT_FIELDS)} (prefix with '-' for descending)"
+        )
+    return field, direction
+
+
+def parse_fields(value):
+    """Parse a ``fields`` sparse fieldset; None means every field"""
+    fields = [field.strip() for field in (value or '').split(',') if field.strip()]
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in PROJECT_FIELDS]
+    if unknown:
+        raise QueryParamError(f"'fields' may only contain: {', '.join(PROJECT_FIELDS)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def project_projection(fields, sort_field):
+    """Mongo projection for a sparse fieldset, keeping what the cursor needs
+
+    ``_id`` and the sort field are fetched even when not requested;
+    :func:`projects_page` drops them again.
+    """
+    if fields is None:
+        return None
+    projection = dict.fromkeys(fields, 1)
+    projection[sort_field] = 1
+    return projection
+
+
+# Sort values a cursor may carry; anything else in a decoded cursor is rejected
+CURSOR_VALUE_TYPES = (str, int, float, bool, type(None), datetime, ObjectId, Decimal128)
+
+
+def encode_cursor(field, direction, document):
+    """Encode the sort position of ``document`` as an opaque cursor string
+
+    The payload is MongoDB Extended JSON, so sort values that plain JSON
+    can't hold (dates, ObjectIds, Decimal128) round-trip with their type.
+    """
+    payload = {
+        's': f"{'-' if direction < 0 else ''}{field}",
+        'v': document.get(field),
+        'id': str(document['_id']),
+    }
+    raw = json_util.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field, direction):
+    """Decode a cursor produced by :func:`encode_cursor` for the same sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+        object_id = ObjectId(payload['id'])
+        sort_key = payload['s']
+        value = payload['v']
+    except (ValueError, TypeError, KeyError, InvalidId):
+        raise QueryParamError("'cursor' is invalid")
+    if not isinstance(value, CURSOR_VALUE_TYPES):
+        raise QueryParamError("'cursor' is invalid")
+    if sort_key != f"{'-' if direction < 0 else ''}{field}":
+        raise QueryParamError("'cursor' was issued for a different sort order")
+    return value, object_id
+
+
+def keyset_filter(field, direction, value, object_id):
+    """Mongo filter matching documents strictly after ``(value, object_id)``
+
+    Documents are ordered by ``field`` and then ``_id`` in the same direction.
+    Mongo sorts missing/null values lowest, so they come last in a
+    descending walk and first in an ascending one.
+    """
+    op = '$lt' if direction < 0 else '$gt'
+    tie = {field: value, '_id': {op: object_id}}
+    if value is None:
+        if direction < 0:
+            return tie
+        return {'$or': [tie, {field: {'$ne': None}}]}
+    branches = [{field: {op: value}}, tie]
+    if direction < 0:
+        branches.append({field: None})
+    return {'$or': branches}
+
+
+def keyset_page(fetch, field, direction, after, before, limit):
+    """One page of documents with cursors for the pages either side of it
+
+    ``fetch(direction, position, limit)`` returns documents sorted by
+    ``(field, _id)`` in ``direction`` strictly after ``position``. ``after``
+    walks forward from a position and ``before`` walks backwards from one,
+    so every page costs an index seek regardless of its depth.
+    """
+    backwards = before is not None
+    documents = fetch(-direction if backwards else direction, before if backwards else after, limit + 1)
+    more = len(documents) > limit
+    documents = documents[:limit]
+    if backwards:
+        documents.reverse()
+    has_next = True if backwards else more
+    has_previous = more if backwards else after is not None
+    return {
+        'items': documents,
+        'next_cursor': encode_cursor(field, direction, documents[-1]) if documents and has_next else None,
+        'previous_cursor': encode_cursor(field, direction, documents[0]) if documents and has_previous else None,
+    }
+
+
+def parse_projects_params(params):
+    """Parse the projects API query string
+
+    Returns ``(filters, field, direction, limit, after)`` where ``after`` is
+    the decoded cursor position or None. The ``fields`` parameter is parsed
+    separately by :func:`parse_fields`.
+    """
+    filters = build_project_filter(params)
+    field, direction = parse_project_sort(params.get('sort'))
+    limit = parse_int(
+        params.get('limit', settings.PROJECTS_API_DEFAULT_LIMIT), 'limit',
+        minimum=1, maximum=settings.PROJECTS_API_MAX_LIMIT,
+    )
+    after = None
+    if params.get('cursor'):
+        after = decode_cursor(params['cursor'], field, direction)
+    return filters, field, direction, limit, after
+
+
+def keyset_query(filters, field, direction, after):
+    """Mongo ``(query, sort)`` for one keyset page ordered by ``(field, _id)``"""
+    query = filters
+    if after is not None:
+        keyset = keyset_filter(field, direction, *after)
+        query = {'$and': [filters, keyset]} if filters else keyset
+    return query, [(field, direction), ('_id', direction)]
+
+
+def projects_page(projects, limit, field, direction, fields=None):
+    """Build the API payload from up to ``limit + 1`` fetched projects
+
+    With a ``fields`` sparse fieldset, each project keeps only those fields.
+    """
+    next_cursor = None
+    if len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = encode_cursor(field, direction, projects[-1])
+    if fields is not None:
+        projects = [{name: value for name, value in project.items() if name in fields} for project in projects]
+    for project in projects:
+        project.pop('_id', None)
+    return {'projects': projects, 'next_cursor': next_cursor}
+
+
+def parse_search_params(params):
+    """Parse the search API query string into ``(query, filters, limit)``"""
+    query = params.get('q', '').strip()
+    if not query:
+        raise QueryParamError("'q' is required")
+    filters = build_project_filter(params)
+    limit = parse_int(
+        params.get('limit', settings.PROJECTS_SEARCH_DEFAULT_LIMIT), 'limit',
+        minimum=1, maximum=settings.PROJECTS_API_MAX_LIMIT,
+    )
+    return query, filters, limit
+
+
+def search_payload(query, results):
+    """Search API payload from ``(score, project)`` pairs"""
+    hits = []
+    for score, project in results:
+        hit = {field: value for field, value in project.items() if field != '_id'}
+        hit['score'] = round(score, 3)
+        hits.append(hit)
+    return {'query': query, 'results': hits}
+
+
+def projects_cache_key(version, params):
+    """Cache key for a projects API response at a given content version"""
+    query_hash = hashlib.md5(params.urlencode().encode()).hexdigest()
+    return f'projects_api:{version}:{query_hash}'
+
+
+def project_digest(project):
+    """Hash of a project document's contents"""
+    return hashlib.md5(json.dumps(project, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def project_card_cache_key(project):
+    """Cache key for a rendered project card; changes whenever the project does"""
+    return f"project_card:{project['_id']}:{project_digest(project)}"
+
+
+def project_from_data(data):
+    """Project document from an API request body"""
+    return {
+        "title": data.get("title", ""),
+        "description": data.get("description", ""),
+        "year": data.get("year", 2024),
+        "technologies": data.get("technologies", []),
+        "live_url": data.get("live_url", ""),
+        "github_url": data.get("github_url", ""),
+        "image_url": data.get("image_url", ""),
+        "featured": data.get("featured", False),
+        "created_at": data.get("created_at", ""),
+        "category": data.get("category", "web")
+    }
+
+
+def stamp_project(project, now=None):
+    """Set ``updated_at`` to the time of the write; the SQLite replica polls for it"""
+    project['updated_at'] = now or datetime.now(timezone.utc)
+    return project
+
+
+def project_request_data(request):
+    """Project fields from a JSON body, or from a multipart form (used to upload an ``image``)
+
+    In a form, ``technologies`` may be repeated or comma-separated and
+    ``featured`` is ``true``/``on``/``1``.
+    """
+    if request.content_type != 'multipart/form-data':
+        return json.loads(request.body)
+    data = request.POST.dict()
+    technologies = request.POST.getlist('technologies')
+    if len(technologies) == 1:
+        technologies = technologies[0].split(',')
+    data['technologies'] = [tech.strip() for tech in technologies if tech.strip()]
+    if 'year' in data:
+        data['year'] = int(data['year'])
+    if 'featured' in data:
+        data['featured'] = data['featured'].lower() in ('true', 'on', '1')
+    return data
+
+
+def build_contact_filter(params):
+    """Mongo filter for the admin inbox: search by name/email and a date range
+
+    ``from`` and ``to`` are inclusive ``YYYY-MM-DD`` dates compared against
+    the ISO timestamps the contact form sends. The profile document shares
+    the collection and is always excluded.
+    """
+    query = {'type': {'$ne': 'profile'}}
+    search = params.get('q', '').strip()
+    if search:
+        pattern = {'$regex': re.escape(search), '$options': 'i'}
+        query['$or'] = [{'name': pattern}, {'email': pattern}]
+    timestamp = {}
+    try:
+        if params.get('from'):
+            timestamp['$gte'] = date.fromisoformat(params['from']).isoformat()
+        if params.get('to'):
+            timestamp['$lt'] = (date.fromisoformat(params['to']) + timedelta(days=1)).isoformat()
+    except ValueError:
+        raise QueryParamError("dates must look like YYYY-MM-DD")
+    if timestamp:
+        query['timestamp'] = timestamp
+    return query
+
+
+def contact_from_data(data):
+    """Contact document from a contact form submission"""
+    return {
+        "name": data.get("name", ""),
+        "email": data.get("email", ""),
+        "message": data.get("message", ""),
+        "timestamp": data.get("timestamp", "")
+    }
+
+
+def parse_batch_body(body, content_type):
+    """Items of a batch request: a JSON array, or NDJSON for ``NDJSON_CONTENT_TYPES``"""
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {line_number}: {e}")
+        return items
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("body must be a JSON array of projects")
+    return items
+
+
+def validate_project_data(data):
+    """Project document from one batch item; raises ValueError if it is unusable"""
+    if not isinstance(data, dict):
+        raise ValueError("item must be a JSON object")
+    if not isinstance(data.get('title'), str) or not data['title'].strip():
+        raise ValueError("'title' is required")
+    if 'year' in data and (not isinstance(data['year'], int) or isinstance(data['year'], bool)):
+        raise ValueError("'year' must be an integer")
+    technologies = data.get('technologies', [])
+    if not isinstance(technologies, list) or not all(isinstance(t, str) for t in technologies):
+        raise ValueError("'technologies' must be a list of strings")
+    if not isinstance(data.get('featured', False), bool):
+        raise ValueError("'featured' must be a boolean")
+    return project_from_data(data)
+
+
+def validate_project_batch(items):
+    """Validate every batch item
+
+    Returns ``(projects, results)``: the documents to insert, each with a
+    pre-assigned ``_id`` and ``updated_at``, and one result per item in
+    request order.
+    """
+    projects, results = [], []
+    now = datetime.now(timezone.utc)
+    for index, data in enumerate(items):
+        try:
+            project = validate_project_data(data)
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+            continue
+        project['_id'] = ObjectId()
+        projects.append(stamp_project(project, now))
+        results.append({'index': index, 'status': 'created', 'project_id': str(project['_id'])})
+    return projects, results
+
+
+def apply_batch_write_errors(results, projects, write_errors):
+    """Mark the results of projects that ``insert_many`` rejected"""
+    failed = {str(projects[error['index']]['_id']): error for error in write_errors}
+    for result in results:
+        error = failed.get(result.get('project_id'))
+        if error is not None:
+            del result['project_id']
+            result['status'] = 'error'
+            result['error'] = "a project with this title already exists" if error['code'] == DUPLICATE_KEY else error['errmsg']
+    return results
+
+
+def batch_summary(results):
+    """Response payload and status for the batch endpoint"""
+    created = sum(1 for result in results if result['status'] == 'created')
+    payload = {'created': created, 'failed': len(results) - created, 'results': results}
+    return payload, 200 if created else 400
@@ -0,0 +1,84 @@
+"""
+Monotonic content version counters
+
+Each namespace (e.g. ``projects``) has a counter in the ``meta`` collection
+that every write path bumps. Readers use it to build ETags and cache keys,
+so a single cache lookup tells them whether anything changed.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from pymongo import ReturnDocument
+
+from .db import meta_collection
+
+logger = logging.getLogger('portfolio.versioning')
+
+PROJECTS = 'projects'
+
+
+def _cache_key(namespace):
+    return f'content_version:{namespace}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'CONTENT_VERSION_CACHE_TIMEOUT', 10)
+
+
+def get_content_version(namespace=PROJECTS):
+    """Return the current version of ``namespace``, served from cache when possible"""
+    version = cache.get(_cache_key(namespace))
+    if version is None:
+        doc = meta_collection.find_one({'_id': namespace}, {'version': 1})
+        version = doc['version'] if doc else 0
+        cache.set(_cache_key(namespace), version, _cache_timeout())
+    return version
+
+
+def bump_content_version(namespace=PROJECTS):
+    """Atomically increment the version of ``namespace`` and return the new value
+
+    Safe to call from scripts that run without Django settings; the cached
+    value then simply expires after ``CONTENT_VERSION_CACHE_TIMEOUT``.
+    """
+    doc = meta_collection.find_one_and_update(
+        {'_id': namespace},
+        {'$inc': {'version': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    version = doc['version']
+    if settings.configured:
+        cache.set(_cache_key(namespace), version, _cache_timeout())
+    logger.info(f"🔖 Content version for '{namespace}' bumped to {version}")
+    return version
+
+
+async def aget_content_version(namespace=PROJECTS):
+    """Async :func:`get_content_version` for the ASGI views"""
+    from .async_db import get_async_db
+
+    version = await cache.aget(_cache_key(namespace))
+    if version is None:
+        doc = await get_async_db()[meta_collection.name].find_one({'_id': namespace}, {'version': 1})
+        version = doc['version'] if doc else 0
+        await cache.aset(_cache_key(namespace), version, _cache_timeout())
+    return version
+
+
+async def abump_content_version(namespace=PROJECTS):
+    """Async :func:`bump_content_version` for the ASGI views"""
+    from .async_db import get_async_db
+
+    doc = await get_async_db()[meta_collection.name].find_one_and_update(
+        {'_id': namespace},
+        {'$inc': {'version': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    version = doc['version']
+    await cache.aset(_cache_key(namespace), version, _cache_timeout())
+    logger.info(f"🔖 Content version for '{namespace}' bumped to {version}")
+    return version
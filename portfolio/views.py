@@ -1,41 +1,190 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
+from django.views.static import serve
+import os
 import json
+from pymongo.errors import BulkWriteError
+from .compression import static_response
+from .contact_queue import get_contact_queue
+from .encoders import APIJsonResponse
+from .cv_storage import DIGEST_RE, cv_response, get_cv_store
+from .facets import get_facets, facets_payload, update_facets
+from .images import IMMUTABLE_CACHE_CONTROL, attach_project_image
 from .db import projects_collection, contacts_collection
+from .ratelimit import rate_limit
+from .repository import get_project_repository
+from .search import get_search_index
+from .snapshot import get_snapshot, matches
+from .static_export import schedule_export
+from .versioning import get_content_version, bump_content_version
+from .utils import (
+    QueryParamError, parse_projects_params, parse_fields, project_projection, projects_page,
+    projects_cache_key, project_card_cache_key, project_from_data, project_request_data, contact_from_data,
+    parse_search_params, search_payload, parse_batch_body, validate_project_batch, apply_batch_write_errors, batch_summary,
+    stamp_project, encode_cursor,
+)
 
 def home(request):
-    """Render the portfolio UI"""
-    return render(request, 'index.html')
+    """Render the portfolio UI
+
+    With ``HOME_SERVER_RENDERED`` the first page of projects is rendered into
+    the HTML instead of being fetched by the browser. The page is cached per
+    projects content version and each card per project and contents, so a
+    warm request is one cache lookup (or a 304), and after an edit only the
+    changed cards are rendered again.
+    """
+    if not settings.HOME_SERVER_RENDERED:
+        return render(request, 'index.html')
+
+    version = get_content_version()
+    etag = quote_etag(f"home-v{version}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        page_key = f'home_page:{version}'
+        html = cache.get(page_key)
+        if html is None:
+            filters, field, direction, limit, _ = parse_projects_params(QueryDict())
+            # One extra project tells whether the "Load more" button has a next page
+            projects, _ = find_projects(version, filters, field, direction, None, limit + 1)
+            html = render_to_string('index.html', home_page_context(projects, limit, field, direction))
+            cache.set(page_key, html, settings.HOME_PAGE_CACHE_TIMEOUT)
+        response = HttpResponse(html)
+    response["ETag"] = etag
+    return response
+
+def home_page_context(projects, limit, field, direction):
+    """``index.html`` context for the first ``limit`` of ``projects`` (fetched with one extra)"""
+    next_cursor = encode_cursor(field, direction, projects[limit - 1]) if len(projects) > limit else None
+    return {'project_cards': render_project_cards(projects[:limit]), 'next_cursor': next_cursor}
+
+def render_project_cards(projects):
+    """HTML of each project card, rendering only those not cached yet"""
+    keys = [project_card_cache_key(project) for project in projects]
+    cards = cache.get_many(keys)
+    rendered = {
+        key: render_to_string('includes/project_card.html', {'project': project})
+        for key, project in zip(keys, projects) if key not in cards
+    }
+    if rendered:
+        cache.set_many(rendered, settings.HOME_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+def find_projects(version, filters, field, direction, after, limit, projection=None):
+    """Up to ``limit`` projects, from the snapshot when it is fresh, else the project repository
+
+    Returns ``(projects, snapshot)``; ``snapshot`` is None when it is disabled.
+    ``projection`` limits the fields the repository returns.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.is_fresh(version):
+        return snapshot.find(filters, field, direction, after=after, limit=limit), snapshot
+    repository = get_project_repository(version)
+    return repository.find(filters, field, direction, after, limit, projection), snapshot
+
+def projects_etag(request):
+    """ETag for the projects API: the projects content version
+
+    The version is kept on the request, so the view builds its body from the
+    same version even if a write bumps it in between.
+    """
+    request.projects_version = get_content_version()
+    return f"projects-v{request.projects_version}"
+
+def request_projects_version(request):
+    """Projects content version read by :func:`projects_etag` for this request"""
+    version = getattr(request, 'projects_version', None)
+    return get_content_version() if version is None else version
 
 # MongoDB API Views
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=projects_etag)
 def get_projects_api(request):
-    """API endpoint to get all portfolio projects"""
-    projects = list(projects_collection.find({}, {"_id": 0}))
-    return JsonResponse({"projects": projects})
+    """API endpoint to get portfolio projects
+
+    Supports ``category``, ``featured``, ``year`` and ``technology`` filters,
+    ``sort`` (``created_at``, ``year`` or ``title``, ``-`` for descending),
+    ``limit``, an opaque ``cursor`` taken from the previous page's
+    ``next_cursor`` and ``fields``, a comma-separated list of the fields to
+    return (e.g. ``fields=title,image,technologies``), which MongoDB then
+    doesn't send at all.
+
+    Responses carry the projects content version as a strong ETag, so
+    ``If-None-Match`` is answered with a 304 without touching Mongo, and
+    full responses are cached per version and query string.
+    """
+    params = request.GET
+    version = request_projects_version(request)
+    cache_key = projects_cache_key(version, params)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return APIJsonResponse(cached)
+
+    try:
+        filters, field, direction, limit, after = parse_projects_params(params)
+        fields = parse_fields(params.get('fields'))
+    except QueryParamError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Fetch one extra document to know whether another page exists
+    projects, snapshot = find_projects(
+        version, filters, field, direction, after, limit + 1, project_projection(fields, field))
+    payload = projects_page(projects, limit, field, direction, fields)
+    cache.set(cache_key, payload, settings.PROJECTS_API_CACHE_TIMEOUT)
+    response = APIJsonResponse(payload)
+    if snapshot is not None:
+        response["X-Snapshot-Staleness"] = f"{snapshot.staleness():.3f}"
+    return response
+
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=projects_etag)
+def search_projects_api(request):
+    """API endpoint for ranked full-text search over projects
+
+    ``q`` is matched against title, technologies, category and description;
+    its last word also matches as a prefix, for type-ahead. Takes the same
+    filters and ``limit`` as :func:`get_projects_api`.
+    """
+    try:
+        query, filters, limit = parse_search_params(request.GET)
+    except QueryParamError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    where = (lambda project: matches(project, filters)) if filters else None
+    results = get_search_index().search(query, limit=limit, where=where)
+    return APIJsonResponse(search_payload(query, results))
+
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=projects_etag)
+def project_facets_api(request):
+    """API endpoint with project counts per technology, category, year and featured"""
+    return APIJsonResponse(facets_payload(get_facets(request_projects_version(request))))
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limit("add_project")
 def add_project_api(request):
-    """API endpoint to add new portfolio project"""
+    """API endpoint to add new portfolio project
+
+    Accepts JSON, or a multipart form whose ``image`` file is stored as
+    responsive variants (see ``portfolio.images``).
+    """
     try:
-        data = json.loads(request.body)
-        
-        project = {
-            "title": data.get("title", ""),
-            "description": data.get("description", ""),
-            "year": data.get("year", 2024),
-            "technologies": data.get("technologies", []),
-            "live_url": data.get("live_url", ""),
-            "github_url": data.get("github_url", ""),
-            "image_url": data.get("image_url", ""),
-            "featured": data.get("featured", False),
-            "created_at": data.get("created_at", ""),
-            "category": data.get("category", "web")
-        }
+        data = project_request_data(request)
+        project = stamp_project(project_from_data(data))
+        if 'image' in request.FILES:
+            attach_project_image(project, request.FILES['image'])
         
         result = projects_collection.insert_one(project)
+        update_facets(bump_content_version(), added=[project])
+        schedule_export()
         return JsonResponse({
             "message": "Project added successfully",
             "project_id": str(result.inserted_id)
@@ -43,21 +192,108 @@ def add_project_api(request):
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
+def parse_project_batch(request):
+    """Validated ``(projects, results)`` for a batch request, or an error response"""
+    try:
+        items = parse_batch_body(request.body, request.content_type)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if not items:
+        return JsonResponse({"error": "No projects in request"}, status=400)
+    if len(items) > settings.PROJECTS_BATCH_MAX_SIZE:
+        return JsonResponse(
+            {"error": f"At most {settings.PROJECTS_BATCH_MAX_SIZE} projects per request"}, status=413
+        )
+    return validate_project_batch(items)
+
+def created_projects(projects, results):
+    """The projects of a batch that were actually inserted"""
+    created = {result["project_id"] for result in results if result["status"] == "created"}
+    return [project for project in projects if str(project["_id"]) in created]
+
+def batch_response(results):
+    payload, status = batch_summary(results)
+    return JsonResponse(payload, status=status)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@rate_limit("add_projects_batch")
+def add_projects_batch_api(request):
+    """API endpoint to add many projects in one request
+
+    Takes a JSON array, or one project per line with an NDJSON content type.
+    Valid items are written with a single unordered ``insert_many`` and the
+    content version is bumped once for the whole batch. The response lists
+    a result for every item in request order.
+    """
+    parsed = parse_project_batch(request)
+    if isinstance(parsed, JsonResponse):
+        return parsed
+    projects, results = parsed
+
+    if projects:
+        try:
+            projects_collection.insert_many(projects, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            apply_batch_write_errors(results, projects, e.details.get("writeErrors", []))
+    created = created_projects(projects, results)
+    if created:
+        update_facets(bump_content_version(), added=created)
+        schedule_export()
+    return batch_response(results)
+
+def queued_contact_response(accepted):
+    """Response for a contact handed to the write-behind queue"""
+    if not accepted:
+        response = JsonResponse({"error": "Too many submissions, please retry shortly"}, status=503)
+        response["Retry-After"] = str(settings.CONTACTS_QUEUE_RETRY_AFTER)
+        return response
+    return JsonResponse({"status": "success", "message": "Contact form submitted"}, status=202)
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limit("contact")
 def contact_api(request):
     """API endpoint to handle contact form submissions"""
     try:
         data = json.loads(request.body)
+        contact_data = contact_from_data(data)
         
-        contact_data = {
-            "name": data.get("name", ""),
-            "email": data.get("email", ""),
-            "message": data.get("message", ""),
-            "timestamp": data.get("timestamp", "")
-        }
-        
+        contact_queue = get_contact_queue()
+        if contact_queue is not None:
+            return queued_contact_response(contact_queue.submit(contact_data))
         contacts_collection.insert_one(contact_data)
         return JsonResponse({"status": "success", "message": "Contact form submitted"})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
+
+def project_image(request, name):
+    """Serve a stored project image variant
+
+    Variant names are content hashes, so browsers and CDNs may keep them
+    forever without revalidating.
+    """
+    response = serve(request, name, document_root=os.path.join(settings.MEDIA_ROOT, settings.PROJECT_IMAGES_DIR))
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@require_http_methods(["GET", "HEAD"])
+def static_asset(request, path):
+    """Serve a collected static file, precompressed when the client accepts it
+
+    Used when ``DEBUG`` is off (see ``portfolio.compression``); a web server
+    or CDN in front can serve ``STATIC_ROOT`` directly instead.
+    """
+    return static_response(request, path)
+
+@require_http_methods(["GET", "HEAD"])
+def cv_download(request, digest, filename):
+    """Serve a stored CV (see ``portfolio.cv_storage``); supports Range and ETag"""
+    if not DIGEST_RE.match(digest):
+        raise Http404("No such CV")
+    response = cv_response(request, get_cv_store(), digest, filename)
+    if response is None:
+        raise Http404("No such CV")
+    return response